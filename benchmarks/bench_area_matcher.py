@@ -0,0 +1,73 @@
+"""
+Area matcher scaling benchmark
+
+Builds matchers over 25 to 10,000 synthetic areas/blocks and times lookups
+against a fixed set of addresses. Per-lookup time should stay flat as the
+number of areas grows.
+
+    python benchmarks/bench_area_matcher.py
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sa7ba_custom.custom.area_matcher import AreaMatcher
+
+SCALES = (25, 250, 2500, 10000)
+LOOKUPS = 20000
+
+ADDRESSES = [
+    "Block 12, Street 5, House 7, Salmiyah, Kuwait",
+    "Sabah Al-Salem block 3 street 310 house 22",
+    "قطعة 4 شارع 12 منزل 9 السالمية",
+    "Apartment 14, Building 9, Al Jabriyah, near the hospital",
+    "Office tower, Sharq, Kuwait City",
+    "Unknown place with no area mentioned at all, block 99",
+]
+
+BASE_AREAS = [
+    ("SAL", ["Salmiya", "السالمية"]),
+    ("SAB", ["Sabah Al-Salem", "صباح السالم"]),
+    ("JAB", ["Al Jabriya", "الجابرية"]),
+    ("SHA", ["Sharq", "شرق"]),
+    ("ASI", ["Al Asimah (Kuwait City)", "العاصمة"]),
+]
+
+SYLLABLES = ["ka", "ri", "sha", "mu", "ba", "la", "qa", "di", "ya", "fa", "ha", "wa", "zi", "ta"]
+
+
+def synthetic_areas(count, seed=42):
+    rng = random.Random(seed)
+    areas = list(BASE_AREAS)
+    while len(areas) < count:
+        name = "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4)))
+        areas.append((f"AREA-{len(areas)}", [f"{name.title()} Block {len(areas) % 12 + 1}"]))
+    return areas
+
+
+def run():
+    results = []
+    for scale in SCALES:
+        started = time.perf_counter()
+        matcher = AreaMatcher(synthetic_areas(scale))
+        build_ms = (time.perf_counter() - started) * 1000
+
+        started = time.perf_counter()
+        for i in range(LOOKUPS):
+            matcher.match(ADDRESSES[i % len(ADDRESSES)])
+        per_lookup_us = (time.perf_counter() - started) / LOOKUPS * 1e6
+
+        results.append((scale, matcher.size, build_ms, per_lookup_us))
+
+    print(f"{'areas':>8} {'names':>8} {'build ms':>10} {'lookup us':>10}")
+    for scale, size, build_ms, per_lookup_us in results:
+        print(f"{scale:>8} {size:>8} {build_ms:>10.1f} {per_lookup_us:>10.2f}")
+
+    return results
+
+
+if __name__ == "__main__":
+    run()
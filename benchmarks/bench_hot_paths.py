@@ -0,0 +1,350 @@
+"""
+Hot path microbenchmarks on an in-memory frappe stand-in
+
+Times the cart, customer, sales order and address hot paths at several
+scales (10 to 10,000 areas, 1 to 500 cart lines, up to 1M simulated
+customers) and reports time and database queries per call. Each call runs
+as its own request (fresh frappe.local), so per-request memos are not
+carried over between calls.
+
+    python benchmarks/bench_hot_paths.py
+    python benchmarks/bench_hot_paths.py --quick --filter cart
+    python benchmarks/bench_hot_paths.py --save results.json
+    python benchmarks/bench_hot_paths.py --baseline results.json --threshold 0.25
+
+With --baseline the run exits with status 1 if any case got slower than the
+threshold allows or issues more queries per call than before.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import re
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from frappe_stub import Document, SyntheticTable, Table, install
+
+stub = install()
+
+from sa7ba_custom.sa7ba_custom.custom import address, area_registry, customer, sales_order
+from sa7ba_custom.sa7ba_custom.custom.cart import CustomShoppingCart
+
+AREA_SCALES = (10, 100, 1000, 10000)
+LINE_SCALES = (1, 50, 500)
+CUSTOMER_SCALES = (1000, 100000, 1000000)
+
+QUICK_AREA_SCALES = (10, 1000)
+QUICK_LINE_SCALES = (1, 50)
+QUICK_CUSTOMER_SCALES = (1000, 1000000)
+
+WARMUP = 3
+REPEATS = 3
+MIN_ITERATIONS = 5
+MAX_ITERATIONS = 100000
+
+ITEM_GROUPS = ("Food", "Drinks", "Furniture")
+SYLLABLES = ["ka", "ri", "sha", "mu", "ba", "la", "qa", "di", "ya", "fa", "ha", "wa", "zi", "ta"]
+
+ADDRESSES = [
+    "Block 12, Street 5, House 7, Salmiyah, Kuwait",
+    "قطعة 4 شارع 12 منزل 9 السالمية",
+    "Apartment 14, Building 9, Al Jabriyah, near the hospital",
+    "Unknown place with no area mentioned at all, block 99",
+]
+
+
+# Fixtures
+
+def load_areas(count, seed=42):
+    """Replace the Delivery Area table with count areas and a few pricing rules"""
+    rng = random.Random(seed)
+    table = stub.db.tables["Delivery Area"] = Table(indexed=("area_code",))
+    base = [("SAL", "Salmiya", "السالمية"), ("JAB", "Al Jabriya", "الجابرية"), ("HAW", "Hawally", "حولي")]
+
+    for i in range(count):
+        if i < len(base):
+            code, name, name_ar = base[i]
+        else:
+            word = "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))).title()
+            code, name, name_ar = f"A{i:05d}", f"{word} Block {i % 12 + 1}", None
+        table.insert({
+            "name": code, "area_code": code, "area_name": name, "custom_area_name_ar": name_ar,
+            "delivery_charge": round(1 + (i % 8) * 0.5, 3), "estimated_delivery_time": "1-2 hours",
+            "notes": None, "is_active": 1, "custom_aliases": None, "custom_boundary": None
+        })
+
+    rules = stub.db.tables["Delivery Pricing Rule"] = Table()
+    for rule in (
+        {"name": "Free over 20", "action": "Free Delivery", "min_subtotal": 20, "priority": 10},
+        {"name": "Bulky items", "action": "Add Surcharge", "amount": 1.5, "item_group": "Furniture"},
+        {"name": "Late night", "action": "Add Surcharge", "amount": 0.5,
+         "from_time": "22:00:00", "to_time": "06:00:00"},
+    ):
+        rules.insert({
+            "enabled": 1, "priority": 0, "amount": 0, "stop_further_rules": 0, "delivery_area": None,
+            "customer_group": None, "item_group": None, "min_subtotal": 0, "min_weight": 0,
+            "from_time": None, "to_time": None, "valid_from": None, "valid_upto": None, **rule
+        })
+
+    stub.db.table("Address").insert({"name": "ADDR-SAL", "custom_delivery_area": "SAL"})
+
+    stub.new_request()
+    area_registry.invalidate_area_registry()
+
+
+def load_customers(count):
+    """Simulate count guest customers without materializing them"""
+
+    patterns = {
+        "name": re.compile(r"^GST-(\d{7})$"),
+        "custom_email_key": re.compile(r"^guest(\d+)@example\.com$"),
+        "custom_phone_key": re.compile(r"^\+9655(\d{7})$"),
+    }
+
+    def parse(field, value):
+        match = patterns[field].match(value or "") if field in patterns else None
+        return int(match.group(1)) if match else None
+
+    def make_row(i):
+        return {
+            "name": f"GST-{i:07d}", "customer_name": f"Guest {i}", "creation": f"2026-01-01 {i}",
+            "email_id": f"guest{i}@example.com", "mobile_no": f"5{i:07d}",
+            "custom_email_key": f"guest{i}@example.com", "custom_phone_key": f"+9655{i:07d}",
+            "custom_is_guest_customer": 1
+        }
+
+    stub.db.tables["Customer"] = SyntheticTable(
+        count, make_row, parse, indexed=("custom_email_key", "custom_phone_key")
+    )
+
+
+def make_cart(lines):
+    return {"items": [
+        {"item_code": f"ITEM-{i}", "qty": 1 + i % 3, "rate": 1.25, "amount": 1.25 * (1 + i % 3),
+         "item_group": ITEM_GROUPS[i % len(ITEM_GROUPS)]}
+        for i in range(lines)
+    ]}
+
+
+def make_order(lines, with_delivery=False):
+    items = [
+        {"item_code": f"ITEM-{i}", "qty": 1, "rate": 1.25, "amount": 1.25,
+         "item_group": ITEM_GROUPS[i % len(ITEM_GROUPS)]}
+        for i in range(lines)
+    ]
+    doc = Document({
+        "doctype": "Sales Order", "name": "SO-BENCH", "customer": "GST-0000001",
+        "shipping_address_name": "ADDR-SAL", "items": items, "creation": "2026-10-18 12:00:00"
+    }, stub.db)
+    if with_delivery:
+        sales_order.validate_sales_order(doc, "validate")
+        before = Document(dict(doc), stub.db)
+        object.__setattr__(doc, "_before_save", before)
+    return doc
+
+
+# Cases: name -> (setup, prepare, run); prepare runs untimed and uncounted before every call
+
+def cart_cases(areas, lines):
+    for area_count in areas:
+        for line_count in lines:
+            cart = make_cart(line_count)
+            manager = CustomShoppingCart()
+            yield (
+                f"cart.update_cart_with_delivery[areas={area_count},lines={line_count}]",
+                lambda n=area_count: load_areas(n),
+                lambda: None,
+                lambda _, cart=cart: manager.update_cart_with_delivery(cart, "SAL")
+            )
+
+    for line_count in lines:
+        cart = make_cart(line_count)
+        yield (
+            f"cart.calculate_cart_total[lines={line_count}]",
+            lambda: load_areas(10),
+            lambda: None,
+            lambda _, cart=cart: CustomShoppingCart().calculate_cart_total(cart)
+        )
+
+
+def customer_cases(scales):
+    for count in scales:
+        rng = random.Random(count)
+        yield (
+            f"customer.create_guest_customer[customers={count},existing]",
+            lambda n=count: load_customers(n),
+            lambda n=count, rng=rng: rng.randrange(n),
+            lambda i: customer.create_guest_customer(f"guest{i}@example.com", f"5{i:07d}", "Guest")
+        )
+
+        counter = iter(range(count, 10 ** 7))
+        yield (
+            f"customer.create_guest_customer[customers={count},new]",
+            lambda n=count: load_customers(n),
+            lambda counter=counter: next(counter),
+            lambda i: customer.create_guest_customer(f"guest{i}@example.com", f"5{i:07d}", "Guest")
+        )
+
+
+def sales_order_cases(areas, lines):
+    for area_count in (areas[0], areas[-1]):
+        for line_count in lines:
+            yield (
+                f"sales_order.validate_sales_order[areas={area_count},lines={line_count},new]",
+                lambda n=area_count: load_areas(n),
+                lambda n=line_count: make_order(n),
+                lambda doc: sales_order.validate_sales_order(doc, "validate")
+            )
+            yield (
+                f"sales_order.validate_sales_order[areas={area_count},lines={line_count},unchanged]",
+                lambda n=area_count: load_areas(n),
+                lambda n=line_count: make_order(n, with_delivery=True),
+                without_queries(lambda doc: sales_order.validate_sales_order(doc, "validate"))
+            )
+
+
+def address_cases(areas):
+    for area_count in areas:
+        counter = iter(range(10 ** 9))
+        yield (
+            f"address.extract_area_from_address[areas={area_count}]",
+            lambda n=area_count: load_areas(n),
+            lambda counter=counter: ADDRESSES[next(counter) % len(ADDRESSES)],
+            lambda text: address.extract_area_from_address(text)
+        )
+
+
+def without_queries(run):
+    """Fail the case if run issues a database query"""
+    def checked(arg):
+        queries = stub.db.queries
+        result = run(arg)
+        assert stub.db.queries == queries, f"expected no queries, got {stub.db.queries - queries}"
+        return result
+    return checked
+
+
+# Runner
+
+def measure(setup, prepare, run, min_time):
+    setup()
+
+    def call():
+        # Work done by prepare is not part of the case
+        queries, cache_calls = stub.db.queries, stub.cache.calls
+        arg = prepare()
+        stub.db.queries, stub.cache.calls = queries, cache_calls
+        stub.new_request()
+        started = time.perf_counter()
+        run(arg)
+        elapsed = time.perf_counter() - started
+        stub.db.commit()
+        return elapsed
+
+    for _ in range(WARMUP):
+        call()
+
+    means, queries, cache_calls, iterations = [], 0, 0, 0
+    for _ in range(REPEATS):
+        stub.db.reset_counters()
+        stub.cache.calls = 0
+        total, count = 0.0, 0
+        while count < MIN_ITERATIONS or (total < min_time / REPEATS and count < MAX_ITERATIONS):
+            total += call()
+            count += 1
+        means.append(total / count)
+        queries, cache_calls, iterations = stub.db.queries / count, stub.cache.calls / count, count
+
+    return {
+        "us_per_call": round(statistics.median(means) * 1e6, 3),
+        "queries_per_call": round(queries, 3),
+        "cache_calls_per_call": round(cache_calls, 3),
+        "iterations": iterations
+    }
+
+
+def run(quick=False, name_filter=None, min_time=0.3):
+    areas = QUICK_AREA_SCALES if quick else AREA_SCALES
+    lines = QUICK_LINE_SCALES if quick else LINE_SCALES
+    customers = QUICK_CUSTOMER_SCALES if quick else CUSTOMER_SCALES
+
+    cases = [
+        *cart_cases(areas, lines),
+        *customer_cases(customers),
+        *sales_order_cases(areas, lines),
+        *address_cases(areas),
+    ]
+
+    results = {}
+    for name, setup, prepare, call in cases:
+        if name_filter and name_filter not in name:
+            continue
+        results[name] = measure(setup, prepare, call, min_time)
+        r = results[name]
+        print(f"{name:<78} {r['us_per_call']:>10.2f} us {r['queries_per_call']:>6.2f} q "
+              f"{r['cache_calls_per_call']:>6.2f} c", flush=True)
+
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "quick": quick
+        },
+        "results": results
+    }
+
+
+def compare(current, baseline, threshold):
+    """Print per-case changes against a baseline; returns the regressed case names"""
+    regressions = []
+    print(f"\n{'case':<78} {'base us':>10} {'now us':>10} {'change':>8}  queries")
+    for name, now in current["results"].items():
+        before = baseline["results"].get(name)
+        if not before:
+            continue
+
+        change = now["us_per_call"] / before["us_per_call"] - 1 if before["us_per_call"] else 0
+        slower = change > threshold
+        more_queries = now["queries_per_call"] > before["queries_per_call"]
+        flag = " <-- regression" if slower or more_queries else ""
+        print(f"{name:<78} {before['us_per_call']:>10.2f} {now['us_per_call']:>10.2f} "
+              f"{change:>+7.1%}  {before['queries_per_call']:g} -> {now['queries_per_call']:g}{flag}")
+        if flag:
+            regressions.append(name)
+
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--quick", action="store_true", help="fewer scales")
+    parser.add_argument("--filter", dest="name_filter", help="only run cases containing this text")
+    parser.add_argument("--min-time", type=float, default=0.3, help="seconds of timed calls per case")
+    parser.add_argument("--save", help="write results as JSON")
+    parser.add_argument("--baseline", help="compare against a saved JSON result")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="allowed slowdown before a case counts as a regression (0.25 = 25%%)")
+    args = parser.parse_args()
+
+    results = run(args.quick, args.name_filter, args.min_time)
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s)")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,551 @@
+"""
+In-memory stand-in for the parts of frappe the hot paths use
+
+Provides frappe.db, get_all, new_doc/get_doc, cache() and cookie_manager
+backed by Python dicts, so app code can run on a plain Python install.
+Every database call is counted; benchmarks report queries per operation
+next to timings. Tables keep hash indexes on chosen fields so indexed
+lookups stay O(1) like they would in MariaDB, and SyntheticTable serves
+very large tables (1M customers) without materializing their rows.
+
+    from frappe_stub import install
+    stub = install()          # registers `frappe` and the app package
+    stub.db.reset_counters()
+"""
+import datetime
+import json
+import os
+import re
+import sys
+import types
+from collections import defaultdict
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP_PACKAGE = "sa7ba_custom"
+
+
+class _dict(dict):
+    """dict with attribute access, like frappe._dict"""
+
+    # Same as frappe._dict; also keeps child row attribute access as cheap as on real rows
+    __getattr__ = dict.get
+
+    def __setattr__(self, key, value):
+        self[key] = value
+
+    def update(self, *args, **kwargs):
+        super().update(*args, **kwargs)
+        return self
+
+    def copy(self):
+        return _dict(self)
+
+
+class ValidationError(Exception):
+    pass
+
+
+class DuplicateEntryError(ValidationError):
+    pass
+
+
+class DoesNotExistError(ValidationError):
+    pass
+
+
+def _throw(msg, exc=ValidationError, *args, **kwargs):
+    raise exc(msg)
+
+
+class CallbackList(list):
+    """frappe.db.after_commit / after_rollback"""
+
+    def add(self, fn):
+        self.append(fn)
+
+    def run(self):
+        callbacks, self[:] = list(self), []
+        for fn in callbacks:
+            fn()
+
+
+class Table:
+    """Rows keyed by name with optional hash indexes"""
+
+    def __init__(self, indexed=()):
+        self.rows = {}
+        self.indexes = {field: defaultdict(set) for field in indexed}
+
+    def insert(self, row):
+        self.rows[row["name"]] = row
+        for field, index in self.indexes.items():
+            if row.get(field) is not None:
+                index[row[field]].add(row["name"])
+
+    def update(self, name, values):
+        row = self.get(name)
+        if row is None:
+            return
+        row = self.rows.setdefault(name, row)
+        for field, value in values.items():
+            index = self.indexes.get(field)
+            if index is not None and row.get(field) is not None:
+                index[row[field]].discard(name)
+            row[field] = value
+            if index is not None and value is not None:
+                index[value].add(name)
+
+    def get(self, name):
+        return self.rows.get(name)
+
+    def lookup(self, field, value):
+        """Names matching field == value, or None if the field is not indexed"""
+        index = self.indexes.get(field)
+        if index is None:
+            return None
+        return set(index.get(value, ()))
+
+    def scan(self):
+        return iter(self.rows.values())
+
+    def __len__(self):
+        return len(self.rows)
+
+
+class SyntheticTable(Table):
+    """
+    A table of `size` generated rows plus any inserted ones
+    make_row(i) builds row i; parse(field, value) maps an indexed value back to i
+    """
+
+    def __init__(self, size, make_row, parse, indexed=()):
+        super().__init__(indexed)
+        self.size = size
+        self.make_row = make_row
+        self.parse = parse
+
+    def get(self, name):
+        row = self.rows.get(name)
+        if row is None:
+            i = self.parse("name", name)
+            if i is not None and i < self.size:
+                row = self.make_row(i)
+        return row
+
+    def lookup(self, field, value):
+        names = super().lookup(field, value)
+        if names is None:
+            return None
+        i = self.parse(field, value)
+        if i is not None and i < self.size:
+            name = self.make_row(i)["name"]
+            # An update may have moved the generated row off this value
+            if name not in self.rows or self.rows[name].get(field) == value:
+                names.add(name)
+        return names
+
+    def scan(self):
+        raise NotImplementedError("Synthetic tables only support indexed lookups")
+
+    def __len__(self):
+        return self.size + sum(1 for name in self.rows if self.parse("name", name) is None)
+
+
+def _match(row, filters):
+    for field, (op, value) in filters.items():
+        current = row.get(field)
+        if op == "=" and current != value:
+            return False
+        if op == "!=" and current == value:
+            return False
+        if op == "in" and current not in value:
+            return False
+        if op == ">" and not (current is not None and current > value):
+            return False
+        if op == "<" and not (current is not None and current < value):
+            return False
+    return True
+
+
+def _normalize_filters(filters):
+    normalized = {}
+    if isinstance(filters, dict):
+        for field, value in filters.items():
+            if isinstance(value, (list, tuple)):
+                normalized[field] = (value[0], value[1])
+            else:
+                normalized[field] = ("=", value)
+    elif filters:
+        for field, op, value in (f[-3:] for f in filters):
+            normalized[field] = (op, value)
+    return normalized
+
+
+class Database:
+    """frappe.db over in-memory tables; every call counts as one query"""
+
+    def __init__(self):
+        self.tables = {}
+        self.globals = {}
+        self.after_commit = CallbackList()
+        self.after_rollback = CallbackList()
+        self.reset_counters()
+
+    def reset_counters(self):
+        self.queries = 0
+        self.writes = 0
+
+    def table(self, doctype):
+        return self.tables.setdefault(doctype, Table())
+
+    def _candidates(self, table, filters):
+        for field, (op, value) in filters.items():
+            if op == "=":
+                names = table.lookup(field, value)
+                if names is not None:
+                    return [table.get(name) for name in names]
+            if field == "name" and op == "in":
+                return [row for row in map(table.get, value) if row]
+        if "name" in filters and filters["name"][0] == "=":
+            row = table.get(filters["name"][1])
+            return [row] if row else []
+        return list(table.scan())
+
+    def select(self, doctype, filters=None, or_filters=None, fields=None, limit=None,
+               order_by=None, as_list=False, pluck=None, for_update=False):
+        self.queries += 1
+        table = self.table(doctype)
+        filters = _normalize_filters(filters)
+
+        if or_filters:
+            seen, rows = set(), []
+            for field, condition in _normalize_filters(or_filters).items():
+                for row in self._candidates(table, {field: condition, **filters}):
+                    if row["name"] not in seen and _match(row, {field: condition, **filters}):
+                        seen.add(row["name"])
+                        rows.append(row)
+        else:
+            rows = [row for row in self._candidates(table, filters) if _match(row, filters)]
+
+        if order_by:
+            field, _, direction = order_by.split(",")[0].strip().partition(" ")
+            rows.sort(key=lambda r: (r.get(field) is None, 0 if r.get(field) is None else r.get(field)),
+                      reverse=direction.strip().lower() == "desc")
+        if limit:
+            rows = rows[:int(limit)]
+
+        if pluck:
+            return [row.get(pluck) for row in rows]
+        fields = [f.split(" as ")[-1].strip() for f in (fields or ["name"])]
+        if as_list:
+            return [tuple(row.get(f) for f in fields) for row in rows]
+        return [_dict({f: row.get(f) for f in fields}) for row in rows]
+
+    def get_value(self, doctype, filters=None, fieldname="name", as_dict=False, **kwargs):
+        self.queries += 1
+        table = self.table(doctype)
+        if isinstance(filters, str) or filters is None:
+            row = table.get(filters) if filters else None
+        else:
+            self.queries -= 1
+            matches = self.select(doctype, filters, fields=["name"], limit=1)
+            row = table.get(matches[0].name) if matches else None
+        if row is None:
+            return None
+        if isinstance(fieldname, (list, tuple)):
+            values = _dict({f: row.get(f) for f in fieldname})
+            return values if as_dict else tuple(values.values())
+        return row.get(fieldname)
+
+    def set_value(self, doctype, name, fieldname, value=None, update_modified=True):
+        self.queries += 1
+        self.writes += 1
+        values = fieldname if isinstance(fieldname, dict) else {fieldname: value}
+        self.table(doctype).update(name, dict(values))
+
+    def exists(self, doctype, filters=None):
+        if isinstance(filters, str):
+            self.queries += 1
+            return filters if self.table(doctype).get(filters) else None
+        return self.get_value(doctype, filters, "name")
+
+    def sql(self, query, values=None, as_dict=False, **kwargs):
+        self.queries += 1
+        if query.lstrip().upper().startswith(("UPDATE", "INSERT", "DELETE")):
+            self.writes += 1
+        return []
+
+    def get_global(self, key):
+        self.queries += 1
+        return self.globals.get(key)
+
+    def set_global(self, key, value):
+        self.queries += 1
+        self.writes += 1
+        self.globals[key] = value
+
+    def savepoint(self, name):
+        pass
+
+    def commit(self):
+        self.after_commit.run()
+        self.after_rollback[:] = []
+
+    def rollback(self, save_point=None):
+        if save_point:
+            return
+        self.after_rollback.run()
+        self.after_commit[:] = []
+
+
+class _Row(_dict):
+    """Child table row; fields are plain attributes, as on a real child Document"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        object.__setattr__(self, "__dict__", self)
+
+
+class Document(_dict):
+    """Enough of frappe.model.document.Document for hooks and inserts"""
+
+    def __init__(self, data=None, db=None):
+        super().__init__()
+        object.__setattr__(self, "_db", db)
+        object.__setattr__(self, "_before_save", None)
+        for key, value in (data or {}).items():
+            if isinstance(value, list):
+                value = [_Row(child) for child in value]
+            self[key] = value
+
+    @property
+    def items(self):
+        # The child table, not dict.items
+        return dict.get(self, "items")
+
+    def append(self, fieldname, row):
+        row = _Row(row)
+        self.setdefault(fieldname, []).append(row)
+        return row
+
+    def get_doc_before_save(self):
+        return self._before_save
+
+    def as_dict(self):
+        return _dict(self)
+
+    def insert(self, ignore_permissions=False):
+        stub = _stub
+        if not self.get("name"):
+            stub.name_counter += 1
+            self["name"] = f"{self.doctype[:3].upper()}-{stub.name_counter:07d}"
+        self.setdefault("creation", stub.frappe.utils.now())
+        self._db.queries += 1
+        self._db.writes += 1
+        self._db.table(self.doctype).insert(dict(self))
+        return self
+
+    def save(self, ignore_permissions=False):
+        self._db.queries += 1
+        self._db.writes += 1
+        self._db.table(self.doctype).update(self.name, dict(self))
+        return self
+
+
+class CookieManager:
+    def __init__(self):
+        self.cookies = {}
+
+    def get_cookie(self, key):
+        return self.cookies.get(key)
+
+    def set_cookie(self, key, value, **kwargs):
+        self.cookies[key] = value
+
+    def delete_cookie(self, key):
+        self.cookies.pop(key, None)
+
+
+class _Lock:
+    def acquire(self, *args, **kwargs):
+        return True
+
+    def release(self):
+        pass
+
+
+class _Pipeline:
+    def __init__(self, cache):
+        self.cache = cache
+        self.ops = []
+
+    def __getattr__(self, name):
+        def queue(*args, **kwargs):
+            self.ops.append((name, args, kwargs))
+            return self
+        return queue
+
+    def execute(self):
+        ops, self.ops = self.ops, []
+        return [getattr(self.cache, f"_raw_{name}")(*args, **kwargs) for name, args, kwargs in ops]
+
+
+class Cache:
+    """RedisWrapper stand-in; counts round trips as `calls`"""
+
+    def __init__(self):
+        self.store = {}
+        self.calls = 0
+
+    def make_key(self, key, *args, **kwargs):
+        return f"stub|{key}"
+
+    def get_value(self, key, *args, **kwargs):
+        self.calls += 1
+        return self.store.get(self.make_key(key))
+
+    def set_value(self, key, value, *args, **kwargs):
+        self.calls += 1
+        self.store[self.make_key(key)] = value
+
+    def delete_value(self, keys, *args, **kwargs):
+        self.calls += 1
+        for key in keys if isinstance(keys, (list, tuple)) else [keys]:
+            self.store.pop(self.make_key(key), None)
+
+    def get(self, key):
+        self.calls += 1
+        return self.store.get(key)
+
+    def set(self, key, value, *args, **kwargs):
+        self.calls += 1
+        self.store[key] = value
+
+    def incr(self, key, amount=1):
+        self.calls += 1
+        self.store[key] = int(self.store.get(key) or 0) + amount
+        return self.store[key]
+
+    def lock(self, *args, **kwargs):
+        return _Lock()
+
+    def pipeline(self, *args, **kwargs):
+        self.calls += 1
+        return _Pipeline(self)
+
+    def _raw_hincrby(self, key, field, amount=1):
+        bucket = self.store.setdefault(key, {})
+        bucket[field] = int(bucket.get(field, 0)) + amount
+        return bucket[field]
+
+    def _raw_hget(self, key, field):
+        return self.store.get(key, {}).get(field)
+
+    def _raw_rpush(self, key, value):
+        self.store.setdefault(key, []).append(value)
+        return len(self.store[key])
+
+
+class Stub:
+    """Handle on the installed stand-in"""
+
+    def __init__(self):
+        self.db = Database()
+        self.cache = Cache()
+        self.name_counter = 0
+        self.frappe = None
+
+    def new_request(self, user="Guest", cookies=None):
+        """Start a fresh request: new frappe.local, same database and cache"""
+        local = types.SimpleNamespace()
+        local.db = self.db
+        local.conf = _dict()
+        local.cookie_manager = CookieManager()
+        local.cookie_manager.cookies.update(cookies or {})
+        local.session = _dict(user=user)
+        self.frappe.local = local
+        self.frappe.conf = local.conf
+        self.frappe.session = local.session
+        return local
+
+
+_stub = None
+
+
+def install():
+    """Register the stub as `frappe` and the repository as the app package"""
+    global _stub
+    if _stub is not None:
+        return _stub
+
+    stub = _stub = Stub()
+
+    frappe = types.ModuleType("frappe")
+    frappe._ = lambda text: text
+    frappe._dict = _dict
+    frappe.ValidationError = ValidationError
+    frappe.DuplicateEntryError = DuplicateEntryError
+    frappe.DoesNotExistError = DoesNotExistError
+    frappe.throw = _throw
+    frappe.msgprint = lambda *args, **kwargs: None
+    frappe.log_error = lambda *args, **kwargs: None
+    frappe.logger = lambda *args, **kwargs: types.SimpleNamespace(info=lambda *a, **k: None)
+    frappe.as_json = lambda obj, indent=None: json.dumps(obj, default=str, separators=(",", ":"))
+    frappe.scrub = lambda text: text.replace(" ", "_").replace("-", "_").lower()
+    frappe.cache = lambda: stub.cache
+    frappe.db = stub.db
+    frappe.whitelist = lambda *args, **kwargs: (lambda fn: fn)
+    frappe.get_all = stub.db.select
+    frappe.get_list = stub.db.select
+    frappe.new_doc = lambda doctype: Document({"doctype": doctype}, stub.db)
+
+    def get_doc(doctype, name=None):
+        if isinstance(doctype, dict):
+            return Document(doctype, stub.db)
+        stub.db.queries += 1
+        row = stub.db.table(doctype).get(name)
+        if row is None:
+            raise DoesNotExistError(f"{doctype} {name} not found")
+        return Document(dict(row, doctype=doctype), stub.db)
+
+    frappe.get_doc = get_doc
+    stub.frappe = frappe
+
+    utils = types.ModuleType("frappe.utils")
+    utils.now_datetime = datetime.datetime.now
+    utils.now = lambda: datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S.%f")
+    utils.nowdate = lambda: datetime.date.today().isoformat()
+    utils.get_datetime = lambda value: value if isinstance(value, datetime.datetime) \
+        else datetime.datetime.fromisoformat(str(value))
+    utils.flt = lambda value, precision=None: round(float(value or 0), precision) \
+        if precision is not None else float(value or 0)
+    utils.cint = lambda value: int(value or 0)
+    email_re = re.compile(r"^[^@\s]+@[^@\s]+\.[^@\s]+$")
+    utils.validate_email_address = lambda email, throw=False: email if email_re.match(email or "") else ""
+    utils.validate_phone_number = lambda phone, throw=False: bool(re.match(r"^[+\d][\d\s-]{6,}$", phone or ""))
+    frappe.utils = utils
+
+    nestedset = types.ModuleType("frappe.utils.nestedset")
+    nestedset.get_descendants_of = lambda doctype, name, *args, **kwargs: []
+    utils.nestedset = nestedset
+
+    model = types.ModuleType("frappe.model")
+    document = types.ModuleType("frappe.model.document")
+    document.Document = Document
+    model.document = document
+
+    sys.modules.update({
+        "frappe": frappe,
+        "frappe.utils": utils,
+        "frappe.utils.nestedset": nestedset,
+        "frappe.model": model,
+        "frappe.model.document": document,
+    })
+
+    # The repository root is the `sa7ba_custom` app package
+    package = types.ModuleType(APP_PACKAGE)
+    package.__path__ = [REPO_ROOT]
+    sys.modules[APP_PACKAGE] = package
+
+    stub.new_request()
+    return stub
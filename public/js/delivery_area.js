@@ -16,29 +16,137 @@ class DeliveryAreaManager {
         if (this.isInitialized) return;
         
         try {
-            await this.loadAreas();
+            const embedded = await this.loadAreas();
             this.setupEventListeners();
             this.restoreSelectedArea();
             this.isInitialized = true;
+            
+            // An old page (restored tab, cached HTML) revalidates its copy in the background
+            if (embedded && embedded.stale) {
+                this.revalidateAreas(embedded.version);
+            }
         } catch (error) {
             console.error('Failed to initialize delivery area manager:', error);
         }
     }
     
+    /**
+     * Load the area list, preferring the copy embedded in the page at render
+     * time; the network is only used when nothing was embedded.
+     * Returns the embedded data, if any.
+     */
     async loadAreas() {
+        const embedded = this.getEmbeddedAreas();
+        if (embedded) {
+            this.areas = embedded.areas;
+            this.setCachedAreas(embedded.version, embedded.areas);
+            this.renderAreaSelector();
+            return embedded;
+        }
+        
+        // Nothing to render on this page
+        if (!document.getElementById('delivery-area-container')) return null;
+        
+        const cached = this.getCachedAreas();
+        
         try {
-            const response = await fetch('/api/method/sa7ba_custom.api.get_delivery_areas');
-            const result = await response.json();
+            const response = await this.fetchAreas(cached && cached.version);
             
-            if (result.success) {
+            if (response.status === 304 && cached) {
+                this.areas = cached.areas;
+            } else if (response.ok) {
+                const result = await response.json();
                 this.areas = result.message || [];
-                this.renderAreaSelector();
+                this.setCachedAreas(response.headers.get('ETag'), this.areas);
             } else {
-                throw new Error(result.error || 'Failed to load delivery areas');
+                throw new Error(`Failed to load delivery areas (${response.status})`);
             }
+            
+            this.renderAreaSelector();
         } catch (error) {
             console.error('Failed to load delivery areas:', error);
-            this.showError('Failed to load delivery areas. Please refresh the page.');
+            if (cached) {
+                this.areas = cached.areas;
+                this.renderAreaSelector();
+            } else {
+                this.showError('Failed to load delivery areas. Please refresh the page.');
+            }
+        }
+        return null;
+    }
+    
+    fetchAreas(version) {
+        const headers = {};
+        if (version) {
+            headers['If-None-Match'] = version;
+        }
+        
+        const fields = DeliveryAreaManager.AREA_FIELDS.join(',');
+        return fetch(
+            `/api/method/sa7ba_custom.api.get_delivery_areas?fields=${fields}`,
+            { headers: headers }
+        );
+    }
+    
+    async revalidateAreas(version) {
+        try {
+            const response = await this.fetchAreas(version);
+            // 304: the embedded copy is still current
+            if (response.status !== 200) return;
+            
+            const result = await response.json();
+            this.areas = result.message || [];
+            this.setCachedAreas(response.headers.get('ETag'), this.areas);
+            
+            const select = document.getElementById('delivery-area-select');
+            const selected = select ? select.value : '';
+            this.renderAreaSelector();
+            this.bindSelectorEvents();
+            
+            const refreshed = document.getElementById('delivery-area-select');
+            if (refreshed && selected) {
+                refreshed.value = selected;
+            }
+        } catch (error) {
+            console.error('Failed to revalidate delivery areas:', error);
+        }
+    }
+    
+    getEmbeddedAreas() {
+        const script = document.getElementById('sa7ba-delivery-areas');
+        if (!script) return null;
+        
+        try {
+            const data = JSON.parse(script.textContent);
+            if (!data.version || !Array.isArray(data.areas)) return null;
+            
+            const renderedAt = parseInt(script.dataset.renderedAt, 10) || 0;
+            data.stale = Date.now() / 1000 - renderedAt > DeliveryAreaManager.EMBEDDED_AREAS_MAX_AGE;
+            return data;
+        } catch (error) {
+            return null;
+        }
+    }
+    
+    getCachedAreas() {
+        try {
+            const cached = JSON.parse(localStorage.getItem(DeliveryAreaManager.AREAS_CACHE_KEY));
+            return cached && cached.version && Array.isArray(cached.areas) ? cached : null;
+        } catch (error) {
+            return null;
+        }
+    }
+    
+    setCachedAreas(version, areas) {
+        if (!version) return;
+        
+        try {
+            localStorage.setItem(DeliveryAreaManager.AREAS_CACHE_KEY, JSON.stringify({
+                version: version,
+                areas: areas
+            }));
+        } catch (error) {
+            // Storage full or disabled; the next load simply refetches
         }
     }
     
@@ -51,6 +159,20 @@ class DeliveryAreaManager {
                 <h4 class="mb-3">Select Delivery Area *</h4>
                 <p class="text-muted mb-3">Delivery charges apply to all orders</p>
                 
+        `;
+        
+        // Long lists are hard to scroll on mobile; offer type-ahead search
+        if (this.areas.length > DeliveryAreaManager.SEARCH_THRESHOLD) {
+            html += `
+                <div class="form-group mb-2 delivery-area-search">
+                    <input type="search" class="form-control" id="delivery-area-search"
+                           placeholder="Search your area / ابحث عن منطقتك" autocomplete="off">
+                    <div id="delivery-area-search-results" class="list-group"></div>
+                </div>
+            `;
+        }
+        
+        html += `
                 <div class="form-group">
                     <select class="form-control form-control-lg" id="delivery-area-select" required>
                         <option value="">-- Choose your area --</option>
@@ -96,6 +218,18 @@ class DeliveryAreaManager {
     }
     
     setupEventListeners() {
+        this.bindSelectorEvents();
+        
+        // Handle cart page area selection
+        const cartSelect = document.getElementById('cart-delivery-area');
+        if (cartSelect) {
+            cartSelect.addEventListener('change', (e) => {
+                this.handleCartAreaChange(e.target.value);
+            });
+        }
+    }
+    
+    bindSelectorEvents() {
         const select = document.getElementById('delivery-area-select');
         if (select) {
             select.addEventListener('change', (e) => {
@@ -103,12 +237,52 @@ class DeliveryAreaManager {
             });
         }
         
-        // Handle cart page area selection
-        const cartSelect = document.getElementById('cart-delivery-area');
-        if (cartSelect) {
-            cartSelect.addEventListener('change', (e) => {
-                this.handleCartAreaChange(e.target.value);
+        const search = document.getElementById('delivery-area-search');
+        if (search) {
+            let timer = null;
+            search.addEventListener('input', (e) => {
+                clearTimeout(timer);
+                timer = setTimeout(() => this.renderSearchResults(e.target.value), 150);
+            });
+        }
+    }
+    
+    async searchAreas(query, limit = 8) {
+        const params = new URLSearchParams({ q: query, limit: limit });
+        const response = await fetch(`/api/method/sa7ba_custom.api.search_delivery_areas?${params}`);
+        const result = await response.json();
+        return result.message || [];
+    }
+    
+    async renderSearchResults(query) {
+        const results = document.getElementById('delivery-area-search-results');
+        if (!results) return;
+        
+        if (!query || query.trim().length < 2) {
+            results.innerHTML = '';
+            return;
+        }
+        
+        try {
+            const areas = await this.searchAreas(query.trim());
+            results.innerHTML = areas.map(area => `
+                <button type="button" class="list-group-item list-group-item-action"
+                        data-area-code="${area.area_code}">
+                    ${area.area_name}${area.area_name_ar ? ` - ${area.area_name_ar}` : ''}
+                    <small class="text-muted">KWD ${parseFloat(area.delivery_charge).toFixed(3)}</small>
+                </button>
+            `).join('');
+            
+            results.querySelectorAll('[data-area-code]').forEach(button => {
+                button.addEventListener('click', () => {
+                    const select = document.getElementById('delivery-area-select');
+                    select.value = button.dataset.areaCode;
+                    select.dispatchEvent(new Event('change'));
+                    results.innerHTML = '';
+                });
             });
+        } catch (error) {
+            console.error('Area search failed:', error);
         }
     }
     
@@ -145,90 +319,111 @@ class DeliveryAreaManager {
             return;
         }
         
-        const select = document.getElementById('cart-delivery-area');
-        const selectedOption = select.options[select.selectedIndex];
-        const charge = parseFloat(selectedOption.textContent.split('KWD ')[1]) || 0;
-        
         try {
-            const response = await fetch('/api/method/sa7ba_custom.api.update_cart_delivery', {
-                method: 'POST',
-                headers: {
-                    'Content-Type': 'application/json',
-                    'X-Frappe-CSRF-Token': frappe.csrf_token
-                },
-                body: JSON.stringify({
-                    area_code: areaCode,
-                    delivery_charge: charge
-                })
-            });
-            
-            const result = await response.json();
-            
-            if (result.success) {
-                // Refresh cart display
-                this.refreshCartDisplay();
-                sessionStorage.setItem('selected_delivery_area', areaCode);
-            } else {
-                this.showError(result.error || 'Failed to update cart');
-            }
+            const result = await this.applyCartOperations([{ op: 'set_area', area_code: areaCode }]);
+            // Refresh cart display
+            this.refreshCartDisplay(result);
+            sessionStorage.setItem('selected_delivery_area', areaCode);
         } catch (error) {
             console.error('Failed to update cart:', error);
-            this.showError('Failed to update cart. Please try again.');
+            this.showError(error.message || 'Failed to update cart. Please try again.');
         }
     }
     
     async updateCartDeliveryCharge() {
         try {
-            const response = await fetch('/api/method/sa7ba_custom.api.update_cart_delivery', {
-                method: 'POST',
-                headers: {
-                    'Content-Type': 'application/json',
-                    'X-Frappe-CSRF-Token': frappe.csrf_token
-                },
-                body: JSON.stringify({
-                    area_code: this.selectedArea,
-                    delivery_charge: this.deliveryCharge
-                })
-            });
-            
-            const result = await response.json();
-            
-            if (result.success) {
-                // Refresh cart totals
-                this.refreshCartDisplay();
-            } else {
-                this.showError(result.error || 'Failed to update cart');
-            }
+            // Priced server side; the charge shown in the selector is only a preview
+            const result = await this.applyCartOperations([{ op: 'set_area', area_code: this.selectedArea }]);
+            // Refresh cart totals
+            this.refreshCartDisplay(result);
         } catch (error) {
             console.error('Failed to update cart:', error);
-            this.showError('Failed to update cart. Please try again.');
+            this.showError(error.message || 'Failed to update cart. Please try again.');
         }
     }
     
     async removeDeliveryCharge() {
         try {
-            const response = await fetch('/api/method/sa7ba_custom.api.remove_delivery_charge', {
-                method: 'POST',
-                headers: {
-                    'Content-Type': 'application/json',
-                    'X-Frappe-CSRF-Token': frappe.csrf_token
-                }
-            });
-            
-            const result = await response.json();
-            
-            if (result.success) {
-                this.refreshCartDisplay();
-                sessionStorage.removeItem('selected_delivery_area');
-            }
+            const result = await this.applyCartOperations([{ op: 'clear_area' }]);
+            this.refreshCartDisplay(result);
+            sessionStorage.removeItem('selected_delivery_area');
         } catch (error) {
             console.error('Failed to remove delivery charge:', error);
         }
     }
     
-    refreshCartDisplay() {
-        // This would call Webshop's cart refresh
-        // Implementation depends on how Webshop handles cart updates
+    addCartItem(itemCode, qty = 1) {
+        return this.applyCartOperations([{ op: 'add', item_code: itemCode, qty: qty }]);
+    }
+    
+    setCartItemQty(itemCode, qty) {
+        return this.applyCartOperations([{ op: 'set_qty', item_code: itemCode, qty: qty }]);
+    }
+    
+    removeCartItem(itemCode) {
+        return this.applyCartOperations([{ op: 'remove', item_code: itemCode }]);
+    }
+    
+    /**
+     * Queue cart operations. Everything queued in the same tick is sent to
+     * apply_cart_operations as one batch (one request, one recompute, one save).
+     * Resolves with {cart, diff} for the batch.
+     */
+    applyCartOperations(ops) {
+        this.pendingCartOperations = (this.pendingCartOperations || []).concat(ops);
+        
+        if (!this.pendingCartBatch) {
+            this.pendingCartBatch = new Promise(resolve => setTimeout(resolve, 0))
+                .then(() => this.sendCartOperations());
+        }
+        return this.pendingCartBatch;
+    }
+    
+    async sendCartOperations() {
+        const ops = this.pendingCartOperations;
+        this.pendingCartOperations = [];
+        this.pendingCartBatch = null;
+        
+        const response = await fetch('/api/method/sa7ba_custom.api.apply_cart_operations', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+                'X-Frappe-CSRF-Token': frappe.csrf_token
+            },
+            body: JSON.stringify({ ops: ops })
+        });
+        
+        const result = (await response.json()).message || {};
+        if (!result.success) {
+            throw new Error(result.error || 'Failed to update cart');
+        }
+        return result;
+    }
+    
+    /**
+     * Patch the cart totals in place from a cart endpoint response by updating
+     * every [data-cart-field] element from the summary. Only values change, so
+     * the labels keep the language the page is showing. Returns false without
+     * a summary.
+     */
+    patchCartTotals(result) {
+        if (!result || !result.summary) return false;
+        
+        document.querySelectorAll('[data-cart-field]').forEach(el => {
+            const value = result.summary[el.dataset.cartField];
+            if (value !== undefined) {
+                el.textContent = value === null ? '' : value;
+            }
+        });
+        
+        document.dispatchEvent(new CustomEvent('sa7ba:cart-updated', { detail: result }));
+        return true;
+    }
+    
+    refreshCartDisplay(result) {
+        // Totals come back with every cart operation; no page render needed
+        if (this.patchCartTotals(result)) return;
+        
         if (window.updateCartTotals) {
             window.updateCartTotals();
         } else if (typeof frappe !== 'undefined' && frappe.cart) {
@@ -276,12 +471,18 @@ class DeliveryAreaManager {
     
     // Guest checkout specific methods
     async processGuestCheckout(guestInfo) {
+        // One key per checkout attempt, reused on retries and double-clicks
+        if (!this.checkoutIdempotencyKey) {
+            this.checkoutIdempotencyKey = DeliveryAreaManager.newIdempotencyKey();
+        }
+        
         try {
             const response = await fetch('/api/method/sa7ba_custom.api.process_guest_checkout', {
                 method: 'POST',
                 headers: {
                     'Content-Type': 'application/json',
-                    'X-Frappe-CSRF-Token': frappe.csrf_token
+                    'X-Frappe-CSRF-Token': frappe.csrf_token,
+                    'Idempotency-Key': this.checkoutIdempotencyKey
                 },
                 body: JSON.stringify({
                     cart_data: {}, // Current cart data
@@ -289,9 +490,10 @@ class DeliveryAreaManager {
                 })
             });
             
-            const result = await response.json();
+            const result = (await response.json()).message || {};
             
             if (result.success) {
+                this.checkoutIdempotencyKey = null;
                 return result;
             } else {
                 throw new Error(result.error || 'Guest checkout failed');
@@ -325,6 +527,19 @@ class DeliveryAreaManager {
     }
 }
 
+DeliveryAreaManager.AREAS_CACHE_KEY = 'sa7ba_delivery_areas';
+DeliveryAreaManager.SEARCH_THRESHOLD = 30;
+// Seconds after which an embedded area list is revalidated against the server
+DeliveryAreaManager.EMBEDDED_AREAS_MAX_AGE = 300;
+DeliveryAreaManager.AREA_FIELDS = ['area_code', 'area_name', 'delivery_charge', 'estimated_delivery_time'];
+
+DeliveryAreaManager.newIdempotencyKey = function() {
+    if (window.crypto && window.crypto.randomUUID) {
+        return window.crypto.randomUUID();
+    }
+    return `${Date.now().toString(36)}-${Math.random().toString(36).slice(2, 12)}`;
+};
+
 // Initialize on page load
 document.addEventListener('DOMContentLoaded', function() {
     window.deliveryAreaManager = new DeliveryAreaManager();
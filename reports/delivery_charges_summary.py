@@ -19,75 +19,71 @@ def execute(filters=None):
     return columns, data
 
 def get_delivery_charges_data(filters):
-    """Get delivery charges data from sales orders"""
+    """Get delivery charges data from the daily per-area rollup"""
     
     # Get date range from filters
     from_date = filters.get("from_date") if filters else None
     to_date = filters.get("to_date") if filters else None
     
     # Build query conditions
-    conditions = ["so.docstatus = 1"]
-    if from_date:
-        conditions.append(f"so.transaction_date >= '{from_date}'")
-    if to_date:
-        conditions.append(f"so.transaction_date <= '{to_date}'")
-    
-    where_clause = " AND ".join(conditions)
+    where_clause = get_conditions(from_date, to_date)
     
     query = f"""
         SELECT 
             da.area_name as delivery_area,
             da.area_code,
-            COUNT(DISTINCT so.name) as order_count,
-            COALESCE(SUM(soi.amount), 0) as total_delivery_charges,
-            COALESCE(AVG(so.grand_total), 0) as average_order_value,
+            COALESCE(SUM(st.order_count), 0) as order_count,
+            COALESCE(SUM(st.delivery_revenue), 0) as total_delivery_charges,
+            COALESCE(SUM(st.grand_total_sum) / NULLIF(SUM(st.order_count), 0), 0) as average_order_value,
             da.delivery_charge as delivery_charge_rate,
             da.estimated_delivery_time
         FROM `tabDelivery Area` da
-        LEFT JOIN `tabAddress` addr ON addr.custom_delivery_area = da.name
-        LEFT JOIN `tabSales Order` so ON so.shipping_address_name = addr.name AND {where_clause}
-        LEFT JOIN `tabSales Order Item` soi ON soi.parent = so.name AND soi.item_code = 'DELIVERY-CHARGE'
+        LEFT JOIN `tabDelivery Area Daily Stats` st ON st.delivery_area = da.name AND {where_clause}
         WHERE da.is_active = 1
         GROUP BY da.name, da.area_name, da.area_code, da.delivery_charge, da.estimated_delivery_time
         ORDER BY da.area_name
     """
     
-    data = frappe.db.sql(query, as_dict=True)
+    data = frappe.db.sql(query, {"from_date": from_date, "to_date": to_date}, as_dict=True)
     
     # Format currency values
     for row in data:
+        row["order_count"] = int(row["order_count"] or 0)
         row["total_delivery_charges"] = float(row["total_delivery_charges"] or 0)
         row["average_order_value"] = float(row["average_order_value"] or 0)
         row["delivery_charge_rate"] = float(row["delivery_charge_rate"] or 0)
     
     return data
 
+def get_conditions(from_date, to_date):
+    """Rollup conditions for the date range (values bound as query params)"""
+    conditions = ["1 = 1"]
+    if from_date:
+        conditions.append("st.posting_date >= %(from_date)s")
+    if to_date:
+        conditions.append("st.posting_date <= %(to_date)s")
+    
+    return " AND ".join(conditions)
+
 def get_report_summary(filters):
     """Get report summary"""
     
     from_date = filters.get("from_date") if filters else None
     to_date = filters.get("to_date") if filters else None
     
-    conditions = ["so.docstatus = 1"]
-    if from_date:
-        conditions.append(f"so.transaction_date >= '{from_date}'")
-    if to_date:
-        conditions.append(f"so.transaction_date <= '{to_date}'")
-    
-    where_clause = " AND ".join(conditions)
+    where_clause = get_conditions(from_date, to_date)
     
     summary_query = f"""
         SELECT 
-            COUNT(DISTINCT so.name) as total_orders,
-            COUNT(DISTINCT CASE WHEN so.custom_is_guest_order = 1 THEN so.name END) as guest_orders,
-            COALESCE(SUM(soi.amount), 0) as total_delivery_charges,
-            COALESCE(AVG(so.grand_total), 0) as avg_order_value
-        FROM `tabSales Order` so
-        LEFT JOIN `tabSales Order Item` soi ON soi.parent = so.name AND soi.item_code = 'DELIVERY-CHARGE'
+            COALESCE(SUM(st.order_count), 0) as total_orders,
+            COALESCE(SUM(st.guest_order_count), 0) as guest_orders,
+            COALESCE(SUM(st.delivery_revenue), 0) as total_delivery_charges,
+            COALESCE(SUM(st.grand_total_sum) / NULLIF(SUM(st.order_count), 0), 0) as avg_order_value
+        FROM `tabDelivery Area Daily Stats` st
         WHERE {where_clause}
     """
     
-    summary = frappe.db.sql(summary_query, as_dict=True)
+    summary = frappe.db.sql(summary_query, {"from_date": from_date, "to_date": to_date}, as_dict=True)
     
     if summary:
         summary_data = summary[0]
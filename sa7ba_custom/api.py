@@ -1,13 +1,37 @@
 import frappe
 from frappe import _
-import json
+from sa7ba_custom.sa7ba_custom.custom.instrumentation import instrument
+from sa7ba_custom.sa7ba_custom.custom.rate_limit import rate_limited
 
 @frappe.whitelist(allow_guest=True)
-def process_guest_checkout(cart_data, guest_info):
+@rate_limited
+@instrument
+def process_guest_checkout(cart_data, guest_info, idempotency_key=None):
     """
     Process guest checkout - called from frontend
+    Retries with the same Idempotency-Key and payload replay the first successful response
     Returns: customer_id, order_id, or error
     """
+    from sa7ba_custom.sa7ba_custom.custom.idempotency import get_idempotency_key, run_idempotent
+    
+    from sa7ba_custom.sa7ba_custom.custom.customer import set_guest_customer_session
+    
+    guest_info = frappe.parse_json(guest_info)
+    response = run_idempotent(
+        "process_guest_checkout",
+        get_idempotency_key(idempotency_key),
+        lambda: _process_guest_checkout(cart_data, guest_info),
+        is_cacheable=lambda response: response.get("success"),
+        payload={"cart_data": frappe.parse_json(cart_data), "guest_info": guest_info}
+    )
+    
+    # Add customer to session for Webshop (also on replayed responses)
+    if response.get("success"):
+        set_guest_customer_session(response["customer_id"])
+    
+    return response
+
+def _process_guest_checkout(cart_data, guest_info):
     try:
         # Validate inputs
         if not guest_info.get('email') or not guest_info.get('phone'):
@@ -17,7 +41,7 @@ def process_guest_checkout(cart_data, guest_info):
         validate_guest_info(guest_info)
         
         # Create/retrieve guest customer
-        from sa7ba_custom.sa7ba_custom.custom.customer import create_guest_customer, set_guest_customer_session
+        from sa7ba_custom.sa7ba_custom.custom.customer import create_guest_customer
         customer_id = create_guest_customer(
             email=guest_info['email'],
             phone=guest_info['phone'],
@@ -25,9 +49,6 @@ def process_guest_checkout(cart_data, guest_info):
             last_name=guest_info.get('last_name', '')
         )
         
-        # Add customer to session for Webshop
-        set_guest_customer_session(customer_id)
-        
         return {
             "success": True,
             "customer_id": customer_id,
@@ -41,20 +62,85 @@ def process_guest_checkout(cart_data, guest_info):
             "error": str(e)
         }
 
+@frappe.whitelist()
+@instrument
+def place_order():
+    """
+    Webshop place_order; a retried submission returns the order it already placed
+    Override of webshop.webshop.shopping_cart.cart.place_order
+    """
+    from webshop.webshop.shopping_cart.cart import place_order as original_place_order
+    from sa7ba_custom.sa7ba_custom.custom.sales_order import DuplicateOrderError
+    
+    try:
+        return original_place_order()
+    except DuplicateOrderError as e:
+        # Drop this attempt's writes; the first submission's order stands
+        frappe.db.rollback()
+        frappe.clear_messages()
+        return e.order_name
+
+AREAS_CACHE_CONTROL = "public, max-age=0, must-revalidate"
+
 @frappe.whitelist(allow_guest=True)
-def get_delivery_areas():
-    """Return all active delivery areas"""
-    areas = frappe.get_all("Delivery Area",
-        filters={"is_active": 1},
-        fields=["area_code", "area_name", "delivery_charge", 
-                "estimated_delivery_time", "notes"],
-        order_by="area_name"
+@instrument
+def get_delivery_areas(fields=None):
+    """
+    Return all active delivery areas
+    Over HTTP, answers with an ETag and honours If-None-Match with a 304
+    """
+    from sa7ba_custom.sa7ba_custom.custom.area_registry import (
+        get_active_areas, get_active_areas_payload
     )
-    return areas
+    
+    fields = parse_area_fields(fields)
+    
+    request = getattr(frappe.local, "request", None)
+    if not request:
+        return get_active_areas(fields)
+    
+    from werkzeug.wrappers import Response
+    etag, body = get_active_areas_payload(fields)
+    headers = {"ETag": etag, "Cache-Control": AREAS_CACHE_CONTROL}
+    
+    if etag in request.headers.get("If-None-Match", ""):
+        return Response(status=304, headers=headers)
+    
+    return Response(body, status=200, headers=headers,
+                    content_type="application/json; charset=utf-8")
 
 @frappe.whitelist(allow_guest=True)
-def update_cart_delivery(area_code, delivery_charge):
-    """Update cart with delivery charge"""
+@instrument
+def search_delivery_areas(q, limit=10):
+    """Typo-tolerant area search for checkout autocomplete (served from memory)"""
+    from sa7ba_custom.sa7ba_custom.custom.area_search import search_areas
+    return search_areas(q, limit)
+
+def parse_area_fields(fields):
+    """Validate a field projection for get_delivery_areas"""
+    from sa7ba_custom.sa7ba_custom.custom.area_registry import PUBLIC_AREA_FIELDS
+    
+    if not fields:
+        return PUBLIC_AREA_FIELDS
+    
+    if isinstance(fields, str):
+        fields = frappe.parse_json(fields) if fields.startswith("[") else fields.split(",")
+    
+    fields = tuple(f.strip() for f in fields if f and f.strip())
+    invalid = [f for f in fields if f not in PUBLIC_AREA_FIELDS]
+    if invalid:
+        frappe.throw(_("Invalid delivery area fields: {0}").format(", ".join(invalid)))
+    
+    return fields or PUBLIC_AREA_FIELDS
+
+@frappe.whitelist(allow_guest=True)
+@rate_limited
+@instrument
+def update_cart_delivery(area_code, delivery_charge=None):
+    """
+    Update cart with delivery charge (priced server side; the client value is ignored)
+    Returns the cart summary the cart page patches its totals from
+    """
     try:
         # Validate area code
         if not area_code:
@@ -64,10 +150,8 @@ def update_cart_delivery(area_code, delivery_charge):
             }
         
         # Check if area exists and is active
-        area = frappe.db.exists("Delivery Area", {
-            "area_code": area_code,
-            "is_active": 1
-        })
+        from sa7ba_custom.sa7ba_custom.custom.area_registry import get_area
+        area = get_area(area_code)
         
         if not area:
             return {
@@ -85,14 +169,18 @@ def update_cart_delivery(area_code, delivery_charge):
         updated_cart = cart_manager.update_cart_with_delivery(cart, area_code)
         
         # Save updated cart
-        frappe.local.cookie_manager.set_cookie('cart', json.dumps(updated_cart))
+        from sa7ba_custom.sa7ba_custom.custom.cart_store import save_cart
+        from sa7ba_custom.sa7ba_custom.custom.cart_totals import get_stored_totals
+        from sa7ba_custom.sa7ba_custom.custom.money import from_fils
+        save_cart(updated_cart)
         frappe.local.cookie_manager.set_cookie('selected_delivery_area', area_code)
         
         return {
             "success": True,
             "message": "Cart updated with delivery charge",
-            "delivery_charge": delivery_charge,
-            "cart_total": updated_cart.get("total", 0)
+            "delivery_charge": from_fils(get_stored_totals(updated_cart).delivery_charge),
+            "cart_total": updated_cart.get("total", 0),
+            **get_cart_refresh(updated_cart, area_code)
         }
     except Exception as e:
         frappe.log_error(f"Cart update failed: {str(e)}")
@@ -102,6 +190,8 @@ def update_cart_delivery(area_code, delivery_charge):
         }
 
 @frappe.whitelist(allow_guest=True)
+@rate_limited
+@instrument
 def validate_guest_info(guest_info):
     """Validate guest checkout information"""
     errors = []
@@ -126,13 +216,16 @@ def validate_guest_info(guest_info):
         frappe.throw("<br>".join(errors))
 
 @frappe.whitelist(allow_guest=True)
+@instrument
 def get_cart_summary():
     """Get cart summary with delivery information"""
     try:
         from webshop.webshop.doctype.webshop_settings.webshop_cart import get_cart
         from sa7ba_custom.sa7ba_custom.custom.cart import CustomShoppingCart
         
-        cart = get_cart()
+        from sa7ba_custom.sa7ba_custom.custom.cart_store import load_cart
+        
+        cart = load_cart() or get_cart()
         cart_manager = CustomShoppingCart()
         summary = cart_manager.get_cart_summary(cart)
         
@@ -148,6 +241,7 @@ def get_cart_summary():
         }
 
 @frappe.whitelist(allow_guest=True)
+@instrument
 def remove_delivery_charge():
     """Remove delivery charge from cart"""
     try:
@@ -159,7 +253,8 @@ def remove_delivery_charge():
         updated_cart = cart_manager.remove_delivery_charge(cart)
         
         # Save updated cart
-        frappe.local.cookie_manager.set_cookie('cart', json.dumps(updated_cart))
+        from sa7ba_custom.sa7ba_custom.custom.cart_store import save_cart
+        save_cart(updated_cart)
         frappe.local.cookie_manager.delete_cookie('selected_delivery_area')
         
         return {
@@ -175,6 +270,72 @@ def remove_delivery_charge():
         }
 
 @frappe.whitelist(allow_guest=True)
+@rate_limited
+@instrument
+def apply_cart_operations(ops):
+    """
+    Apply an ordered list of cart operations with one recompute and one save
+    ops: [{"op": "add" | "remove" | "set_qty", "item_code": ..., "qty": ...},
+          {"op": "set_area", "area_code": ...}, {"op": "clear_area"}]
+    Item operations update the webshop Quotation; area operations only move
+    the delivery line. Returns the final cart, a compact diff and the cart
+    summary; nothing is saved if any operation fails
+    """
+    try:
+        from sa7ba_custom.sa7ba_custom.custom.cart_operations import (
+            UNCHANGED, apply_operations, diff_summaries, parse_operations, price_cart, summarize_cart
+        )
+        from sa7ba_custom.sa7ba_custom.custom.cart_store import save_cart
+        from sa7ba_custom.sa7ba_custom.custom.cart_totals import TOTALS_KEY
+
+        from webshop.webshop.doctype.webshop_settings.webshop_cart import get_cart
+
+        ops = parse_operations(ops)
+
+        # The Quotation is the cart checkout orders; the stored cart only mirrors it
+        cart = get_cart()
+
+        cookies = frappe.local.cookie_manager
+        area_before = cookies.get_cookie('selected_delivery_area')
+        before = summarize_cart(cart, area_before)
+
+        cart, area_code = apply_operations(cart, ops)
+        if area_code is UNCHANGED:
+            area_code = area_before
+
+        # One recompute and one save for the whole batch
+        cart = price_cart(cart, area_code)
+        save_cart(cart)
+
+        if area_code != area_before:
+            if area_code:
+                cookies.set_cookie('selected_delivery_area', area_code)
+            else:
+                cookies.delete_cookie('selected_delivery_area')
+
+        return {
+            "success": True,
+            "cart": {key: value for key, value in cart.items() if key != TOTALS_KEY},
+            "diff": diff_summaries(before, summarize_cart(cart, area_code)),
+            **get_cart_refresh(cart, area_code)
+        }
+    except Exception as e:
+        # Undo the Quotation updates of the operations that did go through
+        frappe.db.rollback()
+        frappe.log_error(f"Cart operations failed: {str(e)}")
+        return {
+            "success": False,
+            "error": str(e)
+        }
+
+def get_cart_refresh(cart, area_code):
+    """Summary the cart page patches its [data-cart-field] totals from"""
+    from sa7ba_custom.sa7ba_custom.custom.cart_totals import summarize_totals
+    return {"summary": summarize_totals(cart, area_code)}
+
+@frappe.whitelist(allow_guest=True)
+@rate_limited
+@instrument
 def check_delivery_availability(area_code):
     """Check if delivery is available for the area"""
     try:
@@ -194,3 +355,13 @@ def check_delivery_availability(area_code):
             "success": False,
             "error": str(e)
         }
+
+@frappe.whitelist()
+def get_metrics():
+    """Instrumentation histograms in the Prometheus text format (System Manager only)"""
+    frappe.only_for("System Manager")
+    
+    from werkzeug.wrappers import Response
+    from sa7ba_custom.sa7ba_custom.custom.instrumentation import get_metrics_text
+    return Response(get_metrics_text(), status=200,
+                    content_type="text/plain; version=0.0.4; charset=utf-8")
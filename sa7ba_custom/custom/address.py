@@ -1,77 +1,161 @@
 import frappe
 from frappe import _
+from collections import namedtuple
+from sa7ba_custom.sa7ba_custom.custom.area_registry import get_area, get_area_by_name, get_area_charge, get_active_areas
+from sa7ba_custom.sa7ba_custom.custom.instrumentation import instrument
 
+ResolvedArea = namedtuple("ResolvedArea", ["name", "area_name", "delivery_charge", "estimated_delivery_time"])
+
+@instrument
 def validate_address(doc, method):
     """Validate address data"""
+    # Coordinates, when captured, decide the delivery area
+    area = get_area_from_coordinates(doc)
+    if area:
+        doc.custom_delivery_area = area
+    
     # Ensure delivery area is selected for Kuwait addresses
     if doc.country == "Kuwait" and not doc.custom_delivery_area:
         frappe.throw(_("Delivery area is required for Kuwait addresses"))
 
+@instrument
 def before_save_address(doc, method):
     """Auto-set delivery area based on area code in address"""
     if not doc.custom_delivery_area and doc.address_line1:
+        # Free text is only a fallback when coordinates did not resolve
         # Try to extract area from address
-        area_match = extract_area_from_address(doc.address_line1)
-        if area_match:
-            area = frappe.db.exists("Delivery Area", {"area_name": ["like", f"%{area_match}%"]})
-            if area:
-                doc.custom_delivery_area = area
+        area = extract_area_from_address(doc.address_line1)
+        if area:
+            doc.custom_delivery_area = area
 
-def extract_area_from_address(address):
-    """Simple area extraction logic for Kuwait addresses"""
-    kuwait_areas = [
-        "Jabriya", "Salmiya", "Hawally", "Farwaniya", 
-        "Asimah", "Mubarak", "Ahmadi", "Jahra",
-        "Salwa", "Mangaf", "Fahaheel", "Khaitan",
-        "Rai", "Shuwaikh", "Sharq", "Mahboula",
-        "Sabah Al-Salem", "Abdullah Al-Salem", "Adailiya",
-        "Bneid Al-Qar", "Daiya", "Dasma", "Jibla"
-    ]
+def get_area_from_coordinates(doc):
+    """Delivery Area whose boundary contains the address coordinates, if any"""
+    latitude, longitude = doc.get("custom_latitude"), doc.get("custom_longitude")
+    # 0/0 is what an empty Float field holds, not a real location here
+    if not latitude and not longitude:
+        return None
+    
+    from sa7ba_custom.sa7ba_custom.custom.area_geo import resolve_area_by_coordinates
+    return resolve_area_by_coordinates(latitude, longitude)
+
+def resolve_addresses_by_coordinates(chunk_size=1000):
+    """
+    Assign delivery areas to every address with coordinates
+    Resolves each chunk in one batch and only writes addresses whose area changed.
+    Returns the number of addresses updated.
+    """
+    from sa7ba_custom.sa7ba_custom.custom.area_geo import get_spatial_index
+    index = get_spatial_index()
     
-    address_lower = address.lower()
-    for area in kuwait_areas:
-        if area.lower() in address_lower:
-            return area
+    updated = 0
+    last_name = ""
+    while True:
+        rows = frappe.get_all("Address",
+            filters=[
+                ["name", ">", last_name],
+                ["custom_latitude", "!=", 0],
+                ["custom_longitude", "!=", 0]
+            ],
+            fields=["name", "custom_latitude", "custom_longitude", "custom_delivery_area"],
+            order_by="name asc",
+            limit_page_length=chunk_size,
+            as_list=True
+        )
+        if not rows:
+            break
+        
+        areas = index.resolve_many([(latitude, longitude) for _, latitude, longitude, _ in rows])
+        for (name, _, _, current), area in zip(rows, areas):
+            if area and area != current:
+                frappe.db.set_value("Address", name, "custom_delivery_area", area,
+                                    update_modified=False)
+                updated += 1
+        
+        frappe.db.commit()
+        last_name = rows[-1][0]
     
-    return None
+    forget_address_areas()
+    return updated
+
+def extract_area_from_address(address):
+    """
+    Detect the Delivery Area named in a Kuwait address
+    Matches English, Arabic and alias spellings; returns the Delivery Area name
+    """
+    from sa7ba_custom.sa7ba_custom.custom.area_matcher import match_delivery_area
+    return match_delivery_area(address)
 
 def get_delivery_areas_list():
     """Get list of active delivery areas"""
-    return frappe.get_all("Delivery Area",
-        filters={"is_active": 1},
-        fields=["area_code", "area_name", "delivery_charge", "estimated_delivery_time"],
-        order_by="area_name"
+    return get_active_areas(
+        fields=("area_code", "area_name", "delivery_charge", "estimated_delivery_time")
     )
 
 def validate_delivery_area_availability(area_code):
     """Check if delivery area is available and active"""
-    if not area_code:
-        return False
-    
-    area = frappe.db.exists("Delivery Area", {
-        "area_code": area_code,
-        "is_active": 1
-    })
-    
-    return bool(area)
+    return bool(get_area(area_code))
 
 def get_delivery_charge_for_area(area_code):
     """Get delivery charge for specific area"""
-    if not area_code:
-        return 0
-    
-    charge = frappe.db.get_value("Delivery Area", 
-                                {"area_code": area_code, "is_active": 1}, 
-                                "delivery_charge")
-    return float(charge) if charge else 0
+    return get_area_charge(area_code)
 
 def update_address_delivery_area(doc, method):
     """Update delivery area when address is modified"""
-    if doc.has_value_changed("address_line1"):
+    if doc.has_value_changed("address_line1") and not get_area_from_coordinates(doc):
         # Try to auto-detect delivery area from address
-        area_match = extract_area_from_address(doc.address_line1)
-        if area_match:
-            area = frappe.db.exists("Delivery Area", {"area_name": ["like", f"%{area_match}%"]})
-            if area and area != doc.custom_delivery_area:
-                doc.custom_delivery_area = area
-                frappe.msgprint(_("Delivery area automatically set to {0}").format(area))
+        area = extract_area_from_address(doc.address_line1)
+        if area and area != doc.custom_delivery_area:
+            doc.custom_delivery_area = area
+            frappe.msgprint(_("Delivery area automatically set to {0}").format(area))
+
+def resolve_address_area(address_name):
+    """
+    Map an address to (area name, area_name, charge)
+    One narrow query per address, memoized for the rest of the request
+    """
+    if not address_name:
+        return None
+    
+    resolved = frappe.local.__dict__.setdefault("sa7ba_address_areas", {})
+    if address_name not in resolved:
+        area_name = frappe.db.get_value("Address", address_name, "custom_delivery_area")
+        area = get_area_by_name(area_name)
+        resolved[address_name] = ResolvedArea(
+            area.name, area.area_name, area.delivery_charge, area.estimated_delivery_time
+        ) if area else None
+    
+    return resolved[address_name]
+
+def prefetch_address_areas(address_names):
+    """Resolve many addresses in one query, filling the per-request memo"""
+    resolved = frappe.local.__dict__.setdefault("sa7ba_address_areas", {})
+    missing = list({name for name in address_names if name and name not in resolved})
+    if not missing:
+        return resolved
+    
+    rows = frappe.get_all("Address",
+        filters={"name": ["in", missing]},
+        fields=["name", "custom_delivery_area"],
+        as_list=True
+    )
+    found = dict(rows)
+    for address_name in missing:
+        area = get_area_by_name(found.get(address_name))
+        resolved[address_name] = ResolvedArea(
+            area.name, area.area_name, area.delivery_charge, area.estimated_delivery_time
+        ) if area else None
+    
+    return resolved
+
+def forget_address_areas(address_names=None):
+    """Drop memoized address resolutions (all of them if no names are given)"""
+    resolved = frappe.local.__dict__.get("sa7ba_address_areas")
+    if not resolved:
+        return
+    
+    if address_names is None:
+        resolved.clear()
+        return
+    
+    for address_name in address_names:
+        resolved.pop(address_name, None)
@@ -0,0 +1,233 @@
+import json
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# Coordinate based delivery area resolution.
+#
+# Delivery Areas may carry a boundary polygon (GeoJSON from a Geolocation
+# field). Polygons are bucketed into a uniform grid over their combined
+# bounding box; a lookup picks the point's cell, filters candidates by
+# bounding box and refines with a point-in-polygon test. Batch resolution
+# vectorizes the same tests with numpy when it is installed.
+
+GRID_CELLS_PER_POLYGON = 16
+MAX_GRID_SIZE = 256
+
+
+def parse_boundary(boundary):
+    """
+    Extract polygons from a GeoJSON value
+    Returns a list of polygons, each a list of rings of (lng, lat) tuples
+    (the first ring is the outer boundary, the rest are holes).
+    Raises ValueError for malformed GeoJSON, empty polygons, rings with fewer
+    than three points and non-numeric coordinates.
+    """
+    if not boundary:
+        return []
+
+    try:
+        data = json.loads(boundary) if isinstance(boundary, str) else boundary
+        return [_parse_polygon(polygon) for polygon in _collect_polygons(data)]
+    except (TypeError, KeyError, AttributeError) as e:
+        raise ValueError(f"malformed GeoJSON ({e})")
+
+
+def _collect_polygons(data):
+    geometries = []
+
+    def collect(node):
+        kind = node.get("type")
+        if kind == "FeatureCollection":
+            for feature in node.get("features") or []:
+                collect(feature)
+        elif kind == "Feature":
+            if node.get("geometry"):
+                collect(node["geometry"])
+        elif kind == "Polygon":
+            geometries.append(node["coordinates"])
+        elif kind == "MultiPolygon":
+            geometries.extend(node["coordinates"])
+
+    collect(data)
+    return geometries
+
+
+def _parse_polygon(polygon):
+    if not polygon:
+        raise ValueError("polygon has no rings")
+
+    rings = []
+    for ring in polygon:
+        points = [(float(x), float(y)) for x, y, *_ in ring]
+        if len(points) < 3:
+            raise ValueError("polygon ring has fewer than 3 points")
+        rings.append(points)
+    return rings
+
+
+def parse_boundaries(boundaries):
+    """
+    (name, polygons) for (delivery area name, boundary) pairs
+    A malformed boundary is logged and skipped so it cannot break
+    resolution for every other area.
+    """
+    import frappe
+
+    parsed = []
+    for name, boundary in boundaries:
+        try:
+            parsed.append((name, parse_boundary(boundary)))
+        except ValueError as e:
+            frappe.log_error(f"Skipping invalid boundary of Delivery Area {name}: {e}")
+    return parsed
+
+
+def point_in_ring(x, y, ring):
+    """Ray casting test for one ring"""
+    inside = False
+    x1, y1 = ring[-1]
+    for x2, y2 in ring:
+        if (y1 > y) != (y2 > y) and x < (x2 - x1) * (y - y1) / (y2 - y1) + x1:
+            inside = not inside
+        x1, y1 = x2, y2
+    return inside
+
+
+def point_in_polygon(x, y, polygon):
+    """Inside the outer ring and outside every hole"""
+    if not point_in_ring(x, y, polygon[0]):
+        return False
+    return not any(point_in_ring(x, y, hole) for hole in polygon[1:])
+
+
+class SpatialAreaIndex:
+    """Uniform grid of polygon bounding boxes with point-in-polygon refinement"""
+
+    __slots__ = ("polygons", "min_x", "min_y", "cell_w", "cell_h", "size", "cells")
+
+    def __init__(self, areas):
+        """areas: iterable of (delivery area name, [polygons])"""
+        self.polygons = []
+        for area, polygons in areas:
+            for polygon in polygons:
+                xs = [x for x, _ in polygon[0]]
+                ys = [y for _, y in polygon[0]]
+                self.polygons.append((area, polygon, (min(xs), min(ys), max(xs), max(ys))))
+
+        self.cells = {}
+        if not self.polygons:
+            self.min_x = self.min_y = 0.0
+            self.cell_w = self.cell_h = 1.0
+            self.size = 1
+            return
+
+        min_x = min(p[2][0] for p in self.polygons)
+        min_y = min(p[2][1] for p in self.polygons)
+        max_x = max(p[2][2] for p in self.polygons)
+        max_y = max(p[2][3] for p in self.polygons)
+
+        self.size = min(MAX_GRID_SIZE, max(1, int((len(self.polygons) * GRID_CELLS_PER_POLYGON) ** 0.5)))
+        self.min_x, self.min_y = min_x, min_y
+        self.cell_w = ((max_x - min_x) / self.size) or 1.0
+        self.cell_h = ((max_y - min_y) / self.size) or 1.0
+
+        for polygon_id, (_, _, (x1, y1, x2, y2)) in enumerate(self.polygons):
+            cx1, cy1 = self._cell(x1, y1)
+            cx2, cy2 = self._cell(x2, y2)
+            for cx in range(cx1, cx2 + 1):
+                for cy in range(cy1, cy2 + 1):
+                    self.cells.setdefault((cx, cy), []).append(polygon_id)
+
+    def _cell(self, x, y):
+        cx = min(self.size - 1, max(0, int((x - self.min_x) / self.cell_w)))
+        cy = min(self.size - 1, max(0, int((y - self.min_y) / self.cell_h)))
+        return cx, cy
+
+    def resolve(self, latitude, longitude):
+        """Delivery area containing the point, or None"""
+        x, y = float(longitude), float(latitude)
+        for polygon_id in self.cells.get(self._cell(x, y), ()):
+            area, polygon, (x1, y1, x2, y2) = self.polygons[polygon_id]
+            if x1 <= x <= x2 and y1 <= y <= y2 and point_in_polygon(x, y, polygon):
+                return area
+        return None
+
+    def resolve_many(self, points):
+        """Resolve a list of (latitude, longitude); vectorized when numpy is available"""
+        if numpy is None or not self.polygons:
+            return [self.resolve(lat, lng) for lat, lng in points]
+
+        coords = numpy.asarray(points, dtype=float).reshape(-1, 2)
+        ys, xs = coords[:, 0], coords[:, 1]
+        result = numpy.full(len(coords), -1, dtype=int)
+
+        # Sort once by longitude so each polygon only sees points inside its x-range
+        order = numpy.argsort(xs, kind="stable")
+        sorted_xs = xs[order]
+
+        for polygon_id, (_, polygon, (x1, y1, x2, y2)) in enumerate(self.polygons):
+            lo = numpy.searchsorted(sorted_xs, x1, side="left")
+            hi = numpy.searchsorted(sorted_xs, x2, side="right")
+            members = order[lo:hi]
+            py = ys[members]
+            pending = members[(result[members] < 0) & (py >= y1) & (py <= y2)]
+            if not len(pending):
+                continue
+
+            inside = _rings_contain(polygon[0], xs[pending], ys[pending])
+            for hole in polygon[1:]:
+                inside &= ~_rings_contain(hole, xs[pending], ys[pending])
+            result[pending[inside]] = polygon_id
+
+        return [self.polygons[i][0] if i >= 0 else None for i in result.tolist()]
+
+
+def _rings_contain(ring, xs, ys):
+    """Vectorized ray casting of many points against one ring"""
+    inside = numpy.zeros(len(xs), dtype=bool)
+    x1, y1 = ring[-1]
+    for x2, y2 in ring:
+        if y1 != y2:
+            crosses = (y1 > ys) != (y2 > ys)
+            inside ^= crosses & (xs < (x2 - x1) * (ys - y1) / (y2 - y1) + x1)
+        x1, y1 = x2, y2
+    return inside
+
+
+# Per-worker index; only rebuilt when the set of boundaries changes
+_index = None
+
+
+def get_spatial_index():
+    """Get the spatial index built from active Delivery Area boundaries"""
+    global _index
+
+    from sa7ba_custom.sa7ba_custom.custom.area_registry import get_registry
+    registry = get_registry()
+
+    cached = _index
+    if cached is not None and cached[0] == registry.version:
+        return cached[2]
+
+    boundaries = tuple(
+        (area.name, area.custom_boundary)
+        for area in registry.active if area.custom_boundary
+    )
+    signature = hash(boundaries)
+    if cached is None or cached[1] != signature:
+        index = SpatialAreaIndex(parse_boundaries(boundaries))
+    else:
+        index = cached[2]
+
+    _index = (registry.version, signature, index)
+    return index
+
+
+def resolve_area_by_coordinates(latitude, longitude):
+    """Delivery area for a coordinate pair, or None"""
+    if latitude in (None, "") or longitude in (None, ""):
+        return None
+    return get_spatial_index().resolve(latitude, longitude)
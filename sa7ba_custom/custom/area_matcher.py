@@ -0,0 +1,145 @@
+import re
+import unicodedata
+from functools import lru_cache
+
+# Compiled matcher for spotting a delivery area in free-text addresses.
+#
+# Area names (English, Arabic and aliases) are normalized into word tokens
+# and loaded into a word-level trie. Matching walks the trie from each word
+# of the address, so the cost depends on the address length and the longest
+# name (a few words), not on how many areas exist. The longest match wins.
+
+WORD_RE = re.compile(r"[^\W_]+", re.UNICODE)
+NAME_SPLIT_RE = re.compile(r"[()/,;\n]+")
+
+# Articles that transliterations add or drop freely
+LATIN_ARTICLES = {"al", "el", "ad", "ar", "as", "ash", "az"}
+ARABIC_ARTICLE = "ال"
+
+# Ordered rewrites that fold common transliteration variants together
+LATIN_REWRITES = (
+    (re.compile(r"(iyyah|iyya|iyah|eyah|eya)$"), "iya"),
+    (re.compile(r"ah$"), "a"),
+    (re.compile(r"ee"), "i"),
+    (re.compile(r"oo|ou"), "u"),
+    (re.compile(r"(.)\1+"), r"\1"),
+)
+
+ARABIC_FOLDS = str.maketrans({
+    "أ": "ا", "إ": "ا", "آ": "ا", "ٱ": "ا",
+    "ة": "ه", "ى": "ي", "ؤ": "و", "ئ": "ي", "ـ": None
+})
+
+
+@lru_cache(maxsize=8192)
+def normalize_word(word):
+    """Fold case, diacritics, articles and transliteration variants of one word"""
+    word = unicodedata.normalize("NFKD", word.lower())
+    word = "".join(ch for ch in word if not unicodedata.combining(ch))
+
+    if word.isascii():
+        if word in LATIN_ARTICLES:
+            return None
+        for pattern, replacement in LATIN_REWRITES:
+            word = pattern.sub(replacement, word)
+        return word
+
+    word = word.translate(ARABIC_FOLDS)
+    if word.startswith(ARABIC_ARTICLE) and len(word) > len(ARABIC_ARTICLE) + 1:
+        word = word[len(ARABIC_ARTICLE):]
+    return word
+
+
+def tokenize(text):
+    """Normalized word tokens of a piece of text"""
+    tokens = []
+    for word in WORD_RE.findall(text or ""):
+        token = normalize_word(word)
+        if token:
+            tokens.append(token)
+    return tokens
+
+
+def get_name_variants(names):
+    """Split compound names such as "Al Asimah (Kuwait City)" into separate variants"""
+    variants = set()
+    for name in names:
+        if not name:
+            continue
+        variants.add(name)
+        variants.update(part for part in NAME_SPLIT_RE.split(name) if part.strip())
+    return variants
+
+
+class AreaMatcher:
+    """Word-level trie over normalized area names with longest-match lookup"""
+
+    __slots__ = ("trie", "size")
+
+    END = ""
+
+    def __init__(self, entries):
+        """entries: iterable of (delivery area name, [names and aliases])"""
+        self.trie = {}
+        self.size = 0
+
+        for area, names in entries:
+            for variant in get_name_variants(names):
+                tokens = tokenize(variant)
+                if not tokens:
+                    continue
+
+                node = self.trie
+                for token in tokens:
+                    node = node.setdefault(token, {})
+                node.setdefault(self.END, area)
+                self.size += 1
+
+    def match(self, text):
+        """Return the area whose name covers the most words of text, or None"""
+        tokens = tokenize(text)
+        best_area, best_length = None, 0
+
+        for start in range(len(tokens)):
+            node = self.trie
+            for position in range(start, len(tokens)):
+                node = node.get(tokens[position])
+                if node is None:
+                    break
+                area = node.get(self.END)
+                length = position - start + 1
+                if area is not None and length > best_length:
+                    best_area, best_length = area, length
+
+        return best_area
+
+
+# Per-worker matcher, rebuilt when the area registry version moves
+_matcher = None
+
+
+def get_matcher():
+    """Get the matcher compiled from the current Delivery Area records"""
+    global _matcher
+
+    from sa7ba_custom.sa7ba_custom.custom.area_registry import get_registry
+    registry = get_registry()
+
+    cached = _matcher
+    if cached is None or cached[0] != registry.version:
+        matcher = AreaMatcher(
+            (area.name, [area.area_name, area.custom_area_name_ar,
+                         *(area.custom_aliases or "").splitlines()])
+            for area in registry.active
+        )
+        cached = (registry.version, matcher)
+        _matcher = cached
+
+    return cached[1]
+
+
+def match_delivery_area(address):
+    """Detect the Delivery Area referenced in a free-text address"""
+    if not address:
+        return None
+    return get_matcher().match(address)
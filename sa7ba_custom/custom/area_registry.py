@@ -0,0 +1,195 @@
+import frappe
+import hashlib
+import time
+from collections import namedtuple
+
+# Two-tier Delivery Area registry.
+#
+# Every worker keeps a compact in-process copy of the Delivery Area table,
+# backed by a snapshot in Redis shared by all workers. A version counter in
+# Redis is bumped whenever a Delivery Area changes; workers compare it once
+# per request and reload only when it moves, so area lookups on the cart and
+# checkout hot path do not touch the database.
+
+REGISTRY_SNAPSHOT_KEY = "sa7ba_delivery_area_registry"
+REGISTRY_VERSION_KEY = "sa7ba_delivery_area_registry_version"
+
+PUBLIC_AREA_FIELDS = (
+    "area_code", "area_name", "delivery_charge", "estimated_delivery_time", "notes"
+)
+
+# Embedded in the cart and checkout pages; matches DeliveryAreaManager.AREA_FIELDS
+EMBEDDED_AREA_FIELDS = ("area_code", "area_name", "delivery_charge", "estimated_delivery_time")
+EMBEDDED_AREA_PAGES = ("cart", "checkout")
+
+AREA_FIELDS = (
+    "name", "area_code", "area_name", "delivery_charge",
+    "estimated_delivery_time", "notes", "is_active",
+    "custom_area_name_ar", "custom_aliases", "custom_boundary"
+)
+
+DeliveryAreaRecord = namedtuple("DeliveryAreaRecord", AREA_FIELDS)
+
+
+class DeliveryAreaRegistry:
+    """Immutable lookup tables built from one Delivery Area snapshot"""
+
+    __slots__ = ("version", "by_code", "by_name", "active", "payloads")
+
+    def __init__(self, version, rows):
+        records = [DeliveryAreaRecord(*row) for row in rows]
+        self.version = version
+        self.by_code = {r.area_code: r for r in records if r.area_code}
+        self.by_name = {r.name: r for r in records}
+        self.active = tuple(sorted(
+            (r for r in records if r.is_active),
+            key=lambda r: r.area_name or ""
+        ))
+        self.payloads = {}
+
+
+# Per-worker tier, swapped in a single assignment on rebuild
+_local_registry = None
+
+
+def get_registry():
+    """Return the current registry, reloading it only if the version moved"""
+    global _local_registry
+
+    version = _get_request_version()
+    registry = _local_registry
+    if registry is not None and registry.version == version:
+        return registry
+
+    snapshot = frappe.cache().get_value(REGISTRY_SNAPSHOT_KEY)
+    if not snapshot or snapshot.get("version") != version:
+        snapshot = _build_snapshot(version)
+
+    registry = DeliveryAreaRegistry(snapshot["version"], snapshot["rows"])
+    _local_registry = registry
+    return registry
+
+
+def _get_request_version():
+    """Read the registry version from Redis at most once per request"""
+    version = getattr(frappe.local, "sa7ba_area_registry_version", None)
+    if version is None:
+        cache = frappe.cache()
+        version = int(cache.get(cache.make_key(REGISTRY_VERSION_KEY)) or 0)
+        frappe.local.sa7ba_area_registry_version = version
+    return version
+
+
+def _build_snapshot(version):
+    """Load the Delivery Area table and publish it as the shared snapshot"""
+    rows = frappe.get_all("Delivery Area", fields=list(AREA_FIELDS), as_list=True)
+    snapshot = {
+        "version": version,
+        "rows": [
+            (name, area_code, area_name, float(charge or 0), eta, notes, int(is_active or 0),
+             name_ar, aliases, boundary)
+            for name, area_code, area_name, charge, eta, notes, is_active, name_ar, aliases, boundary
+            in rows
+        ]
+    }
+    frappe.cache().set_value(REGISTRY_SNAPSHOT_KEY, snapshot)
+    return snapshot
+
+
+def invalidate_area_registry():
+    """Bump the registry version so every worker reloads on its next request"""
+    global _local_registry
+
+    cache = frappe.cache()
+    cache.incr(cache.make_key(REGISTRY_VERSION_KEY))
+    cache.delete_value(REGISTRY_SNAPSHOT_KEY)
+    _local_registry = None
+    if hasattr(frappe.local, "sa7ba_area_registry_version"):
+        del frappe.local.sa7ba_area_registry_version
+
+
+def get_area(area_code):
+    """Get the active Delivery Area record for an area code"""
+    if not area_code:
+        return None
+
+    area = get_registry().by_code.get(area_code)
+    return area if area and area.is_active else None
+
+
+def get_area_by_name(name, active_only=False):
+    """Get a Delivery Area record by document name"""
+    if not name:
+        return None
+
+    area = get_registry().by_name.get(name)
+    if area and active_only and not area.is_active:
+        return None
+    return area
+
+
+def get_area_charge(area_code):
+    """Get delivery charge for an active area code, 0 if unknown"""
+    area = get_area(area_code)
+    return area.delivery_charge if area else 0
+
+
+def get_active_areas(fields=None):
+    """Return active delivery areas as dicts, ordered by area name"""
+    fields = fields or PUBLIC_AREA_FIELDS
+    return [
+        frappe._dict({field: getattr(area, field) for field in fields})
+        for area in get_registry().active
+    ]
+
+
+def get_active_areas_payload(fields=None):
+    """
+    Return (etag, json_body) for the active area list.
+    Serialized once per registry version and field projection.
+    """
+    fields = tuple(fields or PUBLIC_AREA_FIELDS)
+    registry = get_registry()
+
+    payload = registry.payloads.get(fields)
+    if payload is None:
+        body = frappe.as_json({"message": get_active_areas(fields)}, indent=None)
+        digest = hashlib.sha1(body.encode("utf-8")).hexdigest()[:16]
+        payload = (f'"da-{registry.version}-{digest}"', body)
+        registry.payloads[fields] = payload
+
+    return payload
+
+
+def get_embedded_areas_payload(fields=None):
+    """
+    Return (etag, json) of the active area list for embedding in a page.
+    The etag is the one get_delivery_areas answers with for the same fields,
+    so the browser can revalidate its embedded copy. Serialized once per
+    registry version and safe inside a script tag.
+    """
+    fields = tuple(fields or EMBEDDED_AREA_FIELDS)
+    registry = get_registry()
+
+    key = ("embedded", fields)
+    payload = registry.payloads.get(key)
+    if payload is None:
+        etag, _ = get_active_areas_payload(fields)
+        body = frappe.as_json({"version": etag, "areas": get_active_areas(fields)}, indent=None)
+        payload = (etag, body.replace("</", "<\\/"))
+        registry.payloads[key] = payload
+
+    return payload
+
+
+def update_website_context(context):
+    """Embed the active area list in the cart and checkout pages"""
+    path = (context.get("path") or "").strip("/")
+    if path not in EMBEDDED_AREA_PAGES:
+        return
+
+    etag, body = get_embedded_areas_payload()
+    context.delivery_areas = get_active_areas(EMBEDDED_AREA_FIELDS)
+    context.delivery_areas_version = etag
+    context.delivery_areas_json = body
+    context.delivery_areas_rendered_at = int(time.time())
@@ -0,0 +1,144 @@
+import heapq
+from collections import Counter
+from sa7ba_custom.sa7ba_custom.custom.area_matcher import tokenize
+
+# Typo-tolerant delivery area search for checkout autocomplete.
+#
+# Every searchable spelling of an area (English name, Arabic name, aliases,
+# area code) is normalized and indexed by trigram and by word prefix. Queries
+# collect candidates from those postings only and rank them by trigram
+# similarity, so a lookup never touches the database or scans every area.
+
+PREFIX_LENGTH = 3
+DEFAULT_LIMIT = 10
+MAX_LIMIT = 50
+
+# Candidates kept per result slot before exact scoring
+CANDIDATE_FACTOR = 4
+# Trigrams shared by more than this share of areas are only used if nothing rarer matched
+COMMON_TRIGRAM_RATIO = 0.1
+
+
+def normalize_text(text):
+    """Normalized, space-joined form used for indexing and queries"""
+    return " ".join(tokenize(text))
+
+
+def get_trigrams(text):
+    """Padded character trigrams of each word"""
+    trigrams = set()
+    for word in text.split():
+        padded = f"  {word} "
+        trigrams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return trigrams
+
+
+class AreaSearchIndex:
+    """Trigram and prefix postings over area spellings"""
+
+    __slots__ = ("entries", "keys", "trigrams", "prefixes")
+
+    def __init__(self, entries):
+        """entries: list of (payload, [searchable spellings])"""
+        self.entries = []
+        self.keys = []
+        self.trigrams = {}
+        self.prefixes = {}
+
+        for payload, spellings in entries:
+            entry_id = len(self.entries)
+            self.entries.append(payload)
+
+            keys = [key for key in {normalize_text(s) for s in spellings if s} if key]
+            self.keys.append([(key, get_trigrams(key)) for key in keys])
+
+            for key in keys:
+                for trigram in get_trigrams(key):
+                    self.trigrams.setdefault(trigram, set()).add(entry_id)
+                for word in key.split():
+                    for length in range(1, min(PREFIX_LENGTH, len(word)) + 1):
+                        self.prefixes.setdefault(word[:length], set()).add(entry_id)
+
+    def search(self, query, limit=DEFAULT_LIMIT):
+        """Return [(score, payload)] best first"""
+        query = normalize_text(query)
+        if not query:
+            return []
+
+        query_trigrams = get_trigrams(query)
+
+        # Count shared trigrams per area, rarest postings first
+        counts = Counter()
+        common = max(CANDIDATE_FACTOR * limit, int(len(self.entries) * COMMON_TRIGRAM_RATIO))
+        postings = sorted((self.trigrams.get(t, ()) for t in query_trigrams), key=len)
+        for position, posting in enumerate(postings):
+            if position and len(posting) > common:
+                break
+            counts.update(posting)
+
+        # Short queries are mostly prefixes of a word
+        if len(query) <= PREFIX_LENGTH:
+            for entry_id in self.prefixes.get(query, ()):
+                counts[entry_id] += len(query_trigrams)
+
+        candidates = heapq.nlargest(CANDIDATE_FACTOR * limit, counts, key=counts.__getitem__)
+        scored = (
+            (self._score(query, query_trigrams, entry_id), entry_id)
+            for entry_id in candidates
+        )
+        best = heapq.nlargest(limit, (item for item in scored if item[0] > 0))
+        return [(round(score, 4), self.entries[entry_id]) for score, entry_id in best]
+
+    def _score(self, query, query_trigrams, entry_id):
+        best = 0.0
+        for key, key_trigrams in self.keys[entry_id]:
+            shared = len(query_trigrams & key_trigrams)
+            score = shared / (len(query_trigrams) + len(key_trigrams) - shared or 1)
+            if key == query:
+                score += 1.0
+            elif key.startswith(query) or any(w.startswith(query) for w in key.split()):
+                score += 0.5
+            best = max(best, score)
+        return best
+
+
+# Per-worker index, rebuilt when the area registry version moves
+_index = None
+
+
+def get_search_index():
+    """Get the search index built from the current Delivery Area records"""
+    global _index
+
+    from sa7ba_custom.sa7ba_custom.custom.area_registry import get_registry
+    registry = get_registry()
+
+    cached = _index
+    if cached is None or cached[0] != registry.version:
+        index = AreaSearchIndex([
+            ({
+                "area_code": area.area_code,
+                "area_name": area.area_name,
+                "area_name_ar": area.custom_area_name_ar,
+                "delivery_charge": area.delivery_charge,
+                "estimated_delivery_time": area.estimated_delivery_time
+            }, [area.area_name, area.custom_area_name_ar, area.area_code,
+                *(area.custom_aliases or "").splitlines()])
+            for area in registry.active
+        ])
+        cached = (registry.version, index)
+        _index = cached
+
+    return cached[1]
+
+
+def search_areas(query, limit=DEFAULT_LIMIT):
+    """Ranked active areas matching a partial or misspelt query"""
+    from frappe.utils import cint
+
+    # cint: a non-numeric limit from the guest endpoint falls back to the default
+    limit = max(1, min(cint(limit) or DEFAULT_LIMIT, MAX_LIMIT))
+    return [
+        dict(payload, score=score)
+        for score, payload in get_search_index().search(query, limit)
+    ]
@@ -1,24 +1,22 @@
 import frappe
 from frappe import _
 import json
+from sa7ba_custom.sa7ba_custom.custom.delivery_pricing import get_cart_delivery_charge
+from sa7ba_custom.sa7ba_custom.custom.cart_totals import make_delivery_line, stamp_cart
+from sa7ba_custom.sa7ba_custom.custom.money import format_amount, from_fils, split_totals, to_fils
+from sa7ba_custom.sa7ba_custom.custom.instrumentation import instrument
 
 class CustomShoppingCart:
     def __init__(self):
         self.delivery_charge_item = "DELIVERY-CHARGE"
     
-    def get_delivery_charge(self, area_code):
-        """Get delivery charge for area"""
-        if not area_code:
-            return 0
-        
-        charge = frappe.db.get_value("Delivery Area", 
-                                    {"area_code": area_code, "is_active": 1}, 
-                                    "delivery_charge")
-        return float(charge) if charge else 0
+    def get_delivery_charge(self, area_code, cart=None):
+        """Get delivery charge for area after pricing rules"""
+        return get_cart_delivery_charge(area_code, cart)
     
     def update_cart_with_delivery(self, cart, area_code):
         """Add delivery charge to cart"""
-        delivery_charge = self.get_delivery_charge(area_code)
+        delivery_charge = self.get_delivery_charge(area_code, cart)
         
         # Remove any existing delivery charge
         cart["items"] = [item for item in cart.get("items", []) 
@@ -26,28 +24,18 @@ class CustomShoppingCart:
         
         # Add delivery charge item
         if delivery_charge > 0:
-            cart["items"].append({
-                "item_code": self.delivery_charge_item,
-                "item_name": f"Delivery Service Charge",
-                "qty": 1,
-                "rate": delivery_charge,
-                "amount": delivery_charge,
-                "description": f"Delivery to {area_code} area",
-                "custom_is_delivery_charge": 1
-            })
+            cart["items"].append(make_delivery_line(to_fils(delivery_charge), area_code))
         
         # Recalculate totals
         cart = self.calculate_cart_total(cart)
-        return cart
+        return stamp_cart(cart, area_code)
     
     def calculate_cart_total(self, cart):
         """Calculate cart total including delivery charges"""
-        total = 0
-        for item in cart.get("items", []):
-            total += item.get("amount", 0)
+        total = split_totals(cart.get("items", []), self.delivery_charge_item).total
         
-        cart["total"] = total
-        cart["formatted_total"] = f"KWD {total:.3f}"
+        cart["total"] = from_fils(total)
+        cart["formatted_total"] = format_amount(total)
         
         return cart
     
@@ -63,7 +51,7 @@ class CustomShoppingCart:
         """Remove delivery charge from cart"""
         cart["items"] = [item for item in cart.get("items", []) 
                         if item.get("item_code") != self.delivery_charge_item]
-        return self.calculate_cart_total(cart)
+        return stamp_cart(self.calculate_cart_total(cart), None)
     
     def get_cart_summary(self, cart):
         """Get cart summary with delivery info"""
@@ -75,28 +63,32 @@ class CustomShoppingCart:
             "delivery_area": None
         }
         
-        # Get selected delivery area
+        # Subtotal excluding delivery charges, in fils
+        totals = split_totals(cart.get("items", []), self.delivery_charge_item)
+        delivery_charge = totals.delivery_charge
+        
+        # Get selected delivery area; quote it if the cart has no delivery line yet
         selected_area = frappe.local.cookie_manager.get_cookie('selected_delivery_area')
         if selected_area:
             summary["delivery_area"] = selected_area
-            summary["delivery_charge"] = self.get_delivery_charge(selected_area)
-        
-        # Calculate subtotal (excluding delivery charges)
-        for item in cart.get("items", []):
-            if item.get("item_code") != self.delivery_charge_item:
-                summary["subtotal"] += item.get("amount", 0)
-            else:
-                summary["delivery_charge"] = item.get("amount", 0)
+            has_delivery_line = any(item.get("item_code") == self.delivery_charge_item
+                                    for item in cart.get("items", []))
+            if not has_delivery_line:
+                delivery_charge = to_fils(self.get_delivery_charge(selected_area, cart))
         
-        summary["total"] = summary["subtotal"] + summary["delivery_charge"]
+        summary["subtotal"] = from_fils(totals.subtotal)
+        summary["delivery_charge"] = from_fils(delivery_charge)
+        summary["total"] = from_fils(totals.subtotal + delivery_charge)
         
         return summary
 
+@instrument
 def calculate_cart_total(cart):
     """Override cart calculation"""
     cart_manager = CustomShoppingCart()
     return cart_manager.calculate_cart_total(cart)
 
+@instrument
 def before_add_to_cart(cart, item_code, qty):
     """Hook for before adding to cart"""
     cart_manager = CustomShoppingCart()
@@ -0,0 +1,146 @@
+import frappe
+from frappe import _
+from frappe.utils import flt
+from sa7ba_custom.sa7ba_custom.custom.money import DELIVERY_CHARGE_ITEM, from_fils, split_totals, to_fils
+
+# Batched cart mutations.
+#
+# The storefront used to change the area, add items and drop the delivery
+# line with one POST each, every one of them reloading the cart,
+# recomputing totals and rewriting the cart state. apply_cart_operations
+# takes an ordered list of operations in one request instead. Item changes
+# go to the webshop Quotation, which checkout turns into the Sales Order,
+# with one update_cart call per changed item. The delivery line is priced
+# once for the final cart and the area is kept locally. The caller rolls
+# back if any operation fails.
+
+ADD = "add"
+REMOVE = "remove"
+SET_QTY = "set_qty"
+SET_AREA = "set_area"
+CLEAR_AREA = "clear_area"
+
+OPERATIONS = (ADD, REMOVE, SET_QTY, SET_AREA, CLEAR_AREA)
+MAX_OPERATIONS = 50
+
+# Returned by apply_operations when the selected area is left as it is
+UNCHANGED = object()
+
+
+def parse_operations(ops):
+    """Validate an ordered list of {"op": ..., ...} dicts"""
+    ops = frappe.parse_json(ops) if isinstance(ops, str) else ops
+    if not isinstance(ops, list) or not ops:
+        frappe.throw(_("At least one cart operation is required"))
+    if len(ops) > MAX_OPERATIONS:
+        frappe.throw(_("At most {0} cart operations can be applied at once").format(MAX_OPERATIONS))
+
+    parsed = []
+    for index, op in enumerate(ops, 1):
+        if not isinstance(op, dict) or op.get("op") not in OPERATIONS:
+            frappe.throw(_("Operation {0}: unknown cart operation").format(index))
+
+        kind = op["op"]
+        if kind in (ADD, REMOVE, SET_QTY):
+            item_code = op.get("item_code")
+            if not item_code or item_code == DELIVERY_CHARGE_ITEM:
+                frappe.throw(_("Operation {0}: a valid item_code is required").format(index))
+
+            qty = flt(op.get("qty", 1 if kind == ADD else 0))
+            if kind == ADD and qty <= 0 or kind == SET_QTY and qty < 0:
+                frappe.throw(_("Operation {0}: invalid quantity {1}").format(index, op.get("qty")))
+            parsed.append({"op": kind, "item_code": item_code, "qty": qty})
+        elif kind == SET_AREA:
+            if not op.get("area_code"):
+                frappe.throw(_("Operation {0}: area_code is required").format(index))
+            parsed.append({"op": kind, "area_code": op["area_code"]})
+        else:
+            parsed.append({"op": kind})
+
+    return parsed
+
+
+def apply_operations(cart, ops):
+    """
+    Apply parsed operations to the webshop cart
+    Item operations are folded into a final quantity per item and sent
+    through webshop's update_cart, once per changed item, so the Quotation
+    gets webshop pricing, discounts and taxes. Returns (cart, area): the
+    cart re-read from the Quotation if any item changed, and the area
+    selected by the operations, None if cleared, or UNCHANGED if no area
+    operation was given.
+    """
+    from sa7ba_custom.sa7ba_custom.custom.area_registry import get_area
+
+    current = {}
+    for item in cart.get("items", []):
+        if item.get("item_code") != DELIVERY_CHARGE_ITEM:
+            current[item.get("item_code")] = current.get(item.get("item_code"), 0) + flt(item.get("qty"))
+
+    # Validate everything before the Quotation is touched
+    quantities = dict(current)
+    selected_area = UNCHANGED
+    for op in ops:
+        kind = op["op"]
+        if kind == SET_AREA:
+            if not get_area(op["area_code"]):
+                frappe.throw(_("Invalid or inactive delivery area {0}").format(op["area_code"]))
+            selected_area = op["area_code"]
+        elif kind == CLEAR_AREA:
+            selected_area = None
+        elif kind == REMOVE:
+            quantities[op["item_code"]] = 0
+        elif kind == ADD:
+            quantities[op["item_code"]] = quantities.get(op["item_code"], 0) + op["qty"]
+        else:
+            quantities[op["item_code"]] = op["qty"]
+
+    changed = [(item_code, qty) for item_code, qty in quantities.items()
+               if qty != current.get(item_code, 0)]
+    if not changed:
+        return cart, selected_area
+
+    from webshop.webshop.doctype.webshop_settings.webshop_cart import get_cart, update_cart
+    for item_code, qty in changed:
+        update_cart(item_code, qty)
+
+    return get_cart(), selected_area
+
+
+def price_cart(cart, area_code):
+    """Recompute the delivery line and totals of a cart in one pass"""
+    from sa7ba_custom.sa7ba_custom.custom.cart_totals import CartTotals, get_pricing_version
+    from sa7ba_custom.sa7ba_custom.custom.delivery_pricing import get_cart_delivery_charge
+
+    totals = CartTotals(pricing_version=get_pricing_version())
+    totals.sync_lines(cart.get("items", []))
+    delivery_charge = to_fils(get_cart_delivery_charge(area_code, cart)) if area_code else 0
+    totals.set_area(area_code, delivery_charge, totals.pricing_version)
+    return totals.apply(cart)
+
+
+def summarize_cart(cart, area_code):
+    """Quantities, area and totals of a cart, for diff_summaries"""
+    return {
+        "qty": {item.get("item_code"): item.get("qty") for item in cart.get("items", [])
+                if item.get("item_code") != DELIVERY_CHARGE_ITEM},
+        "delivery_area": area_code or None,
+        "totals": split_totals(cart.get("items", []))
+    }
+
+
+def diff_summaries(before, after):
+    """Compact description of what changed between two cart summaries"""
+    old, new = before["qty"], after["qty"]
+    diff = {}
+
+    changed = {code: qty for code, qty in new.items() if old.get(code) != qty}
+    changed.update({code: 0 for code in old if code not in new})
+    if changed:
+        diff["qty"] = changed
+    if before["delivery_area"] != after["delivery_area"]:
+        diff["delivery_area"] = after["delivery_area"]
+    for key in ("delivery_charge", "total"):
+        if getattr(before["totals"], key) != getattr(after["totals"], key):
+            diff[key] = from_fils(getattr(after["totals"], key))
+    return diff
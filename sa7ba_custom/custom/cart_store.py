@@ -0,0 +1,93 @@
+import frappe
+import json
+import zlib
+
+# Server-side cart state.
+#
+# Carts live in Redis as zlib-compressed compact JSON with a sliding TTL:
+# every load (GETEX) and save pushes the expiry out again, so a cart that is
+# viewed but not changed stays alive. The browser only carries a short opaque
+# cart id, so request headers stay small no matter how many lines the cart
+# has. A browser without one gets a single id per request, however many
+# times the cart is saved during it.
+
+CART_ID_COOKIE = "sa7ba_cart_id"
+LEGACY_CART_COOKIE = "cart"
+CART_KEY_PREFIX = "sa7ba_cart:"
+CART_TTL = 7 * 24 * 60 * 60
+CART_ID_LENGTH = 16
+
+
+def encode_cart(cart):
+    """Encode a cart dict into a compact binary blob"""
+    return zlib.compress(
+        json.dumps(cart, separators=(",", ":"), default=str).encode("utf-8")
+    )
+
+
+def decode_cart(blob):
+    """Decode a blob produced by encode_cart"""
+    return json.loads(zlib.decompress(blob).decode("utf-8"))
+
+
+def get_cart_id():
+    """Get the cart id carried by the browser or minted during this request, if any"""
+    return frappe.local.cookie_manager.get_cookie(CART_ID_COOKIE) \
+        or frappe.local.__dict__.get("sa7ba_cart_id")
+
+
+def _cart_key(cart_id):
+    cache = frappe.cache()
+    return cache.make_key(f"{CART_KEY_PREFIX}{cart_id}")
+
+
+def cart_exists(cart_id):
+    """True if the server holds cart state for this id"""
+    try:
+        # Raw EXISTS; RedisWrapper.exists would prefix the key a second time
+        return bool(frappe.cache().pipeline().exists(_cart_key(cart_id)).execute()[0])
+    except Exception:
+        return False
+
+
+def load_cart(cart_id=None):
+    """Load the stored cart state for the current browser"""
+    cart_id = cart_id or get_cart_id()
+    if not cart_id:
+        return None
+
+    # Reading the cart slides its expiry like a save does
+    blob = frappe.cache().getex(_cart_key(cart_id), ex=CART_TTL)
+    if not blob:
+        return None
+
+    try:
+        return decode_cart(blob)
+    except (zlib.error, ValueError):
+        frappe.log_error(f"Discarding unreadable cart state {cart_id}")
+        return None
+
+
+def save_cart(cart, cart_id=None):
+    """Persist cart state and make sure the browser carries its id"""
+    cart_id = cart_id or get_cart_id()
+    if not cart_id:
+        cart_id = frappe.local.sa7ba_cart_id = frappe.generate_hash(length=CART_ID_LENGTH)
+        frappe.local.cookie_manager.set_cookie(CART_ID_COOKIE, cart_id)
+
+    frappe.cache().set(_cart_key(cart_id), encode_cart(cart), ex=CART_TTL)
+
+    # Older sessions carried the whole cart in a cookie
+    if frappe.local.cookie_manager.get_cookie(LEGACY_CART_COOKIE):
+        frappe.local.cookie_manager.delete_cookie(LEGACY_CART_COOKIE)
+
+    return cart_id
+
+
+def clear_cart(cart_id=None):
+    """Drop stored cart state and the browser's cart id"""
+    cart_id = cart_id or get_cart_id()
+    if cart_id:
+        frappe.cache().delete(_cart_key(cart_id))
+        frappe.local.cookie_manager.delete_cookie(CART_ID_COOKIE)
+        frappe.local.__dict__.pop("sa7ba_cart_id", None)
@@ -0,0 +1,185 @@
+import frappe
+from sa7ba_custom.sa7ba_custom.custom.money import (
+    DELIVERY_CHARGE_ITEM, format_amount, from_fils, line_amount, split_totals
+)
+
+TOTALS_KEY = "sa7ba_totals"
+# Bumped when the stored totals layout changes (2: amounts in fils)
+TOTALS_FORMAT = 2
+
+
+def get_pricing_version():
+    """Version of everything that feeds delivery pricing"""
+    from sa7ba_custom.sa7ba_custom.custom.area_registry import get_registry
+    from sa7ba_custom.sa7ba_custom.custom.delivery_pricing import get_rules_version
+    return f"{TOTALS_FORMAT}:{get_registry().version}.{get_rules_version()}"
+
+
+class CartTotals:
+    """
+    Incremental cart totals.
+    Tracks per-line amounts, subtotal and the delivery line so that item and
+    area changes are applied as deltas. Amounts are integer fils. Stamped
+    with (area_code, pricing version) so an unchanged cart can be served
+    without recomputation.
+    """
+
+    __slots__ = ("lines", "subtotal", "area_code", "delivery_charge", "pricing_version")
+
+    def __init__(self, lines=None, area_code=None, delivery_charge=0, pricing_version=None):
+        self.lines = dict(lines or {})
+        self.subtotal = sum(self.lines.values())
+        self.area_code = area_code
+        self.delivery_charge = delivery_charge
+        self.pricing_version = pricing_version
+
+    @classmethod
+    def from_cart(cls, cart, area_code, pricing_version):
+        """Build totals from a fully calculated cart"""
+        totals = cls(pricing_version=pricing_version)
+        totals.sync_lines(cart.get("items", []))
+        totals.area_code = area_code
+        totals.delivery_charge = split_totals(cart.get("items", [])).delivery_charge
+        return totals
+
+    @classmethod
+    def from_dict(cls, data):
+        if not data:
+            return None
+        return cls(
+            lines=data.get("lines"),
+            area_code=data.get("area_code"),
+            delivery_charge=data.get("delivery_charge", 0),
+            pricing_version=data.get("pricing_version")
+        )
+
+    def to_dict(self):
+        return {
+            "lines": self.lines,
+            "area_code": self.area_code,
+            "delivery_charge": self.delivery_charge,
+            "pricing_version": self.pricing_version
+        }
+
+    @property
+    def total(self):
+        return self.subtotal + self.delivery_charge
+
+    def is_current(self, area_code, pricing_version):
+        """True if the stamp matches the requested area and pricing"""
+        return (self.area_code or None) == (area_code or None) \
+            and self.pricing_version == pricing_version
+
+    def set_line(self, item_code, amount):
+        """Set a line amount, adjusting the subtotal by the delta"""
+        self.subtotal += amount - self.lines.get(item_code, 0)
+        self.lines[item_code] = amount
+
+    def remove_line(self, item_code):
+        """Remove a line, adjusting the subtotal by its amount"""
+        self.subtotal -= self.lines.pop(item_code, 0)
+
+    def sync_lines(self, items):
+        """
+        Apply the difference between tracked lines and the cart's items.
+        Returns True if any line changed.
+        """
+        current = {}
+        for item in items:
+            item_code = item.get("item_code")
+            if item_code == DELIVERY_CHARGE_ITEM:
+                continue
+            current[item_code] = current.get(item_code, 0) + line_amount(item)
+
+        changed = False
+        for item_code in [code for code in self.lines if code not in current]:
+            self.remove_line(item_code)
+            changed = True
+
+        for item_code, amount in current.items():
+            if self.lines.get(item_code) != amount:
+                self.set_line(item_code, amount)
+                changed = True
+
+        return changed
+
+    def set_area(self, area_code, delivery_charge, pricing_version):
+        """Switch the delivery line to another area; delivery_charge in fils"""
+        self.area_code = area_code
+        self.delivery_charge = delivery_charge
+        self.pricing_version = pricing_version
+
+    def apply(self, cart):
+        """Write the delivery line and totals into a cart dict"""
+        items = [item for item in cart.get("items", [])
+                 if item.get("item_code") != DELIVERY_CHARGE_ITEM]
+
+        if self.delivery_charge > 0:
+            items.append(make_delivery_line(self.delivery_charge, self.area_code))
+
+        cart["items"] = items
+        cart["total"] = from_fils(self.total)
+        cart["formatted_total"] = format_amount(self.total)
+        cart["delivery_charge"] = from_fils(self.delivery_charge)
+        cart["subtotal_without_delivery"] = from_fils(self.subtotal)
+        cart[TOTALS_KEY] = self.to_dict()
+        return cart
+
+
+def make_delivery_line(charge_fils, area_code):
+    """Build the delivery charge cart line; every cart code path uses this"""
+    delivery_charge = from_fils(charge_fils)
+    return {
+        "item_code": DELIVERY_CHARGE_ITEM,
+        "item_name": "Delivery Service Charge",
+        "qty": 1,
+        "rate": delivery_charge,
+        "amount": delivery_charge,
+        "description": f"Delivery to {area_code} area",
+        "custom_is_delivery_charge": 1
+    }
+
+
+def stamp_cart(cart, area_code):
+    """Attach totals to a fully calculated cart so later reads can reuse them"""
+    totals = CartTotals.from_cart(cart, area_code, get_pricing_version())
+    cart[TOTALS_KEY] = totals.to_dict()
+    return cart
+
+
+def get_stored_totals(stored_cart):
+    """Get the totals tracked on a stored cart, if any"""
+    if not stored_cart:
+        return None
+    return CartTotals.from_dict(stored_cart.get(TOTALS_KEY))
+
+
+def summarize_totals(cart, area_code=None):
+    """Display totals of a priced cart, used to patch the cart page in place"""
+    from sa7ba_custom.sa7ba_custom.custom.area_registry import get_area
+
+    items = cart.get("items", [])
+    totals = split_totals(items)
+    area = get_area(area_code) if area_code else None
+    return {
+        "items_count": sum(1 for item in items if item.get("item_code") != DELIVERY_CHARGE_ITEM),
+        "delivery_area": area.area_code if area else None,
+        "area_name": area.area_name if area else None,
+        "estimated_delivery_time": area.estimated_delivery_time if area else None,
+        "subtotal": from_fils(totals.subtotal),
+        "delivery_charge": from_fils(totals.delivery_charge),
+        "total": from_fils(totals.total),
+        "formatted_subtotal": format_amount(totals.subtotal),
+        "formatted_delivery_charge": format_amount(totals.delivery_charge),
+        "formatted_total": format_amount(totals.total)
+    }
+
+
+def get_current_cart_summary():
+    """Totals of the browser's stored cart; exposed to Jinja for the first page render"""
+    from sa7ba_custom.sa7ba_custom.custom.cart_store import load_cart
+
+    return summarize_totals(
+        load_cart() or {"items": []},
+        frappe.local.cookie_manager.get_cookie('selected_delivery_area')
+    )
@@ -0,0 +1,148 @@
+import frappe
+
+# Write-behind counters.
+#
+# Hot counters such as Customer.custom_guest_checkout_count are incremented
+# atomically in a Redis hash (one per doctype and field) once the triggering
+# transaction commits, instead of a read-modify-write that locks the row.
+# A scheduled flush moves the pending hash aside and applies all deltas with
+# a few batched UPDATEs. Reads add pending and in-flight deltas to the stored
+# value, so they stay exact between flushes.
+#
+# Every in-flight hash carries a flush id that is recorded in the database in
+# the same transaction as its UPDATEs. A flush resumed after a worker died
+# between the commit and deleting the hash finds its id already applied and
+# only drops the hash, so no delta is counted twice.
+
+# Counters that may be written behind: (doctype, fieldname)
+COUNTERS = (
+    ("Customer", "custom_guest_checkout_count"),
+)
+
+FLUSH_CHUNK_SIZE = 500
+# Field of the in-flight hash holding its flush id
+FLUSH_ID_FIELD = "__flush_id"
+
+
+def _keys(doctype, field):
+    cache = frappe.cache()
+    base = f"sa7ba_counter:{frappe.scrub(doctype)}:{field}"
+    return cache.make_key(base), cache.make_key(f"{base}:inflight")
+
+
+def _check_counter(doctype, field):
+    if (doctype, field) not in COUNTERS:
+        frappe.throw(f"{doctype}.{field} is not a registered counter")
+
+
+def increment_counter(doctype, name, field, delta=1):
+    """Add delta to a document counter once the current transaction commits"""
+    _check_counter(doctype, field)
+    if not name or not delta:
+        return
+    frappe.db.after_commit.add(lambda: _increment_now(doctype, name, field, delta))
+
+
+def _increment_now(doctype, name, field, delta):
+    try:
+        pending, _ = _keys(doctype, field)
+        frappe.cache().pipeline().hincrby(pending, name, delta).execute()
+    except Exception:
+        # Redis unavailable: fall back to an atomic in-place increment
+        _apply_deltas(doctype, field, {name: delta})
+        frappe.db.commit()
+
+
+def get_counter_value(doctype, name, field):
+    """Stored value plus deltas not yet flushed"""
+    _check_counter(doctype, field)
+    stored = frappe.db.get_value(doctype, name, field) or 0
+    return stored + get_pending_delta(doctype, name, field)
+
+
+def get_pending_delta(doctype, name, field):
+    """Deltas waiting in Redis for one document (pending and being flushed)"""
+    cache = frappe.cache()
+    pipe = cache.pipeline()
+    for key in _keys(doctype, field):
+        pipe.hget(key, name)
+    return sum(int(value or 0) for value in pipe.execute())
+
+
+def flush_counters():
+    """Apply pending counter deltas to the database; run by the scheduler"""
+    for doctype, field in COUNTERS:
+        flush_counter(doctype, field)
+
+
+def flush_counter(doctype, field):
+    """Flush one counter hash; returns the number of documents updated"""
+    # Raw commands via pipelines: RedisWrapper's hash helpers pickle values
+    cache = frappe.cache()
+    pending, inflight = _keys(doctype, field)
+
+    # A previous flush that died before finishing left its deltas in flight
+    if not cache.pipeline().exists(inflight).execute()[0]:
+        try:
+            cache.pipeline().rename(pending, inflight).execute()
+        except Exception:
+            # Nothing pending
+            return 0
+
+    # Kept if the in-flight hash already has one from an earlier attempt
+    pipe = cache.pipeline()
+    pipe.hsetnx(inflight, FLUSH_ID_FIELD, frappe.generate_hash(length=16))
+    pipe.hgetall(inflight)
+    _, data = pipe.execute()
+
+    data = {(key.decode() if isinstance(key, bytes) else key): value for key, value in data.items()}
+    flush_id = data.pop(FLUSH_ID_FIELD)
+    flush_id = flush_id.decode() if isinstance(flush_id, bytes) else flush_id
+    deltas = {name: int(delta) for name, delta in data.items() if int(delta)}
+
+    marker = f"sa7ba_counter_flush:{frappe.scrub(doctype)}:{field}"
+    if get_applied_flush(marker) == flush_id:
+        # Applied and committed by a flush that died before cleaning up
+        cache.pipeline().delete(inflight).execute()
+        return 0
+
+    try:
+        _apply_deltas(doctype, field, deltas)
+        frappe.db.set_global(marker, flush_id)
+        frappe.db.commit()
+    except Exception:
+        frappe.db.rollback()
+        # Hand the deltas back to the pending hash so nothing is lost
+        pipe = cache.pipeline()
+        for name, delta in deltas.items():
+            pipe.hincrby(pending, name, delta)
+        pipe.delete(inflight)
+        pipe.execute()
+        raise
+
+    cache.pipeline().delete(inflight).execute()
+    return len(deltas)
+
+
+def get_applied_flush(marker):
+    """Last flush id committed for a counter (read past the defaults cache)"""
+    return frappe.db.get_value("DefaultValue",
+        {"parent": "__global", "defkey": marker}, "defvalue")
+
+
+def _apply_deltas(doctype, field, deltas):
+    """Add deltas with one UPDATE per chunk of documents"""
+    names = list(deltas)
+    for start in range(0, len(names), FLUSH_CHUNK_SIZE):
+        chunk = names[start:start + FLUSH_CHUNK_SIZE]
+        values = []
+        for name in chunk:
+            values.extend((name, deltas[name]))
+        values.extend(chunk)
+
+        frappe.db.sql(f"""
+            UPDATE `tab{doctype}`
+            SET `{field}` = COALESCE(`{field}`, 0)
+                + CASE `name` {" ".join(["WHEN %s THEN %s"] * len(chunk))} ELSE 0 END
+            WHERE `name` IN ({", ".join(["%s"] * len(chunk))})
+        """, values)
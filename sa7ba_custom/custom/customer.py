@@ -1,7 +1,17 @@
 import frappe
 from frappe import _
 from frappe.utils import validate_email_address, validate_phone_number
+from sa7ba_custom.sa7ba_custom.custom.instrumentation import instrument
 
+DEFAULT_COUNTRY_CODE = "965"
+LOCAL_PHONE_LENGTH = 8
+
+IDENTITY_FIELDS = [
+    "name", "email_id", "mobile_no", "custom_is_guest_customer",
+    "custom_email_key", "custom_phone_key"
+]
+
+@instrument
 def validate_customer(doc, method):
     """Validate customer data"""
     if doc.custom_is_guest_customer and not doc.email_id:
@@ -9,13 +19,74 @@ def validate_customer(doc, method):
     
     if doc.custom_is_guest_customer and not doc.mobile_no:
         frappe.throw(_("Guest customers must have a mobile number"))
+    
+    # Keep canonical identity keys in sync for guest lookups
+    doc.custom_email_key = normalize_email(doc.email_id)
+    doc.custom_phone_key = normalize_phone(doc.mobile_no)
+
+def normalize_email(email):
+    """Canonical email key: trimmed and lowercased"""
+    return (email or "").strip().lower() or None
+
+def normalize_phone(phone, country_code=DEFAULT_COUNTRY_CODE):
+    """
+    Canonical E.164 phone key
+    "+965 5xxxxxxx", "00965 5xxxxxxx" and "5xxxxxxx" all map to "+9655xxxxxxx"
+    """
+    if not phone:
+        return None
+    
+    phone = str(phone).strip()
+    digits = "".join(ch for ch in phone if ch.isdigit())
+    if not digits:
+        return None
+    
+    if phone.startswith("+"):
+        return f"+{digits}"
+    if digits.startswith("00"):
+        return f"+{digits[2:]}"
+    if len(digits) == LOCAL_PHONE_LENGTH:
+        return f"+{country_code}{digits}"
+    
+    # Already carries a country code, just without the "+"
+    return f"+{digits}"
+
+def find_customer_by_identity(email_key, phone_key, for_update=False):
+    """
+    Resolve a customer by canonical email or phone in one indexed query
+    Email matches win over phone matches
+    for_update makes it a locking read, which sees rows committed after the
+    transaction's snapshot was taken
+    """
+    or_filters = {}
+    if email_key:
+        or_filters["custom_email_key"] = email_key
+    if phone_key:
+        or_filters["custom_phone_key"] = phone_key
+    
+    if not or_filters:
+        return None
+    
+    matches = frappe.get_all("Customer",
+        or_filters=or_filters,
+        fields=IDENTITY_FIELDS,
+        order_by="creation asc",
+        limit=10,
+        for_update=for_update
+    )
+    
+    for match in matches:
+        if email_key and match.custom_email_key == email_key:
+            return match
+    
+    return matches[0] if matches else None
 
-def update_guest_count(doc, method):
-    """Update guest checkout count"""
-    if doc.custom_is_guest_customer and doc.has_value_changed('custom_is_guest_customer'):
-        # Increment guest checkout count
-        doc.custom_guest_checkout_count = (doc.custom_guest_checkout_count or 0) + 1
+def get_guest_checkout_count(customer):
+    """Guest checkouts for a customer, including increments not yet flushed"""
+    from sa7ba_custom.sa7ba_custom.custom.counters import get_counter_value
+    return get_counter_value("Customer", customer, "custom_guest_checkout_count")
 
+@instrument
 def create_guest_customer(email, phone, first_name, last_name=""):
     """
     Create or retrieve guest customer
@@ -36,41 +107,37 @@ def create_guest_customer(email, phone, first_name, last_name=""):
     if not validate_phone_number(phone):
         frappe.throw(_("Invalid phone number"))
     
-    # 1. Check if customer exists by email
-    existing_customer = frappe.db.exists("Customer", {"email_id": email})
+    email_key = normalize_email(email)
+    phone_key = normalize_phone(phone)
+    
+    # 1. Resolve an existing customer by email or phone
+    existing = find_customer_by_identity(email_key, phone_key)
+    
+    if not existing:
+        # Serialize creation per identity until this transaction commits,
+        # then check again in case a concurrent request just created it.
+        # A plain SELECT would read this transaction's REPEATABLE READ
+        # snapshot and miss that customer, so the re-check is a locking read.
+        from sa7ba_custom.sa7ba_custom.custom.idempotency import acquire_until_commit
+        acquire_until_commit(f"guest_email:{email_key}", f"guest_phone:{phone_key}")
+        existing = find_customer_by_identity(email_key, phone_key, for_update=True)
     
-    if existing_customer:
-        customer = frappe.get_doc("Customer", existing_customer)
-        # Update phone if different
-        if phone and customer.mobile_no != phone:
-            customer.mobile_no = phone
-            customer.save(ignore_permissions=True)
+    if existing:
+        # Coalesce identity and guest flag changes into one write
+        updates = {}
+        if existing.custom_email_key != email_key and existing.custom_phone_key == phone_key:
+            updates.update({"email_id": email, "custom_email_key": email_key})
+        if existing.custom_phone_key != phone_key:
+            updates.update({"mobile_no": phone, "custom_phone_key": phone_key})
+        if not existing.custom_is_guest_customer:
+            updates["custom_is_guest_customer"] = 1
         
-        # Update guest status if not set
-        if not customer.custom_is_guest_customer:
-            customer.custom_is_guest_customer = 1
-            customer.save(ignore_permissions=True)
+        if updates:
+            frappe.db.set_value("Customer", existing.name, updates)
         
-        return customer.name
-    
-    # 2. Check by phone if no email match
-    if phone:
-        existing_by_phone = frappe.db.exists("Customer", {"mobile_no": phone})
-        if existing_by_phone:
-            customer = frappe.get_doc("Customer", existing_by_phone)
-            # Update email if different
-            if email and customer.email_id != email:
-                customer.email_id = email
-                customer.save(ignore_permissions=True)
-            
-            # Update guest status if not set
-            if not customer.custom_is_guest_customer:
-                customer.custom_is_guest_customer = 1
-                customer.save(ignore_permissions=True)
-            
-            return customer.name
-    
-    # 3. Create new guest customer
+        return existing.name
+    
+    # 2. Create new guest customer
     customer = frappe.new_doc("Customer")
     customer.customer_name = f"{first_name} {last_name}".strip() if last_name else first_name
     customer.customer_type = "Individual"
@@ -78,8 +145,11 @@ def create_guest_customer(email, phone, first_name, last_name=""):
     customer.territory = "Kuwait"
     customer.email_id = email
     customer.mobile_no = phone
+    customer.custom_email_key = email_key
+    customer.custom_phone_key = phone_key
     customer.custom_is_guest_customer = 1
-    customer.custom_guest_checkout_count = 1
+    # Checkouts are counted when each guest order is submitted
+    customer.custom_guest_checkout_count = 0
     
     # Set naming series for guest customers
     customer.naming_series = "GST-.#####"
@@ -88,6 +158,36 @@ def create_guest_customer(email, phone, first_name, last_name=""):
     
     return customer.name
 
+def backfill_identity_keys(chunk_size=1000):
+    """Populate canonical identity keys for existing customers"""
+    last_name = ""
+    updated = 0
+    
+    while True:
+        customers = frappe.get_all("Customer",
+            filters={"name": [">", last_name]},
+            fields=["name", "email_id", "mobile_no", "custom_email_key", "custom_phone_key"],
+            order_by="name asc",
+            limit=chunk_size
+        )
+        if not customers:
+            break
+        
+        for customer in customers:
+            email_key = normalize_email(customer.email_id)
+            phone_key = normalize_phone(customer.mobile_no)
+            if (customer.custom_email_key, customer.custom_phone_key) != (email_key, phone_key):
+                frappe.db.set_value("Customer", customer.name, {
+                    "custom_email_key": email_key,
+                    "custom_phone_key": phone_key
+                }, update_modified=False)
+                updated += 1
+        
+        frappe.db.commit()
+        last_name = customers[-1].name
+    
+    return {"updated": updated}
+
 def get_guest_customer_by_session():
     """Get guest customer from session"""
     guest_customer_id = frappe.local.cookie_manager.get_cookie('guest_customer_id')
@@ -0,0 +1,244 @@
+import csv
+import io
+import json
+import os
+import time
+import frappe
+from frappe import _
+
+# Bulk upsert of Delivery Area master data.
+#
+# Rows are streamed from CSV, JSON Lines or a JSON array and diffed against
+# the Delivery Area table loaded in one query. New areas are bulk inserted,
+# changed areas get one bulk update per chunk touching only the columns that
+# differ, and the area registry is invalidated once at the end instead of
+# once per saved document. Bulk writes skip document hooks, so rows are
+# checked here with the same rules as DeliveryArea.validate.
+
+DEFAULT_CHUNK_SIZE = 1000
+
+IMPORT_FIELDS = (
+    "area_code", "area_name", "custom_area_name_ar", "delivery_charge",
+    "estimated_delivery_time", "is_active", "notes", "custom_aliases", "custom_boundary"
+)
+
+
+def import_delivery_areas(rows, chunk_size=DEFAULT_CHUNK_SIZE, deactivate_missing=False, commit=True):
+    """
+    Create or update Delivery Areas keyed by area_code
+    rows: iterable of dicts; only the columns present in a row are compared and written.
+    deactivate_missing: deactivate active areas whose code is not in the import.
+    Returns created/updated/unchanged/deactivated/failed counts and per-row errors.
+    """
+    stats = {"created": 0, "updated": 0, "unchanged": 0, "deactivated": 0, "failed": 0, "errors": []}
+    started = time.monotonic()
+
+    existing = {
+        row.area_code: row
+        for row in frappe.get_all("Delivery Area", fields=["name", *IMPORT_FIELDS])
+        if row.area_code
+    }
+    seen = set()
+
+    for chunk in _chunked(rows, int(chunk_size)):
+        inserts = []
+        updates = {}
+
+        for line, raw in chunk:
+            try:
+                data = clean_area_row(raw)
+                if data["area_code"] in seen:
+                    frappe.throw(_("Duplicate area code {0}").format(data["area_code"]))
+                if data["area_code"] not in existing and not (
+                        data.get("area_name") and data.get("delivery_charge")):
+                    frappe.throw(_("Area name and delivery charge are required for new areas"))
+            except Exception as e:
+                stats["failed"] += 1
+                stats["errors"].append({"row": line, "error": str(e)})
+                continue
+
+            seen.add(data["area_code"])
+            current = existing.get(data["area_code"])
+            if not current:
+                inserts.append(data)
+                continue
+
+            changed = {
+                field: value for field, value in data.items()
+                if value != normalize_value(field, current.get(field))
+            }
+            if changed:
+                updates[current.name] = changed
+                current.update(changed)
+            else:
+                stats["unchanged"] += 1
+
+        if inserts:
+            _insert_areas(inserts)
+            stats["created"] += len(inserts)
+        if updates:
+            _update_areas(updates)
+            stats["updated"] += len(updates)
+
+        if commit:
+            frappe.db.commit()
+
+    if deactivate_missing:
+        missing = {
+            row.name: {"is_active": 0}
+            for code, row in existing.items()
+            if code not in seen and row.is_active
+        }
+        for chunk in _chunked(missing.items(), int(chunk_size)):
+            _update_areas(dict(row for _, row in chunk))
+        stats["deactivated"] = len(missing)
+        if commit:
+            frappe.db.commit()
+
+    if stats["created"] or stats["updated"] or stats["deactivated"]:
+        _invalidate_registry(commit)
+
+    stats["total"] = stats["created"] + stats["updated"] + stats["unchanged"]
+    stats["elapsed"] = round(time.monotonic() - started, 3)
+    frappe.logger().info(
+        f"Delivery Area import: {stats['created']} created, {stats['updated']} updated, "
+        f"{stats['unchanged']} unchanged, {stats['deactivated']} deactivated, "
+        f"{stats['failed']} failed in {stats['elapsed']}s"
+    )
+    return stats
+
+
+def import_delivery_areas_from_file(path, file_format=None, **kwargs):
+    """
+    Import Delivery Areas from a CSV, JSON Lines or JSON file
+    e.g. bench execute sa7ba_custom.sa7ba_custom.custom.delivery_area_import.import_delivery_areas_from_file
+         --kwargs "{'path': '/tmp/areas.csv', 'deactivate_missing': 1}"
+    """
+    with open(path, encoding="utf-8-sig", newline="") as f:
+        return import_delivery_areas(iter_area_rows(f, file_format or _guess_format(path)), **kwargs)
+
+
+def iter_area_rows(stream, file_format="csv"):
+    """Yield area dicts from a text stream without loading CSV or JSON Lines files whole"""
+    if isinstance(stream, str):
+        stream = io.StringIO(stream)
+
+    if file_format == "csv":
+        for row in csv.DictReader(stream):
+            yield {key.strip(): value for key, value in row.items() if key}
+    elif file_format == "jsonl":
+        for line in stream:
+            if line.strip():
+                yield json.loads(line)
+    elif file_format == "json":
+        data = json.load(stream)
+        yield from (data.get("areas", []) if isinstance(data, dict) else data)
+    else:
+        frappe.throw(_("Unsupported import format: {0}").format(file_format))
+
+
+def clean_area_row(raw):
+    """Normalize one imported row to the Delivery Area columns it sets"""
+    data = {
+        field: normalize_value(field, raw[field])
+        for field in IMPORT_FIELDS if field in raw
+    }
+
+    if not data.get("area_code"):
+        frappe.throw(_("Area code is required"))
+    if "area_name" in data and not data["area_name"]:
+        frappe.throw(_("Area name is required"))
+    if "delivery_charge" in data and data["delivery_charge"] <= 0:
+        frappe.throw(_("Delivery charge must be greater than 0"))
+    if data.get("custom_boundary"):
+        from sa7ba_custom.sa7ba_custom.custom.area_geo import parse_boundary
+        try:
+            parse_boundary(data["custom_boundary"])
+        except ValueError as e:
+            frappe.throw(_("Invalid boundary: {0}").format(e))
+
+    return data
+
+
+def normalize_value(field, value):
+    """Coerce imported and stored values to one comparable form"""
+    if field == "delivery_charge":
+        return round(float(value or 0), 3)
+    if field == "is_active":
+        if isinstance(value, str):
+            return 0 if value.strip().lower() in ("0", "no", "false", "") else 1
+        return 1 if value else 0
+    if field == "custom_boundary" and isinstance(value, (dict, list)):
+        return json.dumps(value, separators=(",", ":"))
+    if value is None:
+        return None
+    return str(value).strip() or None
+
+
+def _insert_areas(rows):
+    """Insert new Delivery Areas with one multi-row INSERT"""
+    from frappe.model.naming import set_new_name
+
+    now = frappe.utils.now()
+    user = frappe.session.user
+    fields = ["name", "creation", "modified", "owner", "modified_by", "docstatus", *IMPORT_FIELDS]
+    values = []
+
+    for data in rows:
+        doc = frappe.new_doc("Delivery Area")
+        doc.update({"is_active": 1, **data})
+        set_new_name(doc)
+        values.append([doc.name, now, now, user, user, 0, *(doc.get(field) for field in IMPORT_FIELDS)])
+
+    frappe.db.bulk_insert("Delivery Area", fields, values)
+
+
+def _update_areas(updates):
+    """
+    Write changed columns for many Delivery Areas in one UPDATE
+    updates: {name: {field: value}}; each column only changes on the rows that set it
+    """
+    fields = sorted({field for changed in updates.values() for field in changed})
+    assignments = []
+    values = []
+
+    for field in fields:
+        names = [name for name, changed in updates.items() if field in changed]
+        assignments.append(
+            f"`{field}` = CASE `name` {' '.join(['WHEN %s THEN %s'] * len(names))} ELSE `{field}` END"
+        )
+        for name in names:
+            values.extend((name, updates[name][field]))
+
+    names = list(updates)
+    values.extend((frappe.utils.now(), frappe.session.user, *names))
+    frappe.db.sql(f"""
+        UPDATE `tabDelivery Area`
+        SET {", ".join(assignments)}, `modified` = %s, `modified_by` = %s
+        WHERE `name` IN ({", ".join(["%s"] * len(names))})
+    """, values)
+
+
+def _invalidate_registry(commit):
+    from sa7ba_custom.sa7ba_custom.custom.area_registry import invalidate_area_registry
+    if commit:
+        invalidate_area_registry()
+    else:
+        frappe.db.after_commit.add(invalidate_area_registry)
+
+
+def _guess_format(path):
+    extension = os.path.splitext(path)[1].lower().lstrip(".")
+    return {"ndjson": "jsonl"}.get(extension, extension)
+
+
+def _chunked(iterable, size):
+    """Yield lists of (row number, row); row numbers start at 1"""
+    chunk = []
+    for line, row in enumerate(iterable, start=1):
+        chunk.append((line, row))
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
@@ -0,0 +1,329 @@
+import frappe
+from collections import namedtuple
+from datetime import timedelta
+from sa7ba_custom.sa7ba_custom.custom.money import DELIVERY_CHARGE_ITEM, from_fils, line_amount, to_fils
+
+# Compiled delivery pricing rules.
+#
+# Delivery Pricing Rules adjust an area's base delivery charge: free delivery
+# above a subtotal, weight or bulky item surcharges, time-of-day surcharges
+# and customer group overrides. Enabled rules are loaded once per rules
+# version (shared through Redis like the area registry) and compiled per
+# worker into a priority-ordered tuple for every area, so pricing a cart is a
+# dict lookup plus a few comparisons per rule. The only queries are for cart
+# details the rules need and the cart lacks (see get_cart_delivery_charge).
+# Amounts are compared and added in integer fils.
+
+RULES_SNAPSHOT_KEY = "sa7ba_delivery_pricing_rules"
+RULES_VERSION_KEY = "sa7ba_delivery_pricing_rules_version"
+
+FREE_DELIVERY = "Free Delivery"
+SET_CHARGE = "Set Charge"
+ADD_SURCHARGE = "Add Surcharge"
+
+RULE_FIELDS = (
+    "name", "priority", "action", "amount", "stop_further_rules", "delivery_area",
+    "customer_group", "item_group", "min_subtotal", "min_weight",
+    "from_time", "to_time", "valid_from", "valid_upto"
+)
+
+# item_groups is the rule's group and its descendants; amount and min_subtotal are
+# fils; times are seconds since midnight
+CompiledRule = namedtuple("CompiledRule", [
+    "name", "action", "amount", "stop", "customer_group", "item_groups",
+    "min_subtotal", "min_weight", "from_seconds", "to_seconds", "valid_from", "valid_upto"
+])
+
+DeliveryQuote = namedtuple("DeliveryQuote", ["charge", "rules"])
+
+PricingContext = namedtuple("PricingContext", [
+    "subtotal", "weight", "item_groups", "customer_group", "seconds", "date"
+])
+
+
+class DeliveryPricingEngine:
+    """Per-area rule lists compiled from one rules snapshot"""
+
+    __slots__ = ("version", "by_area", "needs_items", "needs_customer_group")
+
+    def __init__(self, version, rules, area_names):
+        """rules: compiled rules ordered by priority; area_names: every Delivery Area name"""
+        self.version = version
+
+        shared = tuple(rule for area, rule in rules if not area)
+        self.by_area = {
+            name: tuple(rule for area, rule in rules if not area or area == name)
+            for name in area_names
+        }
+        self.by_area[None] = shared
+
+        # Item weights and groups are only gathered when some rule looks at them
+        self.needs_items = any(
+            rule.item_groups or rule.min_weight for _, rule in rules
+        )
+        self.needs_customer_group = any(rule.customer_group for _, rule in rules)
+
+    def get_rules(self, area_name):
+        rules = self.by_area.get(area_name)
+        return self.by_area[None] if rules is None else rules
+
+    def quote(self, area_name, base_charge, context):
+        """Apply the area's rules to its base charge (KWD)"""
+        rules = self.get_rules(area_name)
+        if not rules:
+            return DeliveryQuote(base_charge, ())
+
+        charge = to_fils(base_charge)
+        applied = []
+        for rule in rules:
+            if not rule_matches(rule, context):
+                continue
+
+            if rule.action == FREE_DELIVERY:
+                charge = 0
+            elif rule.action == SET_CHARGE:
+                charge = rule.amount
+            else:
+                charge += rule.amount
+            applied.append(rule.name)
+
+            if rule.stop:
+                break
+
+        return DeliveryQuote(from_fils(max(charge, 0)), tuple(applied))
+
+
+def rule_matches(rule, context):
+    """True if every condition set on the rule holds for the context"""
+    if rule.min_subtotal and context.subtotal < rule.min_subtotal:
+        return False
+    if rule.min_weight and context.weight < rule.min_weight:
+        return False
+    if rule.customer_group and context.customer_group != rule.customer_group:
+        return False
+    if rule.item_groups and rule.item_groups.isdisjoint(context.item_groups):
+        return False
+    if rule.valid_from and context.date < rule.valid_from:
+        return False
+    if rule.valid_upto and context.date > rule.valid_upto:
+        return False
+    if rule.from_seconds is not None:
+        start, end, now = rule.from_seconds, rule.to_seconds, context.seconds
+        # A window ending before it starts wraps past midnight
+        inside = start <= now < end if start <= end else (now >= start or now < end)
+        if not inside:
+            return False
+    return True
+
+
+def to_seconds(value):
+    """Seconds since midnight for a Time field value"""
+    if value in (None, ""):
+        return None
+    if isinstance(value, timedelta):
+        return int(value.total_seconds()) % 86400
+    hours, minutes, *rest = str(value).split(":")
+    return int(hours) * 3600 + int(minutes) * 60 + int(float(rest[0]) if rest else 0)
+
+
+def compile_rule(row):
+    """Build a CompiledRule from a snapshot row"""
+    return CompiledRule(
+        name=row["name"],
+        action=row["action"] or ADD_SURCHARGE,
+        amount=to_fils(row["amount"]),
+        stop=bool(row["stop_further_rules"]),
+        customer_group=row["customer_group"] or None,
+        item_groups=frozenset(row["item_groups"]),
+        min_subtotal=to_fils(row["min_subtotal"]),
+        min_weight=float(row["min_weight"] or 0),
+        from_seconds=to_seconds(row["from_time"]),
+        to_seconds=to_seconds(row["to_time"]),
+        valid_from=str(row["valid_from"]) if row["valid_from"] else None,
+        valid_upto=str(row["valid_upto"]) if row["valid_upto"] else None
+    )
+
+
+def get_rules_version():
+    """Read the rules version from Redis at most once per request"""
+    version = getattr(frappe.local, "sa7ba_pricing_rules_version", None)
+    if version is None:
+        cache = frappe.cache()
+        version = int(cache.get(cache.make_key(RULES_VERSION_KEY)) or 0)
+        frappe.local.sa7ba_pricing_rules_version = version
+    return version
+
+
+def _build_snapshot(version):
+    """Load enabled rules, expanding item groups, and publish them as the shared snapshot"""
+    from frappe.utils.nestedset import get_descendants_of
+
+    rows = frappe.get_all("Delivery Pricing Rule",
+        filters={"enabled": 1},
+        fields=list(RULE_FIELDS),
+        order_by="priority desc, name asc"
+    )
+    for row in rows:
+        row["item_groups"] = [row.item_group, *get_descendants_of("Item Group", row.item_group)] \
+            if row.item_group else []
+        for field in ("from_time", "to_time", "valid_from", "valid_upto"):
+            row[field] = str(row[field]) if row[field] else None
+
+    snapshot = {"version": version, "rows": [dict(row) for row in rows]}
+    frappe.cache().set_value(RULES_SNAPSHOT_KEY, snapshot)
+    return snapshot
+
+
+# Per-worker engine, rebuilt when the rules or area registry version moves
+_engine = None
+
+
+def get_pricing_engine():
+    """Get the engine compiled from the current rules and Delivery Areas"""
+    global _engine
+
+    from sa7ba_custom.sa7ba_custom.custom.area_registry import get_registry
+    registry = get_registry()
+    version = (registry.version, get_rules_version())
+
+    engine = _engine
+    if engine is not None and engine.version == version:
+        return engine
+
+    snapshot = frappe.cache().get_value(RULES_SNAPSHOT_KEY)
+    if not snapshot or snapshot.get("version") != version[1]:
+        snapshot = _build_snapshot(version[1])
+
+    rules = [(row["delivery_area"], compile_rule(row)) for row in snapshot["rows"]]
+    engine = DeliveryPricingEngine(version, rules, registry.by_name)
+    _engine = engine
+    return engine
+
+
+def invalidate_pricing_rules():
+    """Bump the rules version so every worker recompiles on its next request"""
+    global _engine
+
+    cache = frappe.cache()
+    cache.incr(cache.make_key(RULES_VERSION_KEY))
+    cache.delete_value(RULES_SNAPSHOT_KEY)
+    _engine = None
+    if hasattr(frappe.local, "sa7ba_pricing_rules_version"):
+        del frappe.local.sa7ba_pricing_rules_version
+
+
+def make_context(items, customer_group=None, at=None, needs_items=True):
+    """Pricing inputs from cart or order item rows (delivery lines excluded); subtotal in fils"""
+    at = at or frappe.utils.now_datetime()
+    subtotal = 0
+    weight = 0
+    item_groups = set()
+
+    for item in items or ():
+        if item.get("item_code") == DELIVERY_CHARGE_ITEM:
+            continue
+        subtotal += line_amount(item)
+        if needs_items:
+            weight += item.get("total_weight") \
+                or (item.get("weight_per_unit") or 0) * (item.get("qty") or 0)
+            if item.get("item_group"):
+                item_groups.add(item.get("item_group"))
+
+    return PricingContext(
+        subtotal=subtotal,
+        weight=weight,
+        item_groups=item_groups,
+        customer_group=customer_group,
+        seconds=at.hour * 3600 + at.minute * 60 + at.second,
+        date=at.date().isoformat()
+    )
+
+
+def quote_delivery(area, items=None, customer_group=None, at=None):
+    """
+    Delivery charge for an area record given the cart or order items
+    area may be a registry record or a ResolvedArea; returns a DeliveryQuote
+    """
+    if not area:
+        return DeliveryQuote(0, ())
+
+    engine = get_pricing_engine()
+    if not engine.get_rules(area.name):
+        return DeliveryQuote(area.delivery_charge, ())
+
+    context = make_context(items, customer_group, at, engine.needs_items)
+    return engine.quote(area.name, area.delivery_charge, context)
+
+
+def get_cart_delivery_charge(area_code, cart=None):
+    """
+    Delivery charge for an area code applied to a cart dict
+    Cart dicts carry neither a customer group nor, for lines added before
+    the cart was priced, item groups and weights. They are filled in the way
+    the Sales Order will carry them, so the cart quotes what before_submit
+    later checks the order against.
+    """
+    from sa7ba_custom.sa7ba_custom.custom.area_registry import get_area
+
+    area = get_area(area_code)
+    cart = cart or {}
+    items = cart.get("items")
+    customer_group = cart.get("customer_group")
+
+    engine = get_pricing_engine()
+    if area and engine.get_rules(area.name):
+        if engine.needs_items:
+            fill_item_details(items)
+        if engine.needs_customer_group and not customer_group:
+            customer_group = get_session_customer_group()
+
+    return quote_delivery(area, items=items, customer_group=customer_group).charge
+
+
+def fill_item_details(items):
+    """Set missing item_group and weight_per_unit on cart lines (one Item query)"""
+    missing = [
+        item for item in items or ()
+        if item.get("item_code") and item.get("item_code") != DELIVERY_CHARGE_ITEM
+        and (item.get("item_group") is None or item.get("weight_per_unit") is None)
+    ]
+    if not missing:
+        return
+
+    details = {
+        row.name: row
+        for row in frappe.get_all("Item",
+            filters={"name": ["in", list({item.get("item_code") for item in missing})]},
+            fields=["name", "item_group", "weight_per_unit"]
+        )
+    }
+    for item in missing:
+        row = details.get(item.get("item_code")) or frappe._dict()
+        if item.get("item_group") is None:
+            item["item_group"] = row.item_group or ""
+        if item.get("weight_per_unit") is None:
+            item["weight_per_unit"] = row.weight_per_unit or 0
+
+
+def get_session_customer_group():
+    """Customer group of the customer the current session shops as"""
+    if frappe.session.user == "Guest":
+        customer = frappe.local.cookie_manager.get_cookie("guest_customer_id")
+    else:
+        from webshop.webshop.shopping_cart.cart import get_party
+        customer = get_party().name
+
+    if not customer:
+        return None
+    return frappe.db.get_value("Customer", customer, "customer_group")
+
+
+def get_order_delivery_charge(doc, area):
+    """Delivery charge for a Sales Order, priced at the time the order was created"""
+    at = frappe.utils.get_datetime(doc.creation) if doc.get("creation") else None
+    return quote_delivery(
+        area,
+        items=doc.items,
+        customer_group=doc.get("customer_group"),
+        at=at
+    ).charge
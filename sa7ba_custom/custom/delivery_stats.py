@@ -0,0 +1,168 @@
+import frappe
+from sa7ba_custom.sa7ba_custom.custom.instrumentation import instrument
+
+# Per-area rollups of submitted Sales Orders.
+#
+# "Delivery Area Daily Stats" holds one row per (delivery area, day) and
+# "Delivery Area Stats" one running total per area. Both are adjusted inside
+# the submit/cancel transaction, so the Delivery Charges Summary report reads
+# days x areas rows and the Delivery Area form reads a single row instead of
+# scanning every order.
+
+STATS_DOCTYPE = "Delivery Area Daily Stats"
+AREA_STATS_DOCTYPE = "Delivery Area Stats"
+
+
+def get_stats_name(delivery_area, posting_date):
+    """Deterministic row name for an (area, day) pair"""
+    return f"{delivery_area or ''}::{posting_date}"
+
+
+@instrument
+def update_daily_stats(doc, method):
+    """Apply a submitted (+1) or cancelled (-1) order to its rollup rows"""
+    sign = -1 if method == "on_cancel" else 1
+    apply_order_to_stats(doc, sign)
+    if doc.custom_delivery_area:
+        apply_order_to_area_stats(doc, sign)
+
+
+def apply_order_to_stats(doc, sign):
+    """Upsert the rollup row for one order in a single statement"""
+    frappe.db.sql("""
+        INSERT INTO `tabDelivery Area Daily Stats`
+            (name, delivery_area, posting_date, order_count, guest_order_count,
+             delivery_revenue, grand_total_sum,
+             creation, modified, owner, modified_by, docstatus, idx)
+        VALUES
+            (%(name)s, %(delivery_area)s, %(posting_date)s, %(orders)s, %(guest_orders)s,
+             %(delivery_revenue)s, %(grand_total)s,
+             NOW(), NOW(), 'Administrator', 'Administrator', 0, 0)
+        ON DUPLICATE KEY UPDATE
+            order_count = order_count + VALUES(order_count),
+            guest_order_count = guest_order_count + VALUES(guest_order_count),
+            delivery_revenue = delivery_revenue + VALUES(delivery_revenue),
+            grand_total_sum = grand_total_sum + VALUES(grand_total_sum),
+            modified = NOW()
+    """, {
+        "name": get_stats_name(doc.custom_delivery_area, doc.transaction_date),
+        "delivery_area": doc.custom_delivery_area or None,
+        "posting_date": doc.transaction_date,
+        "orders": sign,
+        "guest_orders": sign if doc.custom_is_guest_order else 0,
+        "delivery_revenue": sign * (doc.custom_delivery_charge or 0),
+        "grand_total": sign * (doc.grand_total or 0)
+    })
+
+
+def rebuild_daily_stats(from_date=None, to_date=None):
+    """
+    Rebuild the rollup from submitted Sales Orders for a date range
+    Run with bench execute after the delivery snapshot backfill.
+    """
+    conditions = ["so.docstatus = 1"]
+    stats_conditions = ["1 = 1"]
+    if from_date:
+        conditions.append("so.transaction_date >= %(from_date)s")
+        stats_conditions.append("posting_date >= %(from_date)s")
+    if to_date:
+        conditions.append("so.transaction_date <= %(to_date)s")
+        stats_conditions.append("posting_date <= %(to_date)s")
+
+    values = {"from_date": from_date, "to_date": to_date}
+
+    frappe.db.sql(f"""
+        DELETE FROM `tabDelivery Area Daily Stats`
+        WHERE {" AND ".join(stats_conditions)}
+    """, values)
+
+    frappe.db.sql(f"""
+        INSERT INTO `tabDelivery Area Daily Stats`
+            (name, delivery_area, posting_date, order_count, guest_order_count,
+             delivery_revenue, grand_total_sum,
+             creation, modified, owner, modified_by, docstatus, idx)
+        SELECT
+            CONCAT(COALESCE(so.custom_delivery_area, ''), '::', so.transaction_date),
+            NULLIF(MAX(COALESCE(so.custom_delivery_area, '')), ''),
+            so.transaction_date,
+            COUNT(*),
+            SUM(CASE WHEN so.custom_is_guest_order = 1 THEN 1 ELSE 0 END),
+            COALESCE(SUM(so.custom_delivery_charge), 0),
+            COALESCE(SUM(so.grand_total), 0),
+            NOW(), NOW(), 'Administrator', 'Administrator', 0, 0
+        FROM `tabSales Order` so
+        WHERE {" AND ".join(conditions)}
+        GROUP BY COALESCE(so.custom_delivery_area, ''), so.transaction_date
+    """, values)
+
+    frappe.db.commit()
+
+    return frappe.db.count(STATS_DOCTYPE)
+
+
+def apply_order_to_area_stats(doc, sign):
+    """
+    Adjust the running counters of the order's delivery area
+    A cancel leaves last_order_on as it is; if the cancelled order was the
+    latest, reconcile_area_stats moves it back to the latest submitted one.
+    """
+    frappe.db.sql("""
+        INSERT INTO `tabDelivery Area Stats`
+            (name, delivery_area, order_count, submitted_revenue, delivery_revenue, last_order_on,
+             creation, modified, owner, modified_by, docstatus, idx)
+        VALUES
+            (%(area)s, %(area)s, %(orders)s, %(grand_total)s, %(delivery_revenue)s, %(order_on)s,
+             NOW(), NOW(), 'Administrator', 'Administrator', 0, 0)
+        ON DUPLICATE KEY UPDATE
+            order_count = order_count + VALUES(order_count),
+            submitted_revenue = submitted_revenue + VALUES(submitted_revenue),
+            delivery_revenue = delivery_revenue + VALUES(delivery_revenue),
+            last_order_on = IF(VALUES(last_order_on) IS NULL, last_order_on,
+                GREATEST(COALESCE(last_order_on, VALUES(last_order_on)), VALUES(last_order_on))),
+            modified = NOW()
+    """, {
+        "area": doc.custom_delivery_area,
+        "orders": sign,
+        "grand_total": sign * (doc.grand_total or 0),
+        "delivery_revenue": sign * (doc.custom_delivery_charge or 0),
+        "order_on": doc.creation if sign > 0 else None
+    })
+
+
+def get_area_stats(delivery_area):
+    """Running counters for one area (a single primary-key read)"""
+    stats = frappe.db.get_value(AREA_STATS_DOCTYPE, delivery_area,
+        ["order_count", "submitted_revenue", "delivery_revenue", "last_order_on"],
+        as_dict=True
+    )
+    return stats or frappe._dict(
+        order_count=0, submitted_revenue=0, delivery_revenue=0, last_order_on=None
+    )
+
+
+def reconcile_area_stats():
+    """
+    Recompute the per-area counters from submitted Sales Orders
+    Scheduled daily to repair any drift from failed or manual updates.
+    """
+    frappe.db.sql("DELETE FROM `tabDelivery Area Stats`")
+    frappe.db.sql("""
+        INSERT INTO `tabDelivery Area Stats`
+            (name, delivery_area, order_count, submitted_revenue, delivery_revenue,
+             last_order_on, reconciled_on,
+             creation, modified, owner, modified_by, docstatus, idx)
+        SELECT
+            so.custom_delivery_area,
+            so.custom_delivery_area,
+            COUNT(*),
+            COALESCE(SUM(so.grand_total), 0),
+            COALESCE(SUM(so.custom_delivery_charge), 0),
+            MAX(so.creation),
+            NOW(),
+            NOW(), NOW(), 'Administrator', 'Administrator', 0, 0
+        FROM `tabSales Order` so
+        WHERE so.docstatus = 1
+            AND so.custom_delivery_area IS NOT NULL AND so.custom_delivery_area != ''
+        GROUP BY so.custom_delivery_area
+    """)
+    frappe.db.commit()
@@ -0,0 +1,287 @@
+import json
+import time
+import frappe
+
+# Guest order confirmations, sent off the request path.
+#
+# Submitting a guest order only pushes its name onto a Redis list once the
+# transaction commits and nudges a deduplicated background job. The job
+# drains the list in batches: one query for the orders, a per-worker compiled
+# copy of the Email Template, one Email Queue insert per order and a single
+# commit per batch. Failed sends are retried with exponential backoff.
+#
+# A batch is moved (LMOVE) into a processing list owned by the flush run and
+# only dropped from it after the Email Queue rows are committed, so a crash
+# or error mid-batch loses nothing: the batch is put back on error, and
+# processing lists left behind by a dead worker are re-queued once they go
+# stale. Delivery is at least once.
+
+CONFIRMATION_TEMPLATE = "Guest Order Confirmation"
+
+QUEUE_KEY = "sa7ba_guest_confirmation_queue"
+# Sorted set of processing lists, scored by when their batch was taken
+PROCESSING_KEY = "sa7ba_guest_confirmation_processing"
+METRICS_KEY = "sa7ba_guest_confirmation_metrics"
+FLUSH_JOB_ID = "sa7ba_flush_guest_confirmations"
+
+BATCH_SIZE = 100
+MAX_ATTEMPTS = 5
+RETRY_BASE_DELAY = 60
+RETRY_MAX_DELAY = 60 * 60
+PROCESSING_TIMEOUT = 15 * 60
+
+
+def queue_guest_order_confirmation(order_name):
+    """Queue a confirmation for an order once the current transaction commits"""
+    entry = json.dumps({"order": order_name, "queued_at": time.time(), "attempt": 0})
+    frappe.db.after_commit.add(lambda: _push_and_flush([entry]))
+
+
+def _push(entries):
+    cache = frappe.cache()
+    pipe = cache.pipeline()
+    for entry in entries:
+        pipe.rpush(cache.make_key(QUEUE_KEY), entry if isinstance(entry, str) else json.dumps(entry))
+    pipe.execute()
+
+
+def _push_and_flush(entries):
+    _push(entries)
+    frappe.enqueue(
+        "sa7ba_custom.sa7ba_custom.custom.guest_notifications.flush_guest_confirmations",
+        queue="short",
+        job_id=FLUSH_JOB_ID,
+        deduplicate=True
+    )
+
+
+def flush_guest_confirmations(batch_size=BATCH_SIZE):
+    """Send queued confirmations in batches until nothing is due; also run by the scheduler"""
+    requeue_stale_batches()
+
+    processing = f"{QUEUE_KEY}:processing:{frappe.generate_hash(length=12)}"
+    while True:
+        entries = _take_batch(processing, batch_size)
+        if not entries:
+            return
+
+        try:
+            now = time.time()
+            due = [entry for entry in entries if entry.get("not_before", 0) <= now]
+            waiting = [entry for entry in entries if entry.get("not_before", 0) > now]
+            retries = send_confirmation_batch(due) if due else []
+        except Exception:
+            # Nothing was acknowledged; put the whole batch back for the next run
+            frappe.db.rollback()
+            _requeue(processing)
+            raise
+
+        _acknowledge(processing, waiting + retries)
+
+        if len(entries) < batch_size or not due:
+            # Drained, or only backed-off entries left for a later run
+            return
+
+
+def _take_batch(processing, batch_size):
+    """Move up to batch_size entries from the queue into a processing list"""
+    cache = frappe.cache()
+    queue = cache.make_key(QUEUE_KEY)
+    processing_key = cache.make_key(processing)
+    pipe = cache.pipeline(transaction=False)
+    # Registered before anything is moved, so the sweeper can find the list
+    pipe.zadd(cache.make_key(PROCESSING_KEY), {processing: time.time()})
+    for _ in range(batch_size):
+        pipe.lmove(queue, processing_key, "LEFT", "RIGHT")
+    raw = pipe.execute()[1:]
+    return [json.loads(entry) for entry in raw if entry is not None]
+
+
+def _acknowledge(processing, requeue):
+    """Drop a handled batch and queue its entries still to be sent, in one transaction"""
+    cache = frappe.cache()
+    queue = cache.make_key(QUEUE_KEY)
+    pipe = cache.pipeline()
+    for entry in requeue:
+        pipe.rpush(queue, json.dumps(entry))
+    pipe.delete(cache.make_key(processing))
+    pipe.zrem(cache.make_key(PROCESSING_KEY), processing)
+    pipe.execute()
+
+
+def _requeue(processing):
+    """Move every entry of a processing list back to the head of the queue, in order"""
+    cache = frappe.cache()
+    queue = cache.make_key(QUEUE_KEY)
+    processing_key = cache.make_key(processing)
+    while True:
+        pipe = cache.pipeline(transaction=False)
+        for _ in range(BATCH_SIZE):
+            pipe.lmove(processing_key, queue, "RIGHT", "LEFT")
+        if None in pipe.execute():
+            break
+    cache.pipeline().zrem(cache.make_key(PROCESSING_KEY), processing).execute()
+
+
+def requeue_stale_batches():
+    """Re-queue batches whose flush run died before acknowledging them"""
+    cache = frappe.cache()
+    stale = cache.pipeline().zrangebyscore(
+        cache.make_key(PROCESSING_KEY), "-inf", time.time() - PROCESSING_TIMEOUT
+    ).execute()[0]
+    for processing in stale:
+        _requeue(processing.decode() if isinstance(processing, bytes) else processing)
+
+
+def send_confirmation_batch(entries):
+    """
+    Insert Email Queue rows for a batch of orders and commit once
+    Returns the entries to queue again for a retry
+    """
+    started = time.monotonic()
+    names = [entry["order"] for entry in entries]
+    orders = {
+        row.name: row
+        for row in frappe.get_all("Sales Order",
+            filters={"name": ["in", names], "docstatus": 1},
+            fields=["name", "customer_name", "grand_total", "shipping_address_name",
+                    "custom_guest_email"]
+        )
+    }
+
+    sent, failed, errors, latency = 0, 0, [], 0.0
+    try:
+        template = get_confirmation_template()
+    except Exception as e:
+        template = None
+        frappe.log_error(f"Guest order confirmation template unavailable: {str(e)}")
+
+    for entry in entries:
+        order = orders.get(entry["order"])
+        if not order or not order.custom_guest_email:
+            # Cancelled, deleted or no address to send to
+            continue
+
+        if template is None:
+            errors.append(entry)
+            continue
+
+        frappe.db.savepoint("sa7ba_guest_confirmation")
+        try:
+            subject, message = render_confirmation(template, order)
+            frappe.sendmail(
+                recipients=[order.custom_guest_email],
+                subject=subject,
+                message=message,
+                reference_doctype="Sales Order",
+                reference_name=order.name,
+                send_priority=1
+            )
+            sent += 1
+            latency += time.time() - entry["queued_at"]
+        except Exception as e:
+            frappe.db.rollback(save_point="sa7ba_guest_confirmation")
+            entry["error"] = str(e)
+            errors.append(entry)
+
+    frappe.db.commit()
+
+    retries = []
+    for entry in errors:
+        if _schedule_retry(entry):
+            retries.append(entry)
+        else:
+            failed += 1
+            frappe.log_error(
+                f"Guest order confirmation for {entry['order']} failed after "
+                f"{entry['attempt'] + 1} attempts: {entry.get('error', 'template unavailable')}"
+            )
+
+    _record_metrics(sent, failed, len(retries), latency)
+    frappe.logger().info(
+        f"Guest confirmations: {sent} sent, {len(retries)} retrying, {failed} failed "
+        f"in {time.monotonic() - started:.2f}s"
+    )
+    return retries
+
+
+def _schedule_retry(entry):
+    """Set an entry's next attempt with exponential backoff; False once attempts run out"""
+    attempt = entry.get("attempt", 0) + 1
+    if attempt >= MAX_ATTEMPTS:
+        return False
+
+    delay = min(RETRY_BASE_DELAY * 2 ** (attempt - 1), RETRY_MAX_DELAY)
+    entry.update(attempt=attempt, not_before=time.time() + delay)
+    return True
+
+
+# Per-worker compiled template: (modified, subject template, body template)
+_template = None
+
+
+def get_confirmation_template():
+    """Compiled subject and body of the confirmation Email Template, rebuilt only when edited"""
+    global _template
+
+    modified = frappe.db.get_value("Email Template", CONFIRMATION_TEMPLATE, "modified")
+    if not modified:
+        frappe.throw(f"Email Template {CONFIRMATION_TEMPLATE} not found", frappe.DoesNotExistError)
+
+    cached = _template
+    if cached is None or cached[0] != modified:
+        from frappe.utils.jinja import get_jenv
+        template = frappe.db.get_value("Email Template", CONFIRMATION_TEMPLATE,
+            ["subject", "response", "response_html", "use_html"], as_dict=True)
+        body = template.response_html if template.use_html else template.response
+        jenv = get_jenv()
+        cached = (modified, jenv.from_string(template.subject or ""), jenv.from_string(body or ""))
+        _template = cached
+
+    return cached
+
+
+def render_confirmation(template, order):
+    """Render (subject, message) for one order"""
+    context = {
+        "customer_name": order.customer_name,
+        "order_id": order.name,
+        "order_total": order.grand_total,
+        "delivery_address": order.shipping_address_name,
+        "guest_email": order.custom_guest_email
+    }
+    return template[1].render(context), template[2].render(context)
+
+
+def _record_metrics(sent, failed, retried, latency):
+    cache = frappe.cache()
+    key = cache.make_key(METRICS_KEY)
+    pipe = cache.pipeline()
+    if sent:
+        pipe.hincrby(key, "sent", sent)
+        pipe.hincrbyfloat(key, "latency_sum", latency)
+    if failed:
+        pipe.hincrby(key, "failed", failed)
+    if retried:
+        pipe.hincrby(key, "retried", retried)
+    pipe.execute()
+
+
+def get_confirmation_metrics():
+    """Queue depth, counters and average queued-to-sent latency in seconds"""
+    cache = frappe.cache()
+    pipe = cache.pipeline()
+    pipe.llen(cache.make_key(QUEUE_KEY))
+    pipe.hgetall(cache.make_key(METRICS_KEY))
+    depth, counters = pipe.execute()
+
+    counters = {k.decode() if isinstance(k, bytes) else k: float(v) for k, v in counters.items()}
+    sent = int(counters.get("sent", 0))
+    return {
+        "queue_depth": depth,
+        "sent": sent,
+        "failed": int(counters.get("failed", 0)),
+        "retried": int(counters.get("retried", 0)),
+        "latency_sum": counters.get("latency_sum", 0),
+        "average_latency": round(counters.get("latency_sum", 0) / sent, 3) if sent else 0
+    }
@@ -0,0 +1,143 @@
+import hashlib
+import json
+import frappe
+from frappe import _
+
+# Idempotent request handling and commit-scoped locks.
+#
+# Clients send an Idempotency-Key with retryable POSTs. The first request
+# runs and its response is cached once the transaction commits; retries and
+# concurrent duplicates wait on a short Redis lock and then replay the
+# cached response instead of writing again. The response is stored with a
+# fingerprint of the caller and request payload; a key reused by another
+# caller or with a different payload is rejected with a 422, never replayed.
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+IDEMPOTENCY_TTL = 24 * 60 * 60
+LOCK_TIMEOUT = 30
+LOCK_WAIT = 10
+MAX_KEY_LENGTH = 128
+
+
+class RequestInProgressError(frappe.ValidationError):
+    pass
+
+
+class IdempotencyKeyReusedError(frappe.ValidationError):
+    http_status_code = 422
+
+
+def get_idempotency_key(key=None):
+    """Get the client idempotency key from an argument or request header"""
+    if not key:
+        request = getattr(frappe.local, "request", None)
+        key = request.headers.get(IDEMPOTENCY_HEADER) if request else None
+
+    key = (key or "").strip()
+    if len(key) > MAX_KEY_LENGTH:
+        frappe.throw(_("Idempotency key is too long"))
+
+    return key or None
+
+
+def acquire_until_commit(*names):
+    """
+    Take Redis locks that are held until the current transaction ends
+    Locks are taken in sorted order; ones already held by this request are skipped.
+    Returns a list of callables to run after commit, before the locks are released.
+    """
+    held = frappe.local.__dict__.setdefault("sa7ba_held_locks", set())
+    cache = frappe.cache()
+    acquired = []
+
+    for name in sorted({n for n in names if n} - held):
+        lock = cache.lock(cache.make_key(f"sa7ba_lock:{name}"),
+                          timeout=LOCK_TIMEOUT, blocking_timeout=LOCK_WAIT)
+        if not lock.acquire():
+            _release(acquired)
+            frappe.throw(_("Another request is already processing this. Please retry."),
+                         RequestInProgressError)
+        held.add(name)
+        acquired.append((name, lock))
+
+    on_commit = []
+    if acquired:
+        frappe.db.after_commit.add(lambda: _commit(on_commit, acquired))
+        frappe.db.after_rollback.add(lambda: _release(acquired))
+
+    return on_commit
+
+
+def _commit(on_commit, acquired):
+    try:
+        for callback in on_commit:
+            callback()
+    finally:
+        _release(acquired)
+
+
+def _release(acquired):
+    held = frappe.local.__dict__.get("sa7ba_held_locks", set())
+    while acquired:
+        name, lock = acquired.pop()
+        held.discard(name)
+        try:
+            lock.release()
+        except Exception:
+            # Expired locks are already gone
+            pass
+
+
+def get_request_fingerprint(payload=None):
+    """Hash of the caller and the request payload an idempotency key is bound to"""
+    if frappe.session.user == "Guest":
+        from sa7ba_custom.sa7ba_custom.custom.cart_store import get_cart_id
+        caller = get_cart_id() or frappe.local.request_ip
+    else:
+        caller = frappe.session.user
+
+    return hashlib.sha256(
+        json.dumps([caller, payload], sort_keys=True, default=str).encode("utf-8")
+    ).hexdigest()
+
+
+def _replay(cached, fingerprint):
+    if cached.get("fingerprint") != fingerprint:
+        frappe.throw(_("This idempotency key was already used for a different request"),
+                     IdempotencyKeyReusedError)
+    return cached["response"]
+
+
+def run_idempotent(scope, key, fn, is_cacheable=None, payload=None):
+    """
+    Run fn once per (scope, key) and replay its response for IDEMPOTENCY_TTL
+    Only responses accepted by is_cacheable are stored. Replays require the
+    same caller and payload as the first request.
+    """
+    if not key:
+        return fn()
+
+    cache = frappe.cache()
+    cache_key = f"sa7ba_idempotency:{scope}:{key}"
+    fingerprint = get_request_fingerprint(payload)
+
+    cached = cache.get_value(cache_key)
+    if cached is not None:
+        return _replay(cached, fingerprint)
+
+    on_commit = acquire_until_commit(cache_key)
+
+    # A duplicate may have committed while we waited for the lock
+    cached = cache.get_value(cache_key)
+    if cached is not None:
+        return _replay(cached, fingerprint)
+
+    response = fn()
+
+    if is_cacheable is None or is_cacheable(response):
+        entry = {"fingerprint": fingerprint, "response": response}
+        on_commit.append(
+            lambda: cache.set_value(cache_key, entry, expires_in_sec=IDEMPOTENCY_TTL)
+        )
+
+    return response
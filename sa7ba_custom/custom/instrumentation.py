@@ -0,0 +1,228 @@
+import functools
+import time
+import frappe
+
+# Per-call instrumentation for API methods and doc_events handlers.
+#
+# Enabled with `"sa7ba_instrumentation": 1` in site_config. Each instrumented
+# call records wall time, SQL query count/time and Redis cache hits/misses.
+# The calls of a request are reported in a Server-Timing header and folded
+# into Redis histograms (one pipeline per request) that get_metrics_text
+# renders in the Prometheus text format. When disabled an instrumented call
+# costs a single config lookup.
+
+ENABLED_FLAG = "sa7ba_instrumentation"
+
+METRICS_PREFIX = "sa7ba_metrics"
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def instrument(fn=None, name=None):
+    """Decorator recording timings for fn; name defaults to <module>.<function>"""
+    def decorate(fn):
+        label = name or f"{fn.__module__.rsplit('.', 1)[-1]}.{fn.__name__}"
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not frappe.conf.get(ENABLED_FLAG):
+                return fn(*args, **kwargs)
+            return _call_instrumented(label, fn, args, kwargs)
+
+        return wrapper
+
+    return decorate(fn) if fn else decorate
+
+
+def _call_instrumented(label, fn, args, kwargs):
+    probe = _get_probe()
+    before = list(probe)
+    local = frappe.local.__dict__
+    local["sa7ba_call_depth"] = local.get("sa7ba_call_depth", 0) + 1
+    started = time.perf_counter()
+    try:
+        return fn(*args, **kwargs)
+    finally:
+        elapsed = time.perf_counter() - started
+        local["sa7ba_call_depth"] -= 1
+        local.setdefault("sa7ba_calls", []).append(
+            (label, elapsed, *(now - then for now, then in zip(probe, before)))
+        )
+
+        # Outside a web request (jobs, console) the outermost call flushes
+        if not local["sa7ba_call_depth"] and not getattr(frappe.local, "request", None):
+            flush_calls()
+
+
+def _get_probe():
+    """[sql count, sql seconds, cache hits, cache misses] for this request"""
+    probe = frappe.local.__dict__.get("sa7ba_probe")
+    if probe is None:
+        probe = frappe.local.sa7ba_probe = [0, 0.0, 0, 0]
+        _install_sql_probe()
+        _install_cache_probe()
+    return probe
+
+
+def _install_sql_probe():
+    """Count queries on this request's connection"""
+    db = frappe.local.db
+    if getattr(db, "_sa7ba_probed", False):
+        return
+
+    original = db.sql
+
+    def sql(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return original(*args, **kwargs)
+        finally:
+            probe = frappe.local.__dict__.get("sa7ba_probe")
+            if probe is not None:
+                probe[0] += 1
+                probe[1] += time.perf_counter() - started
+
+    db.sql = sql
+    db._sa7ba_probed = True
+
+
+def _install_cache_probe():
+    """Count hits and misses on the shared cache client (once per process)"""
+    cache = frappe.cache()
+    if getattr(cache, "_sa7ba_probed", False):
+        return
+
+    def probed(original):
+        def lookup(*args, **kwargs):
+            value = original(*args, **kwargs)
+            probe = frappe.local.__dict__.get("sa7ba_probe")
+            if probe is not None:
+                probe[2 if value is not None else 3] += 1
+            return value
+        return lookup
+
+    cache.get_value = probed(cache.get_value)
+    cache.hget = probed(cache.hget)
+    cache._sa7ba_probed = True
+
+
+def after_request(response, request):
+    """Emit Server-Timing for the request and fold its calls into the histograms"""
+    calls = frappe.local.__dict__.get("sa7ba_calls")
+    if not calls:
+        return
+
+    response.headers["Server-Timing"] = ", ".join(
+        f'{label};dur={elapsed * 1000:.1f};desc="sql {queries}/{sql_time * 1000:.1f}ms '
+        f'cache {hits}/{misses}"'
+        for label, elapsed, queries, sql_time, hits, misses in calls
+    )
+    flush_calls()
+
+
+def flush_calls():
+    """Add the recorded calls to the shared histograms and clear them"""
+    calls = frappe.local.__dict__.pop("sa7ba_calls", None)
+    if not calls:
+        return
+
+    cache = frappe.cache()
+    names_key = cache.make_key(f"{METRICS_PREFIX}:calls")
+    pipe = cache.pipeline(transaction=False)
+    for label, elapsed, queries, sql_time, hits, misses in calls:
+        key = cache.make_key(f"{METRICS_PREFIX}:{label}")
+        bucket = next((str(le) for le in DURATION_BUCKETS if elapsed <= le), "+Inf")
+        pipe.sadd(names_key, label)
+        pipe.hincrby(key, f"bucket:{bucket}", 1)
+        pipe.hincrby(key, "count", 1)
+        pipe.hincrbyfloat(key, "sum", elapsed)
+        pipe.hincrby(key, "sql_queries", queries)
+        pipe.hincrbyfloat(key, "sql_seconds", sql_time)
+        pipe.hincrby(key, "cache_hits", hits)
+        pipe.hincrby(key, "cache_misses", misses)
+    pipe.execute()
+
+
+def get_metrics_text():
+    """Render the aggregated call metrics in the Prometheus text format"""
+    cache = frappe.cache()
+    labels = sorted(
+        label.decode() if isinstance(label, bytes) else label
+        for label in cache.pipeline().smembers(cache.make_key(f"{METRICS_PREFIX}:calls")).execute()[0]
+    )
+
+    pipe = cache.pipeline(transaction=False)
+    for label in labels:
+        pipe.hgetall(cache.make_key(f"{METRICS_PREFIX}:{label}"))
+    stats = {
+        label: {
+            (k.decode() if isinstance(k, bytes) else k): float(v) for k, v in data.items()
+        }
+        for label, data in zip(labels, pipe.execute())
+    }
+
+    lines = [
+        "# HELP sa7ba_call_duration_seconds Wall time of instrumented calls",
+        "# TYPE sa7ba_call_duration_seconds histogram"
+    ]
+    for label, data in stats.items():
+        cumulative = 0
+        for le in (*map(str, DURATION_BUCKETS), "+Inf"):
+            cumulative += int(data.get(f"bucket:{le}", 0))
+            lines.append(f'sa7ba_call_duration_seconds_bucket{{call="{label}",le="{le}"}} {cumulative}')
+        lines.append(f'sa7ba_call_duration_seconds_sum{{call="{label}"}} {data.get("sum", 0)}')
+        lines.append(f'sa7ba_call_duration_seconds_count{{call="{label}"}} {int(data.get("count", 0))}')
+
+    for metric, field, help_text in (
+        ("sa7ba_call_sql_queries_total", "sql_queries", "SQL queries issued by instrumented calls"),
+        ("sa7ba_call_sql_seconds_total", "sql_seconds", "Time spent in SQL by instrumented calls"),
+        ("sa7ba_call_cache_hits_total", "cache_hits", "Redis cache hits in instrumented calls"),
+        ("sa7ba_call_cache_misses_total", "cache_misses", "Redis cache misses in instrumented calls"),
+    ):
+        lines.append(f"# HELP {metric} {help_text}")
+        lines.append(f"# TYPE {metric} counter")
+        for label, data in stats.items():
+            lines.append(f'{metric}{{call="{label}"}} {data.get(field, 0)}')
+
+    from sa7ba_custom.sa7ba_custom.custom.guest_notifications import get_confirmation_metrics
+    confirmations = get_confirmation_metrics()
+    lines.extend([
+        "# HELP sa7ba_guest_confirmation_queue_depth Guest order confirmations waiting to be sent",
+        "# TYPE sa7ba_guest_confirmation_queue_depth gauge",
+        f"sa7ba_guest_confirmation_queue_depth {confirmations['queue_depth']}",
+        "# HELP sa7ba_guest_confirmations_total Guest order confirmation sends by outcome",
+        "# TYPE sa7ba_guest_confirmations_total counter",
+        *(
+            f'sa7ba_guest_confirmations_total{{result="{result}"}} {confirmations[result]}'
+            for result in ("sent", "failed", "retried")
+        ),
+        "# HELP sa7ba_guest_confirmation_latency_seconds Time from queueing to sending a confirmation",
+        "# TYPE sa7ba_guest_confirmation_latency_seconds summary",
+        f"sa7ba_guest_confirmation_latency_seconds_sum {confirmations['latency_sum']}",
+        f"sa7ba_guest_confirmation_latency_seconds_count {confirmations['sent']}"
+    ])
+
+    from sa7ba_custom.sa7ba_custom.custom.rate_limit import get_rate_limit_metrics
+    lines.extend([
+        "# HELP sa7ba_rate_limit_requests_total Calls to rate limited endpoints by outcome",
+        "# TYPE sa7ba_rate_limit_requests_total counter"
+    ])
+    for endpoint, counts in sorted(get_rate_limit_metrics().items()):
+        for result in ("allowed", "rejected"):
+            lines.append(
+                f'sa7ba_rate_limit_requests_total{{endpoint="{endpoint}",result="{result}"}} {counts[result]}'
+            )
+
+    return "\n".join(lines) + "\n"
+
+
+def reset_metrics():
+    """Drop the aggregated histograms"""
+    cache = frappe.cache()
+    names_key = cache.make_key(f"{METRICS_PREFIX}:calls")
+    labels = cache.pipeline().smembers(names_key).execute()[0]
+    pipe = cache.pipeline()
+    for label in labels:
+        label = label.decode() if isinstance(label, bytes) else label
+        pipe.delete(cache.make_key(f"{METRICS_PREFIX}:{label}"))
+    pipe.delete(names_key)
+    pipe.execute()
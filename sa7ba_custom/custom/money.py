@@ -0,0 +1,99 @@
+from collections import namedtuple
+from decimal import Decimal, ROUND_HALF_UP
+
+# Exact cart and order money math in integer fils.
+#
+# KWD has three decimals, so every amount is handled as an integer number of
+# fils (1 KWD = 1000 fils) and only turned back into KWD where it is written
+# to a cart dict or document field. Summing 3-decimal floats drifts
+# (0.1 + 0.2 != 0.3), which made equal delivery charges compare unequal.
+# Nothing here imports frappe, so the kernel loads instantly and runs outside
+# a site.
+
+CURRENCY = "KWD"
+FILS_PER_KWD = 1000
+DELIVERY_CHARGE_ITEM = "DELIVERY-CHARGE"
+
+# Subtotal (non-delivery lines), delivery charge and grand total, in fils
+Totals = namedtuple("Totals", ["subtotal", "delivery_charge", "total"])
+
+_ONE = Decimal(1)
+# A float further than this from half a fil rounds the same way as its decimal digits
+_HALF = 0.5 - 1e-6
+
+
+def _round_half_up(value):
+    return int(value.quantize(_ONE, ROUND_HALF_UP))
+
+
+def to_fils(amount):
+    """Fils for a KWD amount (float, int, str or Decimal), rounding half a fil up"""
+    if not amount:
+        return 0
+    if isinstance(amount, int):
+        return amount * FILS_PER_KWD
+    if isinstance(amount, float):
+        scaled = amount * FILS_PER_KWD
+        fils = round(scaled)
+        # Only a value sitting on half a fil needs its decimal digits to decide
+        if -_HALF < scaled - fils < _HALF:
+            return fils
+    return _round_half_up(Decimal(str(amount)) * FILS_PER_KWD)
+
+
+def from_fils(fils):
+    """KWD value of an amount in fils, for document fields and cart dicts"""
+    return fils / FILS_PER_KWD
+
+
+def line_total(qty, rate):
+    """Fils for qty units at a KWD rate, rounded once on the product"""
+    if not qty or not rate:
+        return 0
+    if isinstance(qty, float) and qty.is_integer():
+        qty = int(qty)
+    if isinstance(qty, int):
+        if isinstance(rate, int):
+            return qty * rate * FILS_PER_KWD
+        if isinstance(rate, float):
+            scaled = rate * FILS_PER_KWD
+            fils = round(scaled)
+            # Rates finer than a fil are multiplied out before rounding
+            if -1e-6 < scaled - fils < 1e-6:
+                return qty * fils
+    return _round_half_up(Decimal(str(qty)) * Decimal(str(rate)) * FILS_PER_KWD)
+
+
+def line_amount(item):
+    """Fils for a cart or order row: its amount, else qty x rate"""
+    amount = item.get("amount")
+    if amount is None:
+        return line_total(item.get("qty"), item.get("rate"))
+    return to_fils(amount)
+
+
+def split_totals(items, delivery_item=DELIVERY_CHARGE_ITEM):
+    """Totals in fils for cart or order rows, delivery lines counted apart"""
+    subtotal = delivery_charge = 0
+    for item in items or ():
+        amount = item.get("amount")
+        if amount.__class__ is float:
+            # Inlined to_fils fast path; this loop runs once per cart line
+            scaled = amount * FILS_PER_KWD
+            fils = round(scaled)
+            if not -_HALF < scaled - fils < _HALF:
+                fils = to_fils(amount)
+        else:
+            fils = line_amount(item)
+
+        if item.get("item_code") == delivery_item:
+            delivery_charge += fils
+        else:
+            subtotal += fils
+    return Totals(subtotal, delivery_charge, subtotal + delivery_charge)
+
+
+def format_amount(fils, currency=CURRENCY):
+    """Display string for an amount in fils, e.g. 'KWD 3.250'"""
+    whole, part = divmod(abs(fils), FILS_PER_KWD)
+    return f"{currency} {'-' if fils < 0 else ''}{whole}.{part:03d}"
@@ -0,0 +1,260 @@
+import functools
+import json
+import math
+import threading
+import time
+import frappe
+
+# Token-bucket rate limiting for guest endpoints.
+#
+# Every limited endpoint has a bucket per client IP and one per browser
+# session (the session id for logged-in users). Guests all share Frappe's
+# "Guest" sid, so their session bucket is keyed on the cart id instead, and
+# only while that id names a cart the server stored; a client that drops or
+# rotates the cookie is limited by its IP bucket alone. A call spends one
+# token from each bucket; buckets refill continuously up to their burst
+# size. The buckets are checked, spent and counted by a single Lua script,
+# so a check is one Redis round trip (plus an EXISTS for guest carts).
+#
+# The check runs inside the whitelisted call, after Frappe has set up the
+# session and database connection. A rejected call is answered with a 429
+# and Retry-After before the endpoint body runs, so it skips the endpoint's
+# own queries, cart loads and writes. If Redis is unavailable, or the site
+# config asks for it ("sa7ba_rate_limit_backend": "memory"), per-process
+# buckets are used.
+#
+# Limits are (burst, refills per minute) per scope and can be overridden
+# per endpoint in site_config:
+#     "sa7ba_rate_limits": {"process_guest_checkout": {"ip": [20, 10], "session": [5, 2]}}
+# A null endpoint or scope turns that limit off.
+
+RATE_LIMITS = {
+    "process_guest_checkout": {"ip": (20, 10), "session": (5, 2)},
+    "validate_guest_info": {"ip": (60, 30), "session": (20, 10)},
+    "update_cart_delivery": {"ip": (120, 60), "session": (30, 20)},
+    "apply_cart_operations": {"ip": (120, 60), "session": (30, 20)},
+    "check_delivery_availability": {"ip": (120, 60), "session": (30, 30)},
+}
+
+CONFIG_KEY = "sa7ba_rate_limits"
+BACKEND_FLAG = "sa7ba_rate_limit_backend"
+
+BUCKET_PREFIX = "sa7ba_rate_limit"
+METRICS_KEY = "sa7ba_rate_limit_metrics"
+
+# KEYS: bucket keys then the metrics hash; ARGV: endpoint, then
+# capacity and refill per millisecond for each bucket.
+# Returns 0 if allowed, else milliseconds until a token is available.
+TAKE_TOKENS_SCRIPT = """
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) * 1000 + math.floor(tonumber(clock[2]) / 1000)
+local buckets = #KEYS - 1
+local tokens = {}
+local wait = 0
+
+for i = 1, buckets do
+    local capacity = tonumber(ARGV[2 * i])
+    local rate = tonumber(ARGV[2 * i + 1])
+    local state = redis.call('HMGET', KEYS[i], 't', 'ts')
+    local available = tonumber(state[1]) or capacity
+    local updated = tonumber(state[2]) or now
+    available = math.min(capacity, available + math.max(0, now - updated) * rate)
+    tokens[i] = available
+    if available < 1 then
+        wait = math.max(wait, math.ceil((1 - available) / rate))
+    end
+end
+
+if wait > 0 then
+    redis.call('HINCRBY', KEYS[#KEYS], ARGV[1] .. ':rejected', 1)
+    return wait
+end
+
+for i = 1, buckets do
+    local capacity = tonumber(ARGV[2 * i])
+    local rate = tonumber(ARGV[2 * i + 1])
+    redis.call('HSET', KEYS[i], 't', tokens[i] - 1, 'ts', now)
+    redis.call('PEXPIRE', KEYS[i], math.ceil(capacity / rate))
+end
+redis.call('HINCRBY', KEYS[#KEYS], ARGV[1] .. ':allowed', 1)
+return 0
+"""
+
+
+def rate_limited(fn=None, name=None):
+    """Decorator shedding calls over the endpoint's limits; name defaults to the function name"""
+    def decorate(fn):
+        endpoint = name or fn.__name__
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            local = frappe.local.__dict__
+            # Only the API call itself is limited, not nested, internal or background calls
+            if local.get("sa7ba_rate_limited") or not is_api_call_to(fn.__name__):
+                return fn(*args, **kwargs)
+
+            local["sa7ba_rate_limited"] = True
+            retry_after = check_rate_limit(endpoint)
+            if retry_after:
+                return too_many_requests(retry_after)
+            return fn(*args, **kwargs)
+
+        return wrapper
+
+    return decorate(fn) if fn else decorate
+
+
+def is_api_call_to(method_name):
+    """True if the current request is an API call to the method with this name"""
+    request = getattr(frappe.local, "request", None)
+    if not request:
+        return False
+
+    form_dict = getattr(frappe.local, "form_dict", None) or {}
+    method = form_dict.get("cmd") or request.path
+    return method.rstrip("/").rsplit(".", 1)[-1] == method_name
+
+
+def get_limits(endpoint):
+    """[(scope, capacity, refill per second)] configured for an endpoint"""
+    overrides = frappe.conf.get(CONFIG_KEY) or {}
+    limits = overrides[endpoint] if endpoint in overrides else RATE_LIMITS.get(endpoint)
+    if not limits:
+        return []
+
+    return [
+        (scope, float(limit[0]), float(limit[1]) / 60)
+        for scope, limit in limits.items()
+        if limit and limit[0] and limit[1]
+    ]
+
+
+def get_client_identities():
+    """{scope: identity} for the current request"""
+    identities = {"ip": frappe.local.request_ip}
+    if frappe.session.user == "Guest":
+        from sa7ba_custom.sa7ba_custom.custom.cart_store import cart_exists, get_cart_id
+        cart_id = get_cart_id()
+        if cart_id and cart_exists(cart_id):
+            identities["session"] = f"cart:{cart_id}"
+    else:
+        identities["session"] = frappe.session.sid
+    return identities
+
+
+def check_rate_limit(endpoint):
+    """Spend a token from each of the caller's buckets; seconds to wait if rejected, else 0"""
+    identities = get_client_identities()
+    buckets = [
+        (f"{BUCKET_PREFIX}:{endpoint}:{scope}:{identities[scope]}", capacity, rate)
+        for scope, capacity, rate in get_limits(endpoint)
+        if identities.get(scope)
+    ]
+    if not buckets:
+        return 0
+
+    if frappe.conf.get(BACKEND_FLAG) != "memory":
+        try:
+            return _take_redis(endpoint, buckets)
+        except Exception:
+            # Redis unavailable: limit per process rather than not at all
+            pass
+    return _memory.take(endpoint, buckets)
+
+
+# Per-process script handle (registered on the shared cache client)
+_script = None
+
+
+def _take_redis(endpoint, buckets):
+    global _script
+
+    cache = frappe.cache()
+    if _script is None:
+        _script = cache.register_script(TAKE_TOKENS_SCRIPT)
+
+    args = [endpoint]
+    for _, capacity, rate in buckets:
+        args.extend((capacity, rate / 1000))
+
+    wait = _script(
+        keys=[cache.make_key(key) for key, _, _ in buckets] + [cache.make_key(METRICS_KEY)],
+        args=args
+    )
+    return int(wait) / 1000
+
+
+class MemoryBuckets:
+    """In-process token buckets with the same semantics as the Redis script"""
+
+    MAX_BUCKETS = 100000
+
+    def __init__(self):
+        self.buckets = {}
+        self.counters = {}
+        self.lock = threading.Lock()
+
+    def take(self, endpoint, buckets):
+        now = time.monotonic()
+        with self.lock:
+            wait = 0
+            levels = []
+            for key, capacity, rate in buckets:
+                tokens, updated = self.buckets.get(key, (capacity, now))
+                tokens = min(capacity, tokens + (now - updated) * rate)
+                levels.append(tokens)
+                if tokens < 1:
+                    wait = max(wait, (1 - tokens) / rate)
+
+            result = "rejected" if wait else "allowed"
+            counter = f"{endpoint}:{result}"
+            self.counters[counter] = self.counters.get(counter, 0) + 1
+            if wait:
+                return wait
+
+            if len(self.buckets) > self.MAX_BUCKETS:
+                self.buckets.clear()
+            for (key, _, _), tokens in zip(buckets, levels):
+                self.buckets[key] = (tokens - 1, now)
+            return 0
+
+    def reset(self):
+        with self.lock:
+            self.buckets.clear()
+            self.counters.clear()
+
+
+_memory = MemoryBuckets()
+
+
+def too_many_requests(retry_after):
+    """Cheap 429 response; no Error Log, no queries"""
+    from werkzeug.wrappers import Response
+
+    seconds = max(1, math.ceil(retry_after))
+    body = json.dumps({"message": {
+        "success": False,
+        "error": "Too many requests. Please try again shortly.",
+        "retry_after": seconds
+    }})
+    return Response(body, status=429, headers={"Retry-After": str(seconds)},
+                    content_type="application/json; charset=utf-8")
+
+
+def get_rate_limit_metrics():
+    """{endpoint: {"allowed": n, "rejected": n}} from Redis and this process's fallback buckets"""
+    counters = dict(_memory.counters)
+    try:
+        cache = frappe.cache()
+        shared = cache.pipeline().hgetall(cache.make_key(METRICS_KEY)).execute()[0]
+        for field, value in shared.items():
+            field = field.decode() if isinstance(field, bytes) else field
+            counters[field] = counters.get(field, 0) + int(value)
+    except Exception:
+        pass
+
+    metrics = {}
+    for field, value in counters.items():
+        endpoint, result = field.rsplit(":", 1)
+        metrics.setdefault(endpoint, {"allowed": 0, "rejected": 0})[result] += value
+    return metrics
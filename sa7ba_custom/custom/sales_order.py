@@ -1,64 +1,133 @@
 import frappe
 from frappe import _
+from sa7ba_custom.sa7ba_custom.custom.address import resolve_address_area
+from sa7ba_custom.sa7ba_custom.custom.delivery_pricing import get_order_delivery_charge
+from sa7ba_custom.sa7ba_custom.custom.instrumentation import instrument
+from sa7ba_custom.sa7ba_custom.custom.money import format_amount, from_fils, split_totals, to_fils
 
+class DuplicateOrderError(frappe.DuplicateEntryError):
+    """A retried submission of an order that was already placed"""
+
+    def __init__(self, order_name):
+        super().__init__(_("Order {0} was already placed for this request").format(order_name))
+        self.order_name = order_name
+
+@instrument
 def validate_sales_order(doc, method):
     """Validate sales order and ensure delivery charge is included"""
     
-    # Skip if already has delivery charge
-    has_delivery_charge = any(
-        item.get("item_code") == "DELIVERY-CHARGE" 
-        for item in doc.items
-    )
+    delivery_items = get_delivery_items(doc)
     
-    if has_delivery_charge:
-        return
+    # Skip if the delivery charge was already resolved for these inputs
+    if delivery_items:
+        if not doc.shipping_address_name:
+            return
+        inputs_changed = delivery_inputs_changed(doc)
+        if doc.custom_delivery_area and not inputs_changed:
+            return
     
     # Get delivery area from shipping address
     if doc.shipping_address_name:
-        address = frappe.get_doc("Address", doc.shipping_address_name)
-        if address.custom_delivery_area:
-            area = frappe.get_doc("Delivery Area", address.custom_delivery_area)
+        area = resolve_address_area(doc.shipping_address_name)
+        if area:
+            delivery_charge = get_order_delivery_charge(doc, area)
+            if not delivery_items:
+                # Add delivery charge item
+                doc.append("items", {
+                    "item_code": "DELIVERY-CHARGE",
+                    "item_name": f"Delivery to {area.area_name}",
+                    "description": f"Delivery service charge for {area.area_name} area",
+                    "qty": 1,
+                    "uom": "Nos",
+                    "rate": delivery_charge,
+                    "amount": delivery_charge,
+                    "custom_is_delivery_charge": 1
+                })
+            else:
+                # Not yet stamped, or its inputs changed: refresh the existing delivery line
+                item = delivery_items[0]
+                item.item_name = f"Delivery to {area.area_name}"
+                item.description = f"Delivery service charge for {area.area_name} area"
+                item.rate = delivery_charge
+                item.amount = delivery_charge
             
-            # Add delivery charge item
-            doc.append("items", {
-                "item_code": "DELIVERY-CHARGE",
-                "item_name": f"Delivery to {area.area_name}",
-                "description": f"Delivery service charge for {area.area_name} area",
-                "qty": 1,
-                "uom": "Nos",
-                "rate": area.delivery_charge,
-                "amount": area.delivery_charge,
-                "custom_is_delivery_charge": 1
-            })
-        else:
+            set_delivery_snapshot(doc, area)
+        elif not delivery_items:
             frappe.throw("Delivery area is required. Please select a delivery area.")
     else:
         frappe.throw("Shipping address is required for delivery charge calculation.")
 
+def set_delivery_snapshot(doc, area):
+    """Record the delivery area, charge and ETA as they are at order time"""
+    doc.custom_delivery_area = area.name
+    doc.custom_delivery_charge = from_fils(split_totals(doc.items).delivery_charge)
+    doc.custom_estimated_delivery_time = area.estimated_delivery_time
+
+def get_delivery_items(doc):
+    """Delivery charge rows on a sales order"""
+    return [item for item in doc.items 
+            if item.get("item_code") == "DELIVERY-CHARGE"]
+
+def delivery_inputs_changed(doc):
+    """
+    True if the shipping address, customer, non-delivery items or the delivery
+    line's rate or amount changed since last save
+    """
+    before = doc.get_doc_before_save()
+    if not before:
+        # New order that already carries its delivery line
+        return False
+    
+    if before.shipping_address_name != doc.shipping_address_name \
+            or before.customer != doc.customer:
+        return True
+    
+    return get_items_signature(before) != get_items_signature(doc) \
+        or get_delivery_signature(before) != get_delivery_signature(doc)
+
+def get_items_signature(doc):
+    """Comparable summary of the non-delivery item rows"""
+    return [
+        (item.item_code, item.qty, item.rate)
+        for item in doc.items
+        if item.item_code != "DELIVERY-CHARGE"
+    ]
+
+def get_delivery_signature(doc):
+    """Rate and amount of the delivery rows in fils, so a hand edit re-stamps them"""
+    return [
+        (to_fils(item.rate), to_fils(item.amount))
+        for item in get_delivery_items(doc)
+    ]
+
+@instrument
 def before_submit_sales_order(doc, method):
     """Validate delivery charge before submission"""
     # Ensure delivery charge is present
-    delivery_items = [item for item in doc.items 
-                     if item.get("item_code") == "DELIVERY-CHARGE"]
+    delivery_items = get_delivery_items(doc)
     
     if not delivery_items:
         frappe.throw("Delivery charge must be included in the order")
     
     # Validate amount matches area charge
     if doc.shipping_address_name:
-        address = frappe.get_doc("Address", doc.shipping_address_name)
-        if address.custom_delivery_area:
-            area = frappe.get_doc("Delivery Area", address.custom_delivery_area)
-            delivery_charge_in_order = sum(item.amount for item in delivery_items)
+        area = resolve_address_area(doc.shipping_address_name)
+        if area:
+            # Compared in fils; 3-decimal floats need not compare equal
+            delivery_charge_in_order = split_totals(doc.items).delivery_charge
+            expected_charge = to_fils(get_order_delivery_charge(doc, area))
             
-            if float(delivery_charge_in_order) != float(area.delivery_charge):
+            if delivery_charge_in_order != expected_charge:
                 frappe.throw(
-                    f"Delivery charge mismatch. Expected KWD {area.delivery_charge}, "
-                    f"found KWD {delivery_charge_in_order}"
+                    f"Delivery charge mismatch. Expected {format_amount(expected_charge)}, "
+                    f"found {format_amount(delivery_charge_in_order)}"
                 )
 
+@instrument
 def before_insert_sales_order(doc, method):
     """Handle guest customer assignment before sales order insertion"""
+    check_duplicate_submission(doc)
+    
     if frappe.session.user == "Guest" and hasattr(doc, 'contact_email'):
         # This is a guest checkout
         doc.custom_is_guest_order = 1
@@ -81,14 +150,36 @@ def before_insert_sales_order(doc, method):
             customer = frappe.get_doc("Customer", customer_name)
             doc.customer_name = customer.customer_name
 
+def check_duplicate_submission(doc):
+    """
+    Stop a retried order submission carrying an already used idempotency key
+    Raises DuplicateOrderError with the order placed by the first submission
+    """
+    from sa7ba_custom.sa7ba_custom.custom.idempotency import acquire_until_commit, get_idempotency_key
+    
+    doc.custom_idempotency_key = get_idempotency_key(doc.get("custom_idempotency_key"))
+    if not doc.custom_idempotency_key:
+        return
+    
+    # Held until commit; a concurrent duplicate waits for it, then re-reads
+    acquire_until_commit(f"sales_order:{doc.custom_idempotency_key}")
+    
+    # Locking read, so an order committed while we waited for the lock is seen
+    existing = frappe.db.get_value("Sales Order",
+                                   {"custom_idempotency_key": doc.custom_idempotency_key},
+                                   "name", for_update=True)
+    if existing:
+        raise DuplicateOrderError(existing)
+
+@instrument
 def update_guest_order_stats(doc, method):
     """Update guest order statistics"""
     if doc.custom_is_guest_order:
-        # Update customer's guest checkout count
-        if doc.customer:
-            frappe.db.set_value("Customer", doc.customer, "custom_guest_checkout_count", 
-                              frappe.db.get_value("Customer", doc.customer, "custom_guest_checkout_count") + 1)
+        # Count the checkout; applied atomically after commit and flushed in batches
+        from sa7ba_custom.sa7ba_custom.custom.counters import increment_counter
+        increment_counter("Customer", doc.customer, "custom_guest_checkout_count")
 
+@instrument
 def on_submit_sales_order(doc, method):
     """Actions after sales order submission"""
     if doc.custom_is_guest_order:
@@ -96,29 +187,6 @@ def on_submit_sales_order(doc, method):
         send_guest_order_confirmation(doc)
 
 def send_guest_order_confirmation(doc):
-    """Send order confirmation to guest customer"""
-    try:
-        # Get email template or use default
-        template = frappe.get_doc("Email Template", "Guest Order Confirmation")
-        
-        # Prepare context
-        context = {
-            "customer_name": doc.customer_name,
-            "order_id": doc.name,
-            "order_total": doc.grand_total,
-            "delivery_address": doc.shipping_address_name,
-            "guest_email": doc.custom_guest_email
-        }
-        
-        # Send email
-        frappe.sendmail(
-            recipients=[doc.custom_guest_email],
-            template=template.name,
-            args=context,
-            reference_doctype=doc.doctype,
-            reference_name=doc.name,
-            send_priority=1
-        )
-        
-    except Exception as e:
-        frappe.log_error(f"Failed to send guest order confirmation: {str(e)}")
+    """Queue the order confirmation for the guest; mailed by a background job after commit"""
+    from sa7ba_custom.sa7ba_custom.custom.guest_notifications import queue_guest_order_confirmation
+    queue_guest_order_confirmation(doc.name)
@@ -0,0 +1,71 @@
+import frappe
+from sa7ba_custom.sa7ba_custom.custom.area_registry import get_area_by_name
+
+# Resumable backfill of the delivery snapshot fields on historical Sales Orders.
+# Walks `tabSales Order` by name (keyset pagination) and stores the cursor in
+# DefaultValue after every committed chunk, so a killed job picks up where it
+# stopped.
+
+BACKFILL_CURSOR_KEY = "sa7ba_delivery_snapshot_backfill_cursor"
+DEFAULT_CHUNK_SIZE = 1000
+
+
+def enqueue_delivery_snapshot_backfill(chunk_size=DEFAULT_CHUNK_SIZE, restart=False):
+    """Queue the backfill on the long worker"""
+    if restart:
+        frappe.db.set_global(BACKFILL_CURSOR_KEY, "")
+        frappe.db.commit()
+
+    frappe.enqueue(
+        "sa7ba_custom.sa7ba_custom.custom.sales_order_backfill.backfill_delivery_snapshots",
+        queue="long",
+        timeout=4 * 60 * 60,
+        job_id="sa7ba_delivery_snapshot_backfill",
+        deduplicate=True,
+        chunk_size=chunk_size
+    )
+
+
+def backfill_delivery_snapshots(chunk_size=DEFAULT_CHUNK_SIZE, max_chunks=None):
+    """Fill custom_delivery_area/charge/ETA on orders that predate the snapshot"""
+    cursor = frappe.db.get_global(BACKFILL_CURSOR_KEY) or ""
+    updated = 0
+    chunks = 0
+
+    while max_chunks is None or chunks < max_chunks:
+        rows = frappe.db.sql("""
+            SELECT
+                so.name,
+                addr.custom_delivery_area,
+                (SELECT COALESCE(SUM(soi.amount), 0)
+                 FROM `tabSales Order Item` soi
+                 WHERE soi.parent = so.name AND soi.item_code = 'DELIVERY-CHARGE') as delivery_charge
+            FROM `tabSales Order` so
+            LEFT JOIN `tabAddress` addr ON addr.name = so.shipping_address_name
+            WHERE so.name > %(cursor)s
+                AND (so.custom_delivery_area IS NULL OR so.custom_delivery_area = '')
+            ORDER BY so.name
+            LIMIT %(limit)s
+        """, {"cursor": cursor, "limit": int(chunk_size)}, as_dict=True)
+
+        if not rows:
+            break
+
+        for row in rows:
+            area = get_area_by_name(row.custom_delivery_area)
+            if not area:
+                continue
+
+            frappe.db.set_value("Sales Order", row.name, {
+                "custom_delivery_area": area.name,
+                "custom_delivery_charge": row.delivery_charge,
+                "custom_estimated_delivery_time": area.estimated_delivery_time
+            }, update_modified=False)
+            updated += 1
+
+        cursor = rows[-1].name
+        frappe.db.set_global(BACKFILL_CURSOR_KEY, cursor)
+        frappe.db.commit()
+        chunks += 1
+
+    return {"updated": updated, "chunks": chunks, "cursor": cursor}
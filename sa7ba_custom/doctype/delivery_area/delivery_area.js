@@ -3,28 +3,35 @@ frappe.ui.form.on('Delivery Area', {
         // Add custom buttons
         frm.add_custom_button(__('View Orders'), function() {
             frappe.set_route('List', 'Sales Order', {
-                'shipping_address.custom_delivery_area': frm.doc.name
+                'custom_delivery_area': frm.doc.name
             });
         });
         
         frm.add_custom_button(__('Get Revenue'), function() {
-            frappe.call({
-                method: 'sa7ba_custom.doctype.delivery_area.delivery_area.get_total_revenue',
-                args: {
-                    docname: frm.doc.name
-                },
-                callback: function(r) {
-                    if(r.message) {
-                        frappe.msgprint({
-                            title: 'Total Revenue',
-                            message: 'KWD ' + r.message.toFixed(3),
-                            indicator: 'green'
-                        });
-                    }
-                }
+            frm.call('get_total_revenue').then(function(r) {
+                frappe.msgprint({
+                    title: 'Total Revenue',
+                    message: 'KWD ' + (r.message || 0).toFixed(3),
+                    indicator: 'green'
+                });
             });
         });
         
+        // Order and revenue counters (single row read, no order scan)
+        if (!frm.is_new()) {
+            frm.call('get_dashboard').then(function(r) {
+                const stats = r.message;
+                if (!stats) return;
+                
+                frm.dashboard.add_indicator(__('Orders: {0}', [stats.order_count]), 'blue');
+                frm.dashboard.add_indicator(__('Revenue: KWD {0}', [stats.submitted_revenue.toFixed(3)]), 'green');
+                frm.dashboard.add_indicator(__('Delivery: KWD {0}', [stats.delivery_revenue.toFixed(3)]), 'orange');
+                if (stats.last_order_on) {
+                    frm.dashboard.add_indicator(__('Last order: {0}', [frappe.datetime.str_to_user(stats.last_order_on)]), 'grey');
+                }
+            });
+        }
+        
         // Set default estimated time if empty
         if (!frm.doc.estimated_delivery_time) {
             frm.set_value('estimated_delivery_time', '2-3 hours');
@@ -12,10 +12,30 @@ class DeliveryArea:
         
         if not self.area_name:
             frappe.throw(_("Area name is required"))
+        
+        self.validate_boundary()
+
+    def validate_boundary(self):
+        """Reject boundaries the spatial index cannot use"""
+        from sa7ba_custom.sa7ba_custom.custom.area_geo import parse_boundary
+        try:
+            parse_boundary(self.get("custom_boundary"))
+        except ValueError as e:
+            frappe.throw(_("Invalid boundary: {0}").format(e))
 
     def on_update(self):
         """Update related data when delivery area changes"""
         self.update_cart_charges()
+        self.invalidate_area_cache()
+
+    def on_trash(self):
+        """Drop cached area data when a delivery area is deleted"""
+        self.invalidate_area_cache()
+
+    def invalidate_area_cache(self):
+        """Invalidate the shared area registry once the change is committed"""
+        from sa7ba_custom.sa7ba_custom.custom.area_registry import invalidate_area_registry
+        frappe.db.after_commit.add(invalidate_area_registry)
 
     def update_cart_charges(self):
         """Update existing carts if delivery charge changes"""
@@ -25,23 +45,27 @@ class DeliveryArea:
 
     @frappe.whitelist()
     def get_orders_count(self):
-        """Get number of orders for this delivery area"""
-        return frappe.db.count("Sales Order", {
-            "shipping_address.custom_delivery_area": self.name,
-            "docstatus": ["!=", 2]
-        })
+        """Get number of submitted orders for this delivery area"""
+        from sa7ba_custom.sa7ba_custom.custom.delivery_stats import get_area_stats
+        return get_area_stats(self.name).order_count or 0
 
     @frappe.whitelist()
     def get_total_revenue(self):
         """Get total revenue from this delivery area"""
-        result = frappe.db.sql("""
-            SELECT SUM(grand_total) as total_revenue
-            FROM `tabSales Order`
-            WHERE shipping_address_name IN (
-                SELECT name FROM `tabAddress` 
-                WHERE custom_delivery_area = %s
-            )
-            AND docstatus = 1
-        """, self.name, as_dict=True)
+        from sa7ba_custom.sa7ba_custom.custom.delivery_stats import get_area_stats
+        return get_area_stats(self.name).submitted_revenue or 0
+
+    @frappe.whitelist()
+    def get_dashboard(self):
+        """Order and revenue figures for the Delivery Area form"""
+        from sa7ba_custom.sa7ba_custom.custom.delivery_stats import get_area_stats
+        stats = get_area_stats(self.name)
+        order_count = stats.order_count or 0
         
-        return result[0].total_revenue if result and result[0].total_revenue else 0
+        return {
+            "order_count": order_count,
+            "submitted_revenue": stats.submitted_revenue or 0,
+            "delivery_revenue": stats.delivery_revenue or 0,
+            "average_order_value": (stats.submitted_revenue or 0) / order_count if order_count else 0,
+            "last_order_on": stats.last_order_on
+        }
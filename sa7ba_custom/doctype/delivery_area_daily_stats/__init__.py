@@ -0,0 +1 @@
+# Delivery Area Daily Stats Doctype
@@ -0,0 +1,6 @@
+import frappe
+from frappe.model.document import Document
+
+class DeliveryAreaDailyStats(Document):
+    """Per-area, per-day rollup of submitted Sales Orders"""
+    pass
@@ -0,0 +1 @@
+# Delivery Area Stats Doctype
@@ -0,0 +1,6 @@
+import frappe
+from frappe.model.document import Document
+
+class DeliveryAreaStats(Document):
+    """Running order and revenue counters for one delivery area"""
+    pass
@@ -0,0 +1 @@
+# Delivery Pricing Rule Doctype
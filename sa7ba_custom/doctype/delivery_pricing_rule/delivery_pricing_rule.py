@@ -0,0 +1,29 @@
+import frappe
+from frappe import _
+from frappe.model.document import Document
+
+class DeliveryPricingRule(Document):
+    """Condition and adjustment applied on top of an area's delivery charge"""
+
+    def validate(self):
+        """Validate pricing rule data"""
+        if self.action != "Free Delivery" and (self.amount or 0) < 0:
+            frappe.throw(_("Amount cannot be negative"))
+
+        if bool(self.from_time) != bool(self.to_time):
+            frappe.throw(_("Set both From Time and To Time, or neither"))
+
+        if self.valid_from and self.valid_upto and self.valid_from > self.valid_upto:
+            frappe.throw(_("Valid From cannot be after Valid Upto"))
+
+    def on_update(self):
+        """Recompile pricing rules once the change is committed"""
+        self.invalidate_rules()
+
+    def on_trash(self):
+        """Recompile pricing rules once the deletion is committed"""
+        self.invalidate_rules()
+
+    def invalidate_rules(self):
+        from sa7ba_custom.sa7ba_custom.custom.delivery_pricing import invalidate_pricing_rules
+        frappe.db.after_commit.add(invalidate_pricing_rules)
@@ -17,12 +17,17 @@ required_apps = ["erpnext", "webshop"]
 doc_events = {
     "Customer": {
         "validate": "sa7ba_custom.customer.validate_customer",
-        "on_update": "sa7ba_custom.customer.update_guest_count",
     },
     "Sales Order": {
         "validate": "sa7ba_custom.sales_order.validate_sales_order",
         "before_submit": "sa7ba_custom.sales_order.before_submit_sales_order",
         "before_insert": "sa7ba_custom.sales_order.before_insert_sales_order",
+        "on_submit": [
+            "sa7ba_custom.delivery_stats.update_daily_stats",
+            "sa7ba_custom.sales_order.on_submit_sales_order",
+            "sa7ba_custom.sales_order.update_guest_order_stats",
+        ],
+        "on_cancel": "sa7ba_custom.delivery_stats.update_daily_stats",
     },
     "Address": {
         "validate": "sa7ba_custom.address.validate_address",
@@ -38,21 +43,44 @@ doc_events = {
 whitelisted_methods = [
     "sa7ba_custom.api.process_guest_checkout",
     "sa7ba_custom.api.get_delivery_areas",
+    "sa7ba_custom.api.search_delivery_areas",
     "sa7ba_custom.api.update_cart_delivery",
+    "sa7ba_custom.api.apply_cart_operations",
     "sa7ba_custom.api.validate_guest_info",
 ]
 
+# Request Hooks
+after_request = [
+    "sa7ba_custom.instrumentation.after_request",
+]
+
+# Retried checkouts get the order their first submission placed
+override_whitelisted_methods = {
+    "webshop.webshop.shopping_cart.cart.place_order": "sa7ba_custom.api.place_order",
+}
+
 # Template Overrides
 override_doctype_class = {
     "Shopping Cart": "sa7ba_custom.overrides.cart.CustomShoppingCart",
 }
 
+# Jinja
+jinja = {
+    "methods": [
+        "sa7ba_custom.cart_totals.get_current_cart_summary",
+    ],
+}
+
 # Website Context
 website_context = {
     "allow_guest_checkout": True,
-    "delivery_areas": "sa7ba_custom.api.get_delivery_areas",
 }
 
+# Active delivery areas embedded in the cart and checkout pages
+update_website_context = [
+    "sa7ba_custom.area_registry.update_website_context",
+]
+
 # App Include JS/CSS
 app_include_js = "/assets/sa7ba_custom/js/delivery_area.js"
 app_include_css = "/assets/sa7ba_custom/css/sa7ba_custom.css"
@@ -75,6 +103,26 @@ custom_fields = {
             "default": 0,
             "read_only": 1,
             "insert_after": "custom_is_guest_customer"
+        },
+        {
+            "fieldname": "custom_email_key",
+            "label": "Email Key",
+            "fieldtype": "Data",
+            "read_only": 1,
+            "hidden": 1,
+            "search_index": 1,
+            "description": "Lowercased email used for guest lookups",
+            "insert_after": "custom_guest_checkout_count"
+        },
+        {
+            "fieldname": "custom_phone_key",
+            "label": "Phone Key",
+            "fieldtype": "Data",
+            "read_only": 1,
+            "hidden": 1,
+            "search_index": 1,
+            "description": "E.164 mobile number used for guest lookups",
+            "insert_after": "custom_email_key"
         }
     ],
     "Sales Order": [
@@ -97,6 +145,45 @@ custom_fields = {
             "label": "Guest Phone",
             "fieldtype": "Data",
             "insert_after": "custom_guest_email"
+        },
+        {
+            "fieldname": "custom_idempotency_key",
+            "label": "Idempotency Key",
+            "fieldtype": "Data",
+            "read_only": 1,
+            "hidden": 1,
+            "unique": 1,
+            "no_copy": 1,
+            "description": "Client request key used to reject duplicate submissions",
+            "insert_after": "custom_guest_phone"
+        },
+        {
+            "fieldname": "custom_delivery_area",
+            "label": "Delivery Area",
+            "fieldtype": "Link",
+            "options": "Delivery Area",
+            "read_only": 1,
+            "search_index": 1,
+            "no_copy": 1,
+            "description": "Delivery area at the time of the order",
+            "insert_after": "shipping_address_name"
+        },
+        {
+            "fieldname": "custom_delivery_charge",
+            "label": "Delivery Charge",
+            "fieldtype": "Currency",
+            "read_only": 1,
+            "no_copy": 1,
+            "description": "Delivery charge at the time of the order",
+            "insert_after": "custom_delivery_area"
+        },
+        {
+            "fieldname": "custom_estimated_delivery_time",
+            "label": "Estimated Delivery Time",
+            "fieldtype": "Data",
+            "read_only": 1,
+            "no_copy": 1,
+            "insert_after": "custom_delivery_charge"
         }
     ],
     "Address": [
@@ -107,6 +194,42 @@ custom_fields = {
             "options": "Delivery Area",
             "reqd": 1,
             "insert_after": "city"
+        },
+        {
+            "fieldname": "custom_latitude",
+            "label": "Latitude",
+            "fieldtype": "Float",
+            "precision": "7",
+            "insert_after": "custom_delivery_area"
+        },
+        {
+            "fieldname": "custom_longitude",
+            "label": "Longitude",
+            "fieldtype": "Float",
+            "precision": "7",
+            "insert_after": "custom_latitude"
+        }
+    ],
+    "Delivery Area": [
+        {
+            "fieldname": "custom_area_name_ar",
+            "label": "Area Name (Arabic)",
+            "fieldtype": "Data",
+            "insert_after": "area_name"
+        },
+        {
+            "fieldname": "custom_aliases",
+            "label": "Aliases",
+            "fieldtype": "Small Text",
+            "description": "Other spellings used in addresses, one per line (e.g. Salmiyah)",
+            "insert_after": "custom_area_name_ar"
+        },
+        {
+            "fieldname": "custom_boundary",
+            "label": "Boundary",
+            "fieldtype": "Geolocation",
+            "description": "Area polygon; addresses with coordinates inside it are assigned to this area",
+            "insert_after": "custom_aliases"
         }
     ],
     "Sales Order Item": [
@@ -120,6 +243,17 @@ custom_fields = {
     ]
 }
 
+# Scheduled Tasks
+scheduler_events = {
+    "all": [
+        "sa7ba_custom.guest_notifications.flush_guest_confirmations",
+        "sa7ba_custom.counters.flush_counters",
+    ],
+    "daily": [
+        "sa7ba_custom.delivery_stats.reconcile_area_stats",
+    ]
+}
+
 # Standard Reports
 standard_reports = [
     {"report_name": "Delivery Charges Summary", "ref_doctype": "Sales Order"}
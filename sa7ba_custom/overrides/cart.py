@@ -1,6 +1,12 @@
 import frappe
 from frappe import _
-import json
+from sa7ba_custom.sa7ba_custom.custom.delivery_pricing import get_cart_delivery_charge
+from sa7ba_custom.sa7ba_custom.custom.cart_store import load_cart, save_cart
+from sa7ba_custom.sa7ba_custom.custom.cart_totals import (
+    get_pricing_version, get_stored_totals, make_delivery_line, stamp_cart
+)
+from sa7ba_custom.sa7ba_custom.custom.instrumentation import instrument
+from sa7ba_custom.sa7ba_custom.custom.money import from_fils, split_totals, to_fils
 
 class CustomShoppingCart:
     """
@@ -11,20 +17,42 @@ class CustomShoppingCart:
         self.delivery_charge_item = "DELIVERY-CHARGE"
     
     def get_cart(self):
-        """Get current cart with delivery charge support"""
+        """
+        Get current cart with delivery charge support
+        Unchanged carts reuse stored totals; changed carts are updated by deltas
+        """
         from webshop.webshop.doctype.webshop_settings.webshop_cart import get_cart as original_get_cart
         cart = original_get_cart()
         
-        # Add delivery charge if area is selected
         selected_area = frappe.local.cookie_manager.get_cookie('selected_delivery_area')
-        if selected_area:
-            cart = self.update_cart_with_delivery(cart, selected_area)
+        pricing_version = get_pricing_version()
+        totals = get_stored_totals(load_cart())
+        
+        if not totals or totals.pricing_version != pricing_version:
+            # No usable totals: one full recompute, then persist the stamp
+            if selected_area:
+                cart = self.update_cart_with_delivery(cart, selected_area)
+            else:
+                cart = stamp_cart(self.calculate_cart_total(cart), None)
+            save_cart(cart)
+            return cart
+        
+        lines_changed = totals.sync_lines(cart.get("items", []))
+        area_changed = not totals.is_current(selected_area, pricing_version)
+        if lines_changed or area_changed:
+            # Re-quote only when the lines, area or pricing moved; otherwise reuse the stored quote
+            delivery_charge = to_fils(self.get_delivery_charge(selected_area, cart)) if selected_area else 0
+            totals.set_area(selected_area, delivery_charge, pricing_version)
+        
+        cart = totals.apply(cart)
+        if lines_changed or area_changed:
+            save_cart(cart)
         
         return cart
     
     def update_cart_with_delivery(self, cart, area_code):
         """Add delivery charge to cart"""
-        delivery_charge = self.get_delivery_charge(area_code)
+        delivery_charge = self.get_delivery_charge(area_code, cart)
         
         # Remove any existing delivery charge
         cart["items"] = [item for item in cart.get("items", []) 
@@ -32,29 +60,15 @@ class CustomShoppingCart:
         
         # Add delivery charge item
         if delivery_charge > 0:
-            cart["items"].append({
-                "item_code": self.delivery_charge_item,
-                "item_name": f"Delivery Service Charge",
-                "qty": 1,
-                "rate": delivery_charge,
-                "amount": delivery_charge,
-                "description": f"Delivery to {area_code} area",
-                "custom_is_delivery_charge": 1
-            })
+            cart["items"].append(make_delivery_line(to_fils(delivery_charge), area_code))
         
         # Recalculate totals
         cart = self.calculate_cart_total(cart)
-        return cart
+        return stamp_cart(cart, area_code)
     
-    def get_delivery_charge(self, area_code):
-        """Get delivery charge for area"""
-        if not area_code:
-            return 0
-        
-        charge = frappe.db.get_value("Delivery Area", 
-                                    {"area_code": area_code, "is_active": 1}, 
-                                    "delivery_charge")
-        return float(charge) if charge else 0
+    def get_delivery_charge(self, area_code, cart=None):
+        """Get delivery charge for area after pricing rules"""
+        return get_cart_delivery_charge(area_code, cart)
     
     def calculate_cart_total(self, cart):
         """Calculate cart total including delivery charges"""
@@ -63,15 +77,11 @@ class CustomShoppingCart:
         # Original calculation
         cart = original_calculate(cart)
         
-        # Add delivery charge summary
-        delivery_charge = 0
-        for item in cart.get("items", []):
-            if item.get("item_code") == self.delivery_charge_item:
-                delivery_charge = item.get("amount", 0)
-                break
+        # Add delivery charge summary, worked out in fils
+        delivery_charge = split_totals(cart.get("items", []), self.delivery_charge_item).delivery_charge
         
-        cart["delivery_charge"] = delivery_charge
-        cart["subtotal_without_delivery"] = cart.get("total", 0) - delivery_charge
+        cart["delivery_charge"] = from_fils(delivery_charge)
+        cart["subtotal_without_delivery"] = from_fils(to_fils(cart.get("total", 0)) - delivery_charge)
         
         return cart
     
@@ -82,13 +92,8 @@ class CustomShoppingCart:
         # Add item to cart
         result = original_add_to_cart(item_code, qty, with_items, additional_notes)
         
-        # Update with delivery charge if area is selected
-        selected_area = frappe.local.cookie_manager.get_cookie('selected_delivery_area')
-        if selected_area:
-            cart = self.get_cart()
-            cart = self.update_cart_with_delivery(cart, selected_area)
-            # Save updated cart
-            frappe.local.cookie_manager.set_cookie('cart', json.dumps(cart))
+        # Apply the line change to the stored totals (one recompute at most)
+        self.get_cart()
         
         return result
     
@@ -99,32 +104,31 @@ class CustomShoppingCart:
         # Remove item from cart
         result = original_remove(item_code)
         
-        # Update with delivery charge if area is selected
-        selected_area = frappe.local.cookie_manager.get_cookie('selected_delivery_area')
-        if selected_area:
-            cart = self.get_cart()
-            cart = self.update_cart_with_delivery(cart, selected_area)
-            # Save updated cart
-            frappe.local.cookie_manager.set_cookie('cart', json.dumps(cart))
+        # Apply the line change to the stored totals (one recompute at most)
+        self.get_cart()
         
         return result
 
 # Override the original cart functions
+@instrument(name="cart_override.get_cart")
 def get_cart():
     """Override get_cart function"""
     cart_manager = CustomShoppingCart()
     return cart_manager.get_cart()
 
+@instrument(name="cart_override.calculate_cart_total")
 def calculate_cart_total(cart):
     """Override calculate_cart_total function"""
     cart_manager = CustomShoppingCart()
     return cart_manager.calculate_cart_total(cart)
 
+@instrument(name="cart_override.add_to_cart")
 def add_to_cart(item_code, qty, with_items=False, additional_notes=None):
     """Override add_to_cart function"""
     cart_manager = CustomShoppingCart()
     return cart_manager.add_to_cart(item_code, qty, with_items, additional_notes)
 
+@instrument(name="cart_override.remove_from_cart")
 def remove_from_cart(item_code):
     """Override remove_from_cart function"""
     cart_manager = CustomShoppingCart()
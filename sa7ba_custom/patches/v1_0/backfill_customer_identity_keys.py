@@ -0,0 +1,13 @@
+import frappe
+from frappe.custom.doctype.custom_field.custom_field import create_custom_fields
+from sa7ba_custom.sa7ba_custom.custom.customer import backfill_identity_keys
+
+
+def execute():
+    """Key existing customers so returning guests are found instead of duplicated"""
+    # The identity key fields must exist before they can be filled
+    create_custom_fields(
+        {"Customer": frappe.get_hooks("custom_fields", app_name="sa7ba_custom").get("Customer", [])},
+        update=True
+    )
+    backfill_identity_keys()
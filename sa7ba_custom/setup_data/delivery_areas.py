@@ -8,6 +8,7 @@ def create_delivery_areas():
         {
             "area_code": "JAB",
             "area_name": "Al Jabriya",
+            "custom_area_name_ar": "الجابرية",
             "delivery_charge": 2.000,
             "estimated_delivery_time": "1-2 hours",
             "is_active": 1,
@@ -16,6 +17,7 @@ def create_delivery_areas():
         {
             "area_code": "SAL",
             "area_name": "Salmiya",
+            "custom_area_name_ar": "السالمية",
             "delivery_charge": 3.000,
             "estimated_delivery_time": "2-3 hours",
             "is_active": 1,
@@ -24,6 +26,7 @@ def create_delivery_areas():
         {
             "area_code": "HAW",
             "area_name": "Hawally",
+            "custom_area_name_ar": "حولي",
             "delivery_charge": 2.500,
             "estimated_delivery_time": "2-3 hours",
             "is_active": 1,
@@ -32,6 +35,7 @@ def create_delivery_areas():
         {
             "area_code": "FAI",
             "area_name": "Al Farwaniya",
+            "custom_area_name_ar": "الفروانية",
             "delivery_charge": 3.500,
             "estimated_delivery_time": "3-4 hours",
             "is_active": 1,
@@ -40,6 +44,7 @@ def create_delivery_areas():
         {
             "area_code": "ASI",
             "area_name": "Al Asimah (Kuwait City)",
+            "custom_area_name_ar": "العاصمة",
             "delivery_charge": 2.000,
             "estimated_delivery_time": "1-2 hours",
             "is_active": 1,
@@ -48,6 +53,7 @@ def create_delivery_areas():
         {
             "area_code": "MUB",
             "area_name": "Mubarak Al-Kabeer",
+            "custom_area_name_ar": "مبارك الكبير",
             "delivery_charge": 3.000,
             "estimated_delivery_time": "2-3 hours",
             "is_active": 1,
@@ -56,6 +62,7 @@ def create_delivery_areas():
         {
             "area_code": "AHA",
             "area_name": "Al Ahmadi",
+            "custom_area_name_ar": "الأحمدي",
             "delivery_charge": 4.000,
             "estimated_delivery_time": "3-5 hours",
             "is_active": 1,
@@ -64,6 +71,7 @@ def create_delivery_areas():
         {
             "area_code": "JAH",
             "area_name": "Al Jahra",
+            "custom_area_name_ar": "الجهراء",
             "delivery_charge": 5.000,
             "estimated_delivery_time": "4-6 hours",
             "is_active": 1,
@@ -72,6 +80,7 @@ def create_delivery_areas():
         {
             "area_code": "SALW",
             "area_name": "Salwa",
+            "custom_area_name_ar": "سلوى",
             "delivery_charge": 3.500,
             "estimated_delivery_time": "3-4 hours",
             "is_active": 1,
@@ -80,6 +89,7 @@ def create_delivery_areas():
         {
             "area_code": "MAN",
             "area_name": "Mangaf",
+            "custom_area_name_ar": "المنقف",
             "delivery_charge": 3.500,
             "estimated_delivery_time": "3-4 hours",
             "is_active": 1,
@@ -88,6 +98,7 @@ def create_delivery_areas():
         {
             "area_code": "FAH",
             "area_name": "Fahaheel",
+            "custom_area_name_ar": "الفحيحيل",
             "delivery_charge": 3.000,
             "estimated_delivery_time": "2-3 hours",
             "is_active": 1,
@@ -96,6 +107,7 @@ def create_delivery_areas():
         {
             "area_code": "KHA",
             "area_name": "Khaitan",
+            "custom_area_name_ar": "خيطان",
             "delivery_charge": 3.500,
             "estimated_delivery_time": "3-4 hours",
             "is_active": 1,
@@ -104,6 +116,7 @@ def create_delivery_areas():
         {
             "area_code": "RAI",
             "area_name": "Al Rai",
+            "custom_area_name_ar": "الري",
             "delivery_charge": 2.500,
             "estimated_delivery_time": "2-3 hours",
             "is_active": 1,
@@ -112,6 +125,7 @@ def create_delivery_areas():
         {
             "area_code": "SHW",
             "area_name": "Shuwaikh",
+            "custom_area_name_ar": "الشويخ",
             "delivery_charge": 2.000,
             "estimated_delivery_time": "1-2 hours",
             "is_active": 1,
@@ -120,6 +134,7 @@ def create_delivery_areas():
         {
             "area_code": "SHA",
             "area_name": "Sharq",
+            "custom_area_name_ar": "شرق",
             "delivery_charge": 2.000,
             "estimated_delivery_time": "1-2 hours",
             "is_active": 1,
@@ -128,6 +143,7 @@ def create_delivery_areas():
         {
             "area_code": "MAH",
             "area_name": "Mahboula",
+            "custom_area_name_ar": "المهبولة",
             "delivery_charge": 4.000,
             "estimated_delivery_time": "3-5 hours",
             "is_active": 1,
@@ -136,6 +152,7 @@ def create_delivery_areas():
         {
             "area_code": "SAB",
             "area_name": "Sabah Al-Salem",
+            "custom_area_name_ar": "صباح السالم",
             "delivery_charge": 3.500,
             "estimated_delivery_time": "3-4 hours",
             "is_active": 1,
@@ -144,6 +161,7 @@ def create_delivery_areas():
         {
             "area_code": "ABD",
             "area_name": "Abdullah Al-Salem",
+            "custom_area_name_ar": "ضاحية عبدالله السالم",
             "delivery_charge": 2.000,
             "estimated_delivery_time": "1-2 hours",
             "is_active": 1,
@@ -152,6 +170,7 @@ def create_delivery_areas():
         {
             "area_code": "ADA",
             "area_name": "Adailiya",
+            "custom_area_name_ar": "العديلية",
             "delivery_charge": 2.500,
             "estimated_delivery_time": "2-3 hours",
             "is_active": 1,
@@ -160,6 +179,7 @@ def create_delivery_areas():
         {
             "area_code": "BNE",
             "area_name": "Bneid Al-Qar",
+            "custom_area_name_ar": "بنيد القار",
             "delivery_charge": 2.000,
             "estimated_delivery_time": "1-2 hours",
             "is_active": 1,
@@ -168,6 +188,7 @@ def create_delivery_areas():
         {
             "area_code": "DAI",
             "area_name": "Daiya",
+            "custom_area_name_ar": "الدعية",
             "delivery_charge": 2.000,
             "estimated_delivery_time": "1-2 hours",
             "is_active": 1,
@@ -176,6 +197,7 @@ def create_delivery_areas():
         {
             "area_code": "DAS",
             "area_name": "Dasma",
+            "custom_area_name_ar": "الدسمة",
             "delivery_charge": 2.000,
             "estimated_delivery_time": "1-2 hours",
             "is_active": 1,
@@ -184,6 +206,7 @@ def create_delivery_areas():
         {
             "area_code": "JIB",
             "area_name": "Jibla",
+            "custom_area_name_ar": "جبلة",
             "delivery_charge": 2.000,
             "estimated_delivery_time": "1-2 hours",
             "is_active": 1,
@@ -191,37 +214,15 @@ def create_delivery_areas():
         }
     ]
     
-    created_count = 0
-    updated_count = 0
-    
-    for area_data in delivery_areas:
-        # Check if area already exists
-        existing_area = frappe.db.exists("Delivery Area", {"area_code": area_data["area_code"]})
-        
-        if existing_area:
-            # Update existing area
-            area = frappe.get_doc("Delivery Area", existing_area)
-            for key, value in area_data.items():
-                if area.has_value_changed(key) and hasattr(area, key):
-                    setattr(area, key, value)
-            area.save(ignore_permissions=True)
-            updated_count += 1
-            frappe.logger().info(f"Updated delivery area: {area_data['area_name']}")
-        else:
-            # Create new area
-            area = frappe.new_doc("Delivery Area")
-            for key, value in area_data.items():
-                setattr(area, key, value)
-            area.insert(ignore_permissions=True)
-            created_count += 1
-            frappe.logger().info(f"Created delivery area: {area_data['area_name']}")
-    
-    frappe.db.commit()
+    # One diff query and bulk writes instead of a get_doc/save per area
+    from sa7ba_custom.sa7ba_custom.custom.delivery_area_import import import_delivery_areas
+    result = import_delivery_areas(delivery_areas)
     
     return {
-        "created": created_count,
-        "updated": updated_count,
-        "total": created_count + updated_count
+        "created": result["created"],
+        "updated": result["updated"],
+        "unchanged": result["unchanged"],
+        "total": result["total"]
     }
 
 def create_delivery_charge_item():